@@ -0,0 +1,5 @@
+"""Performance benchmarks of txmd.
+
+Run ``python -m benchmarks --help`` from the repository root. See
+``benchmarks/README.md``.
+"""
@@ -0,0 +1,219 @@
+"""Command line of the txmd benchmarks.
+
+Examples:
+    Run the default corpora and keep the results:
+        $ python -m benchmarks run --output before.json
+
+    Compare them with the results of another commit:
+        $ python -m benchmarks compare before.json after.json
+
+    Write a generated document, e.g. to try it in the viewer:
+        $ python -m benchmarks generate --preset headers > manual.md
+"""
+
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from benchmarks.corpus import PRESETS, CorpusSpec, generate_document
+from benchmarks.suite import KEY_SCRIPT, TOC_JUMPS, compare, run_suite
+
+# Corpora run when none is named on the command line
+DEFAULT_CORPORA = ("small", "medium", "headers", "code")
+
+# Command line options of the CorpusSpec fields, with their types
+SPEC_OPTIONS = {
+    "size": int,
+    "header_density": float,
+    "depth": int,
+    "code_ratio": float,
+    "table_ratio": float,
+    "table_rows": int,
+    "table_columns": int,
+    "seed": int,
+}
+
+
+def _add_spec_options(parser: argparse.ArgumentParser) -> None:
+    """Add an option for every field of CorpusSpec."""
+    group = parser.add_argument_group(
+        "document shape", "override the fields of the corpus spec"
+    )
+    for field, kind in SPEC_OPTIONS.items():
+        group.add_argument(
+            "--" + field.replace("_", "-"),
+            dest=field,
+            type=kind,
+            help=f"default: {CorpusSpec._field_defaults[field]}",
+        )
+
+
+def _spec(args: argparse.Namespace, base: CorpusSpec) -> CorpusSpec:
+    """Return base with the fields given on the command line replaced."""
+    overrides = {
+        field: getattr(args, field)
+        for field in SPEC_OPTIONS
+        if getattr(args, field) is not None
+    }
+    return base._replace(**overrides)
+
+
+def _has_spec_options(args: argparse.Namespace) -> bool:
+    """Return whether any field of the spec was given."""
+    return any(getattr(args, field) is not None for field in SPEC_OPTIONS)
+
+
+def run(args: argparse.Namespace) -> int:
+    """Run the benchmarks and write their results as JSON."""
+    if _has_spec_options(args):
+        corpora = {"custom": _spec(args, CorpusSpec())}
+    else:
+        names = args.corpus or DEFAULT_CORPORA
+        unknown = [name for name in names if name not in PRESETS]
+        if unknown:
+            print(f"Unknown corpus: {', '.join(unknown)}", file=sys.stderr)
+            return 2
+        corpora = {name: PRESETS[name] for name in names}
+
+    script = KEY_SCRIPT
+    if args.keys:
+        with open(args.keys) as file:
+            script = file.read()
+
+    results = run_suite(
+        corpora,
+        repeat=args.repeat,
+        jumps=args.jumps,
+        viewer=args.viewer,
+        script=script,
+    )
+    for name, corpus in results["corpora"].items():
+        print(
+            f"{name}: {corpus['bytes']} bytes, {corpus['headers']} headers",
+            file=sys.stderr,
+        )
+        for benchmark, result in corpus["results"].items():
+            print(
+                f"  {benchmark:<28} median {result['median']:10.3f} ms  "
+                f"p95 {result['p95']:10.3f} ms",
+                file=sys.stderr,
+            )
+
+    output = json.dumps(results, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        sys.stdout.write(output)
+    return 0
+
+
+def generate(args: argparse.Namespace) -> int:
+    """Write a generated document to stdout."""
+    sys.stdout.write(generate_document(_spec(args, PRESETS[args.preset])))
+    return 0
+
+
+def compare_results(args: argparse.Namespace) -> int:
+    """Print how the results of two runs differ."""
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+
+    slower = 0
+    print(f"{'corpus':<10} {'benchmark':<28} {'old ms':>10} {'new ms':>10}")
+    for corpus, name, before, after, ratio in compare(
+        old, new, args.statistic
+    ):
+        flag = ""
+        if args.fail_above and ratio > args.fail_above:
+            flag = "  slower"
+            slower += 1
+        print(
+            f"{corpus:<10} {name:<28} {before:10.3f} {after:10.3f} "
+            f"{ratio:6.2f}x{flag}"
+        )
+    return 1 if slower else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parse the command line and run the selected command.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Benchmarks of txmd."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "--corpus",
+        action="append",
+        help="corpus to run, may be repeated: "
+        f"{', '.join(PRESETS)} (default: {', '.join(DEFAULT_CORPORA)})",
+    )
+    run_parser.add_argument(
+        "--repeat", type=int, default=5, help="runs of every benchmark"
+    )
+    run_parser.add_argument(
+        "--jumps",
+        type=int,
+        default=TOC_JUMPS,
+        help="TOC jumps timed per viewer run",
+    )
+    run_parser.add_argument(
+        "--keys",
+        metavar="SCRIPT",
+        help="key script replayed per viewer run, e.g. one saved with "
+        "txmd --record-keys (default: a built-in reading session)",
+    )
+    run_parser.add_argument(
+        "--no-viewer",
+        dest="viewer",
+        action="store_false",
+        help="only run the parser benchmarks",
+    )
+    run_parser.add_argument(
+        "--output", "-o", help="write the JSON results to this file"
+    )
+    _add_spec_options(run_parser)
+    run_parser.set_defaults(handler=run)
+
+    generate_parser = commands.add_parser(
+        "generate", help="write a generated document to stdout"
+    )
+    generate_parser.add_argument(
+        "--preset", choices=sorted(PRESETS), default="small"
+    )
+    _add_spec_options(generate_parser)
+    generate_parser.set_defaults(handler=generate)
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare the JSON results of two runs"
+    )
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument(
+        "--statistic",
+        default="median",
+        choices=("min", "median", "mean", "p95", "p99", "max"),
+    )
+    compare_parser.add_argument(
+        "--fail-above",
+        type=float,
+        metavar="RATIO",
+        help="exit with status 1 if a benchmark is more than RATIO times "
+        "slower, e.g. 1.2",
+    )
+    compare_parser.set_defaults(handler=compare_results)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
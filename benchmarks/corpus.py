@@ -0,0 +1,186 @@
+"""Deterministic generator of synthetic Markdown documents.
+
+The same ``CorpusSpec`` always produces the same document, byte for byte,
+on every platform and Python version: the generator only draws from a
+``random.Random`` seeded by the spec, through methods whose output is
+fixed across versions.
+"""
+
+import random
+from typing import Dict, List, NamedTuple
+
+# Words the text of paragraphs, headers, lists and tables is made of
+WORDS = (
+    "terminal markdown viewer document section header table code block "
+    "render scroll jump search index cache buffer parse line offset tree "
+    "node level widget frame layout stream pipe file server latency "
+    "memory budget profile report value result option command install "
+    "configure deploy restore monitor"
+).split()
+
+# Statements the fenced code blocks are made of. Some start with "#", so
+# header scanners must skip code blocks to count the headers right.
+CODE_LINES = (
+    "# configure the {0} before the first {1}",
+    "{0} = load_{1}(path, size={2})",
+    "for {0} in {1}:",
+    "    total += len({0}.{1})",
+    "if not {0}:",
+    "    raise ValueError('{1} {2}')",
+    "return {0}_{1}",
+)
+
+# Languages of the fenced code blocks
+LANGUAGES = ("python", "bash", "yaml", "")
+
+
+class CorpusSpec(NamedTuple):
+    """Shape of a generated document.
+
+    Attributes:
+        size (int): Size of the document in bytes. Generation stops at
+            the first block boundary past this size.
+        header_density (float): Fraction of the blocks that are headers.
+        depth (int): Deepest header level used, from 1 to 6.
+        code_ratio (float): Fraction of the other blocks that are fenced
+            code blocks.
+        table_ratio (float): Fraction of the other blocks that are tables.
+        table_rows (int): Number of body rows of every table.
+        table_columns (int): Number of columns of every table.
+        seed (int): Seed of the random generator.
+    """
+
+    size: int = 100_000
+    header_density: float = 0.1
+    depth: int = 4
+    code_ratio: float = 0.15
+    table_ratio: float = 0.05
+    table_rows: int = 8
+    table_columns: int = 4
+    seed: int = 0
+
+
+# Named corpora used by the benchmark runner and the performance tests
+PRESETS: Dict[str, CorpusSpec] = {
+    "small": CorpusSpec(size=10_000),
+    "medium": CorpusSpec(size=1_000_000),
+    "large": CorpusSpec(size=10_000_000),
+    # A reference manual: many short, deeply nested sections
+    "headers": CorpusSpec(size=1_000_000, header_density=0.5, depth=6),
+    # Source listings and data dumps: mostly code and large tables
+    "code": CorpusSpec(
+        size=1_000_000,
+        header_density=0.02,
+        code_ratio=0.6,
+        table_ratio=0.2,
+        table_rows=50,
+        table_columns=8,
+    ),
+}
+
+
+def _words(rng: random.Random, count: int) -> str:
+    """Return count words drawn from WORDS."""
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _header(rng: random.Random, level: int) -> str:
+    """Return a header of the given level."""
+    return "#" * level + " " + _words(rng, rng.randint(1, 5)).capitalize()
+
+
+def _paragraph(rng: random.Random) -> str:
+    """Return a paragraph of a few wrapped lines, with inline markup."""
+    lines = []
+    for _ in range(rng.randint(1, 6)):
+        words = _words(rng, rng.randint(6, 14)).split()
+        position = rng.randrange(len(words))
+        markup = rng.choice(("**{}**", "*{}*", "`{}`", "{}"))
+        words[position] = markup.format(words[position])
+        lines.append(" ".join(words))
+    return "\n".join(lines).capitalize() + "."
+
+
+def _list(rng: random.Random) -> str:
+    """Return a bullet or numbered list, possibly with nested items."""
+    numbered = rng.random() < 0.3
+    items = []
+    for number in range(1, rng.randint(2, 8) + 1):
+        bullet = f"{number}." if numbered else "-"
+        items.append(f"{bullet} {_words(rng, rng.randint(2, 8))}")
+        if rng.random() < 0.2:
+            items.append(f"   - {_words(rng, rng.randint(2, 6))}")
+    return "\n".join(items)
+
+
+def _code(rng: random.Random) -> str:
+    """Return a fenced code block."""
+    lines = [f"```{rng.choice(LANGUAGES)}"]
+    for _ in range(rng.randint(3, 25)):
+        template = rng.choice(CODE_LINES)
+        lines.append(
+            template.format(
+                rng.choice(WORDS), rng.choice(WORDS), rng.randint(0, 999)
+            )
+        )
+    lines.append("```")
+    return "\n".join(lines)
+
+
+def _table(rng: random.Random, rows: int, columns: int) -> str:
+    """Return a table with a header row and rows body rows."""
+    header = [_words(rng, 1).capitalize() for _ in range(columns)]
+    lines = [
+        "| " + " | ".join(header) + " |",
+        "|" + "|".join("---" for _ in range(columns)) + "|",
+    ]
+    for _ in range(rows):
+        cells = [
+            str(rng.randint(0, 99999)) if rng.random() < 0.4
+            else _words(rng, rng.randint(1, 3))
+            for _ in range(columns)
+        ]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def generate_document(spec: CorpusSpec = CorpusSpec()) -> str:
+    """Generate a Markdown document of the given shape.
+
+    The document starts with a level 1 header. Header levels then follow
+    a random walk that never skips a level on the way down, like real
+    documents, and never goes deeper than ``spec.depth``.
+
+    Args:
+        spec (CorpusSpec): The size and shape of the document.
+
+    Returns:
+        str: The document, always the same for the same spec.
+
+    Example:
+        >>> len(generate_document(CorpusSpec(size=1000))) >= 1000
+        True
+    """
+    rng = random.Random(spec.seed)
+    depth = min(max(spec.depth, 1), 6)
+    level = 1
+    blocks: List[str] = [_header(rng, level)]
+    size = len(blocks[0])
+    while size < spec.size:
+        if rng.random() < spec.header_density:
+            level = rng.randint(1, min(level + 1, depth))
+            block = _header(rng, level)
+        else:
+            draw = rng.random()
+            if draw < spec.code_ratio:
+                block = _code(rng)
+            elif draw < spec.code_ratio + spec.table_ratio:
+                block = _table(rng, spec.table_rows, spec.table_columns)
+            elif rng.random() < 0.2:
+                block = _list(rng)
+            else:
+                block = _paragraph(rng)
+        blocks.append(block)
+        # Blocks are separated by a blank line
+        size += len(block) + 2
+    return "\n\n".join(blocks) + "\n"
@@ -0,0 +1,369 @@
+"""Benchmarks of the txmd parsers, the TOC and the headless viewer.
+
+Every benchmark records one wall-clock sample per run, in seconds, and is
+reported by ``summarize()`` in milliseconds. The viewer benchmarks run the
+app with Textual's ``run_test`` pilot, which lays out and renders every
+frame like a real terminal but does not write it anywhere.
+"""
+
+import asyncio
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.corpus import CorpusSpec, generate_document
+from txmd.toc import build_toc_tree, parse_markdown_headers
+
+# Terminal size of the headless viewer, in columns and rows
+SCREEN_SIZE = (100, 40)
+
+# Number of TOC jumps timed per run of the viewer
+TOC_JUMPS = 20
+
+# Keys replayed in the viewer per run, to time them from keypress to frame
+# (see txmd.latency for the format)
+KEY_SCRIPT = """
+j*30 k*5 down*5 up*5
+space*10 b*3 pagedown*5 pageup*2
+end home
+t down*6 enter t
+"""
+
+# Version of the layout of the JSON results, bumped when it changes
+RESULTS_FORMAT = 1
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Summarize timing samples in milliseconds.
+
+    Args:
+        samples (List[float]): The samples, in seconds.
+
+    Returns:
+        Dict[str, Any]: The number of samples, their minimum, median,
+            mean, 95th and 99th percentiles and maximum, and the samples
+            themselves.
+    """
+    ms = sorted(sample * 1000 for sample in samples)
+    return {
+        "unit": "ms",
+        "count": len(ms),
+        "min": ms[0],
+        "median": statistics.median(ms),
+        "mean": statistics.fmean(ms),
+        "p95": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+        "p99": ms[min(len(ms) - 1, int(len(ms) * 0.99))],
+        "max": ms[-1],
+        "samples": [round(sample, 4) for sample in ms],
+    }
+
+
+def time_calls(func: Callable[[], Any], repeat: int) -> List[float]:
+    """Time repeat calls of func.
+
+    Returns:
+        List[float]: The duration of every call, in seconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+class FrameClock:
+    """Record the time at which an app produces every frame.
+
+    Frames are counted when the screen hands them to ``App._display()``,
+    which Textual calls once the compositor rendered an update, even in
+    headless mode where nothing is written.
+
+    Attributes:
+        frames (List[float]): The ``time.perf_counter()`` of every frame.
+    """
+
+    def __init__(self, app: Any):
+        self.frames: List[float] = []
+        display = app._display
+
+        def record(screen: Any, renderable: Any) -> None:
+            self.frames.append(time.perf_counter())
+            display(screen, renderable)
+
+        app._display = record
+
+    async def wait(self, count: int, timeout: float = 10.0) -> float:
+        """Wait for a frame after the first count frames.
+
+        Args:
+            count (int): The number of frames already produced.
+            timeout (float): The number of seconds to wait at most.
+
+        Returns:
+            float: The time of the next frame.
+
+        Raises:
+            TimeoutError: If no frame comes within the timeout.
+        """
+        deadline = time.perf_counter() + timeout
+        while len(self.frames) <= count:
+            if time.perf_counter() > deadline:
+                raise TimeoutError("the app did not refresh")
+            await asyncio.sleep(0.001)
+        return self.frames[count]
+
+
+async def time_viewer(
+    content: str,
+    jumps: int = TOC_JUMPS,
+    size: Tuple[int, int] = SCREEN_SIZE,
+) -> Dict[str, List[float]]:
+    """Time one run of the viewer on content.
+
+    The run measures, in order:
+
+    - ``first_frame``: from creating the app to its first frame;
+    - ``load``: from creating the app to the end of the background parse
+      (``first_frame`` for documents parsed up front);
+    - ``populate_toc``: one call of ``_populate_toc()``;
+    - ``toc_jump``: from asking for a header, as selecting it in the TOC
+      does, to the frame showing it, for up to ``jumps`` headers spread
+      over the document. Jumps that do not scroll are not counted.
+
+    Args:
+        content (str): The document.
+        jumps (int): The number of TOC jumps to time.
+        size (Tuple[int, int]): The size of the screen.
+
+    Returns:
+        Dict[str, List[float]]: The samples of every measure, in seconds.
+    """
+    # Imported here: the parser benchmarks do not need Textual
+    from txmd.app import MarkdownViewerApp
+
+    start = time.perf_counter()
+    app = MarkdownViewerApp(content)
+    clock = FrameClock(app)
+    async with app.run_test(size=size) as pilot:
+        first_frame = await clock.wait(0) - start
+        # The load worker only starts after the first refresh
+        while app._loading:
+            await asyncio.sleep(0.001)
+        load = max(first_frame, time.perf_counter() - start)
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+
+        start = time.perf_counter()
+        app._populate_toc()
+        populate = time.perf_counter() - start
+        await pilot.pause()
+
+        view = app._content_view()
+        headers = app.document.headers
+        step = max(1, len(headers) // max(1, jumps))
+        samples = []
+        for header_id in list(range(0, len(headers), step))[:jumps]:
+            scroll_y = view.scroll_y
+            count = len(clock.frames)
+            start = time.perf_counter()
+            app._jump_to_header(header_id)
+            if view.scroll_y == scroll_y:
+                continue
+            samples.append(await clock.wait(count) - start)
+            await pilot.pause()
+
+    return {
+        "first_frame": [first_frame],
+        "load": [load],
+        "populate_toc": [populate],
+        "toc_jump": samples,
+    }
+
+
+async def time_keys(
+    content: str,
+    script: str = KEY_SCRIPT,
+    size: Tuple[int, int] = SCREEN_SIZE,
+) -> Dict[str, List[float]]:
+    """Time the keys of a key script, replayed in the viewer.
+
+    Args:
+        content (str): The document.
+        script (str): The key script.
+        size (Tuple[int, int]): The size of the screen.
+
+    Returns:
+        Dict[str, List[float]]: The latencies from keypress to frame, in
+            seconds, by action, named ``key.<action>``. Keys that draw
+            nothing are not counted.
+    """
+    from txmd.app import MarkdownViewerApp
+    from txmd.latency import (
+        LatencyRecorder,
+        instrumented_app,
+        parse_key_script,
+        replay,
+    )
+
+    recorder = LatencyRecorder()
+    app = instrumented_app(MarkdownViewerApp, recorder)(content)
+    await replay(app, parse_key_script(script), size)
+    return {
+        f"key.{action}": samples
+        for action, samples in recorder.samples.items()
+    }
+
+
+def run_corpus(
+    spec: CorpusSpec,
+    repeat: int = 5,
+    jumps: int = TOC_JUMPS,
+    viewer: bool = True,
+    script: str = KEY_SCRIPT,
+) -> Dict[str, Any]:
+    """Run every benchmark on the document generated from spec.
+
+    Args:
+        spec (CorpusSpec): The shape of the document.
+        repeat (int): The number of runs of every benchmark.
+        jumps (int): The number of TOC jumps timed per viewer run.
+        viewer (bool): Also run the benchmarks that start the viewer.
+        script (str): The key script replayed per viewer run.
+
+    Returns:
+        Dict[str, Any]: The spec, the size of the document, and the
+            summary of every benchmark by name.
+    """
+    content = generate_document(spec)
+    headers = parse_markdown_headers(content)
+
+    samples: Dict[str, List[float]] = {
+        "parse_markdown_headers": time_calls(
+            lambda: parse_markdown_headers(content), repeat
+        ),
+        "build_toc_tree": time_calls(
+            lambda: build_toc_tree(headers), repeat
+        ),
+    }
+    if viewer:
+        for _ in range(repeat):
+            run = asyncio.run(time_viewer(content, jumps))
+            run.update(asyncio.run(time_keys(content, script)))
+            for name, values in run.items():
+                samples.setdefault(name, []).extend(values)
+
+    return {
+        "spec": spec._asdict(),
+        "bytes": len(content.encode()),
+        "lines": content.count("\n"),
+        "headers": len(headers),
+        "results": {
+            name: summarize(values)
+            for name, values in samples.items()
+            if values
+        },
+    }
+
+
+def _git_commit() -> Optional[str]:
+    """Return the commit of the source tree, if it is a git checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the code and the machine the benchmarks ran on."""
+    from txmd import __version__
+
+    return {
+        "format": RESULTS_FORMAT,
+        "txmd": __version__,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "argv": sys.argv[1:],
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def run_suite(
+    corpora: Dict[str, CorpusSpec],
+    repeat: int = 5,
+    jumps: int = TOC_JUMPS,
+    viewer: bool = True,
+    script: str = KEY_SCRIPT,
+) -> Dict[str, Any]:
+    """Run the benchmarks on several corpora.
+
+    Args:
+        corpora (Dict[str, CorpusSpec]): The corpora, by name.
+        repeat (int): The number of runs of every benchmark.
+        jumps (int): The number of TOC jumps timed per viewer run.
+        viewer (bool): Also run the benchmarks that start the viewer.
+        script (str): The key script replayed per viewer run.
+
+    Returns:
+        Dict[str, Any]: The environment and the results of every corpus,
+            ready to be written as JSON.
+    """
+    return {
+        "environment": environment(),
+        "corpora": {
+            name: run_corpus(spec, repeat, jumps, viewer, script)
+            for name, spec in corpora.items()
+        },
+    }
+
+
+def compare(
+    old: Dict[str, Any], new: Dict[str, Any], statistic: str = "median"
+) -> List[Tuple[str, str, float, float, float]]:
+    """Compare the results of two runs.
+
+    Only the corpora and benchmarks present in both runs are compared,
+    and only if both have the statistic (results saved before ``p99``
+    was added lack it).
+
+    Args:
+        old (Dict[str, Any]): The results of the reference run.
+        new (Dict[str, Any]): The results of the run to check.
+        statistic (str): The statistic compared, e.g. "median" or "p95".
+
+    Returns:
+        List[Tuple[str, str, float, float, float]]: For every benchmark,
+            the corpus, the benchmark, the old and new values in
+            milliseconds, and the ratio of the new value to the old one.
+    """
+    rows = []
+    for corpus, old_corpus in old["corpora"].items():
+        new_corpus = new["corpora"].get(corpus)
+        if new_corpus is None:
+            continue
+        for name, old_result in old_corpus["results"].items():
+            new_result = new_corpus["results"].get(name)
+            if new_result is None or statistic not in old_result:
+                continue
+            before = old_result[statistic]
+            after = new_result[statistic]
+            ratio = after / before if before else float("inf")
+            rows.append((corpus, name, before, after, ratio))
+    return rows
@@ -0,0 +1,32 @@
+"""Command line options of the txmd test suite."""
+
+import pytest
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the options of the performance regression tests."""
+    group = parser.getgroup("txmd performance")
+    group.addoption(
+        "--perf",
+        action="store_true",
+        help="run the performance regression tests (marked perf), which "
+        "are skipped otherwise",
+    )
+    group.addoption(
+        "--update-baselines",
+        action="store_true",
+        help="save the timings of the performance tests as their new "
+        "baselines instead of comparing them (implies --perf)",
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list
+) -> None:
+    """Skip the performance tests unless they were asked for."""
+    if config.getoption("--perf") or config.getoption("--update-baselines"):
+        return
+    skip = pytest.mark.skip(reason="performance test, run with --perf")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,118 @@
+"""Tests for the benchmark corpus generator and runner."""
+
+import json
+
+from benchmarks.__main__ import main
+from benchmarks.corpus import PRESETS, CorpusSpec, generate_document
+from benchmarks.suite import compare, run_corpus, summarize
+from txmd.toc import parse_markdown_headers
+
+
+class TestGenerateDocument:
+    """Tests for generate_document function."""
+
+    def test_deterministic(self):
+        """Test that a spec always generates the same document."""
+        spec = CorpusSpec(size=20_000, seed=7)
+
+        assert generate_document(spec) == generate_document(spec)
+        assert generate_document(spec) != generate_document(
+            spec._replace(seed=8)
+        )
+
+    def test_size(self):
+        """Test that the document is about the requested size."""
+        for size in (1_000, 50_000):
+            content = generate_document(CorpusSpec(size=size))
+
+            assert size <= len(content.encode()) < size + 4_000
+
+    def test_header_density_and_depth(self):
+        """Test that headers follow the density and never skip levels."""
+        sparse = generate_document(CorpusSpec(size=50_000, depth=3))
+        dense = generate_document(
+            CorpusSpec(size=50_000, header_density=0.6, depth=3)
+        )
+        headers = parse_markdown_headers(dense)
+
+        assert len(headers) > 3 * len(parse_markdown_headers(sparse))
+        assert {level for level, _, _ in headers} == {1, 2, 3}
+        for previous, header in zip(headers, headers[1:]):
+            assert header[0] <= previous[0] + 1
+
+    def test_code_blocks_and_tables(self):
+        """Test that code and tables appear only when asked for."""
+        plain = generate_document(
+            CorpusSpec(size=20_000, code_ratio=0, table_ratio=0)
+        )
+        mixed = generate_document(
+            CorpusSpec(
+                size=20_000,
+                code_ratio=0.3,
+                table_ratio=0.3,
+                table_rows=5,
+                table_columns=3,
+            )
+        )
+
+        assert "```" not in plain and "|---|" not in plain
+        assert "```" in mixed
+        assert "|---|---|---|" in mixed
+
+    def test_presets(self):
+        """Test that the presets include the default corpora."""
+        assert {"small", "medium", "large"} <= set(PRESETS)
+
+
+class TestSuite:
+    """Tests for the benchmark runner."""
+
+    def test_summarize(self):
+        """Test that samples are summarized in milliseconds."""
+        result = summarize([0.003, 0.001, 0.002])
+
+        assert result["count"] == 3
+        assert result["min"] == 1.0
+        assert result["median"] == 2.0
+        assert result["p99"] == 3.0
+        assert result["max"] == 3.0
+
+    def test_run_corpus_with_viewer(self):
+        """Test that every benchmark reports samples."""
+        corpus = run_corpus(
+            CorpusSpec(size=5_000), repeat=1, jumps=3, script="j*3 space"
+        )
+
+        assert set(corpus["results"]) >= {
+            "parse_markdown_headers",
+            "build_toc_tree",
+            "first_frame",
+            "load",
+            "populate_toc",
+        }
+        assert corpus["results"]["first_frame"]["median"] > 0
+        assert corpus["results"]["key.scroll_down"]["count"] > 0
+        assert corpus["headers"] > 0
+
+    def test_compare(self):
+        """Test that runs are compared benchmark by benchmark."""
+        old = {"corpora": {"a": {"results": {"x": {"median": 2.0}}}}}
+        new = {"corpora": {"a": {"results": {"x": {"median": 3.0}}}}}
+
+        assert compare(old, new) == [("a", "x", 2.0, 3.0, 1.5)]
+
+    def test_command_line(self, tmp_path, capsys):
+        """Test that results are written as JSON and compared."""
+        output = tmp_path / "results.json"
+
+        status = main(
+            ["run", "--size", "2000", "--repeat", "1", "--no-viewer"]
+            + ["--output", str(output)]
+        )
+        results = json.loads(output.read_text())
+
+        assert status == 0
+        assert results["environment"]["format"] == 1
+        assert results["corpora"]["custom"]["spec"]["size"] == 2000
+        assert main(["compare", str(output), str(output)]) == 0
+        assert "parse_markdown_headers" in capsys.readouterr().out
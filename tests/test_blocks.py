@@ -0,0 +1,184 @@
+"""Tests for the block splitting module."""
+
+from typing import List
+
+from txmd.blocks import Block, BlockSplitter, split_blocks
+
+
+def texts(blocks: List[Block]) -> List[str]:
+    """Return the source text of each block."""
+    return [block.text for block in blocks]
+
+
+class TestSplitBlocks:
+    """Tests for split_blocks function."""
+
+    def test_split_paragraphs(self):
+        """Test that blank lines separate blocks."""
+        content = "First paragraph.\n\nSecond paragraph.\n"
+        blocks = texts(split_blocks(content))
+
+        assert blocks == ["First paragraph.\n\n", "Second paragraph.\n"]
+
+    def test_split_preserves_content(self):
+        """Test that joining the blocks reproduces the input."""
+        content = "\n\n# Title\ntext\n\n\n## Section\n\n- a\n- b\n\nend"
+        blocks = texts(split_blocks(content))
+
+        assert "".join(blocks) == content
+
+    def test_headers_are_own_blocks(self):
+        """Test that ATX headers are split from surrounding text."""
+        content = "# Title\nIntro text\n## Section\nBody\n"
+        blocks = texts(split_blocks(content))
+
+        assert blocks == [
+            "# Title\n",
+            "Intro text\n",
+            "## Section\n",
+            "Body\n",
+        ]
+
+    def test_fenced_code_kept_together(self):
+        """Test that blank lines inside fences do not split the block."""
+        content = "```python\n# comment\n\n\ndef foo():\n    pass\n```\n"
+        blocks = texts(split_blocks(content))
+
+        assert blocks == [content]
+
+    def test_fence_closed_by_matching_fence_only(self):
+        """Test that a shorter or different fence does not close a block."""
+        content = "````\n```\n~~~\n\n# inside\n````\n\n# After\n"
+        blocks = texts(split_blocks(content))
+
+        assert blocks == ["````\n```\n~~~\n\n# inside\n````\n\n", "# After\n"]
+
+    def test_indented_continuation_kept_together(self):
+        """Test that indented lines after a blank line continue the block."""
+        content = "- item\n\n  continued item\n\n    code\n\nNext\n"
+        blocks = texts(split_blocks(content))
+
+        assert blocks == [
+            "- item\n\n  continued item\n\n    code\n\n",
+            "Next\n",
+        ]
+
+    def test_loose_list_kept_together(self):
+        """Test that list items separated by blank lines stay together."""
+        content = "- one\n\n- two\n\n- three\n\nAfter\n"
+        blocks = texts(split_blocks(content))
+
+        assert blocks == ["- one\n\n- two\n\n- three\n\n", "After\n"]
+
+    def test_empty_content(self):
+        """Test splitting empty content."""
+        assert split_blocks("") == []
+
+    def test_blocks_carry_line_numbers(self):
+        """Test that every block knows the line it starts on."""
+        content = "# Title\n\ntext\nmore\n\n```\ncode\n```\n"
+        blocks = split_blocks(content, line_number=10)
+
+        assert [block.line_number for block in blocks] == [10, 12, 15]
+
+    def test_atx_headings_recognised(self):
+        """Test that heading blocks carry their level and text."""
+        blocks = split_blocks("# Title #\n\ntext\n\n### Sub\n#\n")
+
+        assert [(b.level, b.title) for b in blocks] == [
+            (1, "Title"),
+            (0, ""),
+            (3, "Sub"),
+            (0, ""),
+        ]
+
+    def test_setext_headings_are_own_blocks(self):
+        """Test that setext headings are split out of surrounding text."""
+        content = "```\ncode\n```\nMain\nTitle\n=====\ntext\n"
+        blocks = split_blocks(content)
+
+        assert texts(blocks) == [
+            "```\ncode\n```\n",
+            "Main\nTitle\n=====\n",
+            "text\n",
+        ]
+        assert blocks[1][1:] == (4, 1, "Main Title")
+
+    def test_thematic_break_is_not_a_heading(self):
+        """Test that --- after a blank line or a list is not an underline."""
+        blocks = split_blocks("text\n\n---\n\n- item\n---\n")
+
+        assert all(block.level == 0 for block in blocks)
+
+    def test_heading_inside_list_item_is_not_a_block(self):
+        """Test that indented headings stay inside their list."""
+        blocks = split_blocks("- item\n  # Nested\n")
+
+        assert len(blocks) == 1
+        assert blocks[0].level == 0
+
+    def test_html_block_is_opaque(self):
+        """Test that headings inside an HTML block are not blocks."""
+        content = "<div>\n# Not a heading\n</div>\n\n# Heading\n"
+        blocks = split_blocks(content)
+
+        assert texts(blocks) == [
+            "<div>\n# Not a heading\n</div>\n\n",
+            "# Heading\n",
+        ]
+        assert [block.level for block in blocks] == [0, 1]
+
+    def test_html_block_ends_at_its_end_condition(self):
+        """Test that comments and raw HTML end at their closing marker."""
+        content = "<!--\n\n# a\n-->\n# b\n<pre>\n\n# c\n</pre>\n# d\n"
+        blocks = split_blocks(content)
+
+        assert [block.title for block in blocks if block.level] == ["b", "d"]
+
+    def test_html_tag_does_not_interrupt_a_paragraph(self):
+        """Test that a lone inline tag after text is paragraph text."""
+        content = "text\n<span>\n# Heading\n"
+        blocks = split_blocks(content)
+
+        assert [block.title for block in blocks if block.level] == [
+            "Heading"
+        ]
+
+
+class TestBlockSplitter:
+    """Tests for incremental splitting with BlockSplitter."""
+
+    def test_block_emitted_when_next_block_starts(self):
+        """Test that a block is held back until the next one begins."""
+        splitter = BlockSplitter()
+
+        assert texts(splitter.feed("# Title\n")) == []
+        assert texts(splitter.feed("\nPara")) == []
+        assert texts(splitter.feed("graph\n")) == ["# Title\n\n"]
+        assert texts(splitter.close()) == ["Paragraph\n"]
+
+    def test_chunk_boundaries_do_not_matter(self):
+        """Test that feeding one character at a time gives the same blocks."""
+        content = "# A\n\ntext\n\n```\n\n# code\n```\n\n## B\n\n- x\n\n- y\n"
+        splitter = BlockSplitter()
+        blocks = []
+        for char in content:
+            blocks.extend(splitter.feed(char))
+        blocks.extend(splitter.close())
+
+        assert blocks == split_blocks(content)
+
+    def test_unterminated_fence_held_until_close(self):
+        """Test that an open fence is not emitted before end of input."""
+        splitter = BlockSplitter()
+
+        assert texts(splitter.feed("```\ncode\n\n# not a header\n\n")) == []
+        assert texts(splitter.close()) == ["```\ncode\n\n# not a header\n\n"]
+
+    def test_close_resets_state(self):
+        """Test that the splitter can be reused after close()."""
+        splitter = BlockSplitter()
+        splitter.feed("```\nopen fence\n")
+        splitter.close()
+
+        assert texts(splitter.feed("# Title\n\ntext\n")) == ["# Title\n\n"]
@@ -0,0 +1,122 @@
+"""Tests for the memory budget of txmd --max-memory."""
+
+from unittest.mock import patch
+
+import pytest
+
+from txmd.app import LOW_MEMORY_CACHE_SIZE, MarkdownViewerApp
+from txmd.budget import current_rss, estimate_layout_memory, parse_size
+from txmd.view import DocumentView
+
+CONTENT = "# Title\n\n" + "\n\n".join(
+    f"## Section {i}\n\nText of section {i}." for i in range(50)
+)
+
+
+class TestParseSize:
+    """Tests for parse_size function."""
+
+    def test_sizes(self):
+        """Test that plain numbers and binary suffixes are accepted."""
+        assert parse_size("1000") == 1000
+        assert parse_size("64K") == 64 * 1024
+        assert parse_size("512m") == 512 * 2**20
+        assert parse_size("1.5G") == 3 * 2**29
+        assert parse_size("2GiB") == 2 * 2**30
+        assert parse_size("100B") == 100
+
+    def test_invalid_sizes(self):
+        """Test that anything else is an error."""
+        for text in ("", "M", "12x", "-1G", "one"):
+            with pytest.raises(ValueError):
+                parse_size(text)
+
+
+class TestBudgetHelpers:
+    """Tests for current_rss and estimate_layout_memory functions."""
+
+    def test_current_rss(self):
+        """Test that the resident set size grows with allocations."""
+        before = current_rss()
+        data = bytearray(32 * 2**20)
+
+        assert before is not None and before > 0
+        assert current_rss() >= before
+        del data
+
+    def test_estimate_grows_with_size(self):
+        """Test that larger documents need more memory."""
+        assert estimate_layout_memory(2**30) > estimate_layout_memory(2**20)
+        assert estimate_layout_memory(0) > 0
+
+
+class TestMemoryBudget:
+    """Tests for the --max-memory budget of MarkdownViewerApp."""
+
+    def test_large_document_starts_in_fast_mode(self):
+        """Test that a document too large for the budget shows its source."""
+        budget = (current_rss() or 0) + estimate_layout_memory(len(CONTENT))
+
+        fits = MarkdownViewerApp(CONTENT, max_memory=2 * budget)
+        too_large = MarkdownViewerApp(CONTENT, max_memory=budget)
+
+        assert not fits.fast_mode and not fits.low_memory
+        assert too_large.fast_mode and too_large.low_memory
+
+    def test_watched_files_are_never_paged(self, tmp_path):
+        """Test that the budget does not page documents that change."""
+        path = tmp_path / "doc.md"
+        path.write_text(CONTENT)
+
+        app = MarkdownViewerApp(CONTENT, watch=path, max_memory=1)
+
+        assert not app.fast_mode
+
+    async def test_rendered_blocks_dropped_near_the_budget(self):
+        """Test that the viewer saves memory before reaching the budget."""
+        app = MarkdownViewerApp(CONTENT, max_memory=2**40)
+
+        async with app.run_test() as pilot:
+            await pilot.press("end")
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            assert view.rendered_count > LOW_MEMORY_CACHE_SIZE
+
+            # 85% of the budget: above the high-water mark
+            with patch("txmd.app.current_rss", return_value=2**40 * 0.85):
+                app._check_memory()
+            await pilot.pause()
+
+            assert app.low_memory
+            assert view.cache_size == LOW_MEMORY_CACHE_SIZE
+            assert view.rendered_count <= LOW_MEMORY_CACHE_SIZE
+
+    async def test_tall_screen_of_short_blocks_stays_cached(self):
+        """Test that the cache still holds every block of the screen."""
+        content = "\n\n".join(f"Line {i}." for i in range(300))
+        app = MarkdownViewerApp(content, max_memory=2**40)
+
+        async with app.run_test(size=(80, 120)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            rendered = view.rendered_count
+            assert view.viewport_block_count > LOW_MEMORY_CACHE_SIZE
+
+            with patch("txmd.app.current_rss", return_value=2**40 * 0.85):
+                app._check_memory()
+            await pilot.pause()
+
+            assert app.low_memory
+            assert view.cache_size == view.viewport_block_count
+            assert view.rendered_count == rendered
+
+    async def test_no_budget(self):
+        """Test that memory is not checked without a budget."""
+        app = MarkdownViewerApp(CONTENT)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            with patch("txmd.app.current_rss", return_value=2**50):
+                app._check_memory()
+
+            assert not app.low_memory
@@ -0,0 +1,159 @@
+"""Tests for the on-disk parse cache."""
+
+import os
+from unittest.mock import patch
+
+from txmd.cache import DocumentCache, default_cache_dir
+from txmd.document import Document
+from txmd.search import TrigramIndex
+
+CONTENT = """# Title
+
+Intro text.
+
+```python
+# Not a header
+```
+
+Setext Section
+--------------
+
+### Details ###
+"""
+
+
+class TestDefaultCacheDir:
+    """Tests for default_cache_dir function."""
+
+    def test_uses_xdg_cache_home(self, tmp_path, monkeypatch):
+        """Test that $XDG_CACHE_HOME is honoured."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+        assert default_cache_dir() == tmp_path / "txmd"
+
+    def test_falls_back_to_home_cache(self, tmp_path, monkeypatch):
+        """Test the ~/.cache fallback when the variable is unset."""
+        monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
+        monkeypatch.setenv("HOME", str(tmp_path))
+
+        assert default_cache_dir() == tmp_path / ".cache" / "txmd"
+
+
+class TestDocumentCache:
+    """Tests for the DocumentCache class."""
+
+    def test_miss_returns_none(self, tmp_path):
+        """Test that uncached content is not found."""
+        cache = DocumentCache(tmp_path)
+
+        assert cache.load(CONTENT) is None
+
+    def test_round_trip(self, tmp_path):
+        """Test that a cached document equals the parsed one."""
+        cache = DocumentCache(tmp_path)
+        document = Document(CONTENT)
+        cache.save(CONTENT, document)
+
+        cached = cache.load(CONTENT)
+
+        assert cached is not None
+        assert list(cached) == list(document)
+        assert cached.headers == document.headers
+        assert cached.line_count == document.line_count
+
+    def test_hit_skips_parsing(self, tmp_path):
+        """Test that loading a cached document does not split blocks."""
+        cache = DocumentCache(tmp_path)
+        cache.save(CONTENT, Document(CONTENT))
+
+        with patch("txmd.document.split_blocks") as mock_split:
+            cached = cache.load(CONTENT)
+
+        assert cached is not None
+        mock_split.assert_not_called()
+
+    def test_other_content_misses(self, tmp_path):
+        """Test that entries are keyed by content."""
+        cache = DocumentCache(tmp_path)
+        cache.save(CONTENT, Document(CONTENT))
+
+        assert cache.load(CONTENT + "more\n") is None
+
+    def test_version_change_misses(self, tmp_path):
+        """Test that entries written by another txmd version are ignored."""
+        cache = DocumentCache(tmp_path)
+        cache.save(CONTENT, Document(CONTENT))
+
+        with patch("txmd.cache.__version__", "0.0.0"):
+            assert cache.load(CONTENT) is None
+
+    def test_corrupt_entry_misses(self, tmp_path):
+        """Test that an unreadable entry is treated as a miss."""
+        cache = DocumentCache(tmp_path)
+        cache.save(CONTENT, Document(CONTENT))
+        (entry,) = tmp_path.glob("*.json")
+        entry.write_text('{"ends": [1, 2')
+
+        assert cache.load(CONTENT) is None
+
+    def test_no_temporary_files_left(self, tmp_path):
+        """Test that entries are moved into place atomically."""
+        cache = DocumentCache(tmp_path)
+        cache.save(CONTENT, Document(CONTENT))
+
+        assert [path.suffix for path in tmp_path.iterdir()] == [".json"]
+
+    def test_least_recently_used_evicted(self, tmp_path):
+        """Test that the cache stays within its size bound."""
+        cache = DocumentCache(tmp_path)
+        contents = [f"# Doc {i}\n\ntext\n" for i in range(3)]
+        for content in contents:
+            cache.save(content, Document(content))
+        entry_size = max(p.stat().st_size for p in tmp_path.iterdir())
+
+        # Make the first entry the most recently used one
+        for age, content in enumerate(reversed(contents)):
+            path = tmp_path / f"{cache.key(content)}.json"
+            os.utime(path, (1000 + age, 1000 + age))
+        cache.max_size = 2 * entry_size
+        extra = "# Extra\n"
+        cache.save(extra, Document(extra))
+
+        assert cache.load(contents[0]) is not None
+        assert cache.load(contents[1]) is None
+        assert cache.load(contents[2]) is None
+        assert cache.load(extra) is not None
+
+    def test_unwritable_directory_ignored(self, tmp_path):
+        """Test that failing to write the cache is not an error."""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        cache = DocumentCache(blocker / "txmd")
+
+        cache.save(CONTENT, Document(CONTENT))
+
+        assert cache.load(CONTENT) is None
+
+    def test_search_index_round_trip(self, tmp_path):
+        """Test that a search index is stored next to the document."""
+        cache = DocumentCache(tmp_path)
+        index = TrigramIndex()
+        list(index.index_buffer(CONTENT.encode()))
+
+        assert cache.load_search_index(CONTENT) is None
+        cache.save_search_index(CONTENT, index)
+        cached = cache.load_search_index(CONTENT)
+
+        assert cached is not None
+        assert len(cached) == len(index)
+        assert list(cached.search(CONTENT.encode(), "details")) == [[12]]
+        assert cache.load_search_index(CONTENT + "more") is None
+        assert cache.load(CONTENT) is None
+
+    def test_corrupt_search_index_misses(self, tmp_path):
+        """Test that an unreadable search index is ignored."""
+        cache = DocumentCache(tmp_path)
+        path = tmp_path / f"{cache.key(CONTENT)}.trigrams"
+        path.write_bytes(b"garbage")
+
+        assert cache.load_search_index(CONTENT) is None
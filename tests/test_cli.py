@@ -1,5 +1,6 @@
 """Tests for txmd CLI functionality."""
 
+import json
 from unittest.mock import Mock, patch
 
 import pytest
@@ -7,7 +8,8 @@ import typer
 from typer.testing import CliRunner
 
 from txmd import __version__
-from txmd.cli import MarkdownViewerApp, app, read_stdin, version_callback
+from txmd.app import FAST_MODE_SIZE, MarkdownViewerApp
+from txmd.cli import app, open_stdin_stream, read_stdin, version_callback
 
 
 class TestMarkdownViewerApp:
@@ -149,10 +151,48 @@ class TestReadStdin:
         assert result == "content"
 
 
+class TestOpenStdinStream:
+    """Tests for the open_stdin_stream function."""
+
+    @patch("sys.stdin")
+    def test_returns_none_for_terminal(self, mock_stdin):
+        """Test that no stream is opened when stdin is a TTY."""
+        mock_stdin.isatty.return_value = True
+
+        assert open_stdin_stream() is None
+        mock_stdin.read.assert_not_called()
+
+    def test_detaches_pipe_without_reading(self, tmp_path):
+        """Test that the pipe is duplicated, not consumed."""
+        source = tmp_path / "input.md"
+        source.write_bytes(b"# Streamed")
+        with open(source, "rb") as pipe:
+            with patch("sys.stdin") as mock_stdin, patch(
+                "builtins.open"
+            ) as mock_open_fn:
+                mock_stdin.isatty.return_value = False
+                mock_stdin.fileno.return_value = pipe.fileno()
+
+                stream = open_stdin_stream()
+
+        try:
+            mock_stdin.read.assert_not_called()
+            mock_open_fn.assert_called_once_with("/dev/tty")
+            assert stream.read() == b"# Streamed"
+        finally:
+            stream.close()
+
+
 class TestMainCommand:
     """Tests for the main command function."""
 
-    @patch("txmd.cli.MarkdownViewerApp")
+    @pytest.fixture(autouse=True)
+    def terminal_stdout(self):
+        """Run main() as if stdout were a terminal, so it starts the app."""
+        with patch("sys.stdout.isatty", return_value=True):
+            yield
+
+    @patch("txmd.app.MarkdownViewerApp")
     def test_main_with_file(self, mock_app_class, tmp_path):
         """Test main command with a file argument."""
         # Create a temporary markdown file
@@ -169,11 +209,14 @@ class TestMainCommand:
         with patch("sys.exit"):
             main(test_file)
 
-        # Verify app was created with file content and filename
-        mock_app_class.assert_called_once_with(test_content, "test.md")
+        # Verify app was created with the mapped file and filename
+        mock_app_class.assert_called_once()
+        content, filename = mock_app_class.call_args.args
+        assert bytes(content) == test_content.encode()
+        assert filename == "test.md"
         mock_app_instance.run.assert_called_once()
 
-    @patch("txmd.cli.MarkdownViewerApp")
+    @patch("txmd.app.MarkdownViewerApp")
     @patch("txmd.cli.read_stdin")
     def test_main_with_stdin(self, mock_read_stdin, mock_app_class):
         """Test main command with stdin input."""
@@ -189,7 +232,16 @@ class TestMainCommand:
             main(None)
 
         # Verify app was created with stdin content and None filename
-        mock_app_class.assert_called_once_with(stdin_content, None)
+        mock_app_class.assert_called_once_with(
+            stdin_content,
+            None,
+            follow=None,
+            watch=None,
+            cache=None,
+            fast_size=FAST_MODE_SIZE,
+            fast_lines=None,
+            max_memory=None,
+        )
         mock_app_instance.run.assert_called_once()
 
     @patch("txmd.cli.read_stdin")
@@ -206,7 +258,216 @@ class TestMainCommand:
         assert exc_info.value.code == 1
         mock_print.assert_called()
 
-    @patch("txmd.cli.MarkdownViewerApp")
+    @patch("txmd.app.MarkdownViewerApp")
+    def test_main_with_cache(self, mock_app_class, tmp_path, monkeypatch):
+        """Test that --cache hands the parse cache to the app."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Cached\n\nContent here\n")
+
+        from txmd.cli import main
+
+        main(test_file, cache=True)
+
+        document_cache = mock_app_class.call_args.kwargs["cache"]
+        assert document_cache.directory == tmp_path / "cache" / "txmd"
+
+    @patch("txmd.app.MarkdownViewerApp")
+    def test_main_with_fast_mode_thresholds(self, mock_app_class, tmp_path):
+        """Test that the fast mode thresholds are handed to the app."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Large\n")
+
+        from txmd.cli import main
+
+        main(test_file, fast_size=1024, fast_lines=100)
+
+        assert mock_app_class.call_args.kwargs["fast_size"] == 1024
+        assert mock_app_class.call_args.kwargs["fast_lines"] == 100
+
+    @patch("txmd.profile.Profiler.finish")
+    @patch("txmd.profile.profiled_app")
+    @patch("txmd.app.MarkdownViewerApp")
+    def test_main_with_profile(
+        self, mock_app_class, mock_profiled_app, mock_finish, tmp_path
+    ):
+        """Test that --profile instruments the app and reports on exit."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Test\n")
+
+        from txmd.cli import main
+
+        main(test_file)
+        mock_profiled_app.assert_not_called()
+        mock_app_class.assert_called_once()
+
+        main(test_file, profile=True)
+        app_class, profiler = mock_profiled_app.call_args.args
+        assert app_class is mock_app_class
+        mock_profiled_app.return_value.return_value.run.assert_called_once()
+        assert [span.name for span in profiler.spans] == [
+            "read",
+            "import",
+            "init",
+        ]
+        mock_finish.assert_called_once()
+
+    def test_main_with_replay(self, tmp_path):
+        """Test that --replay presses a key script and reports latency."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Test\n\n" + "Line.\n\n" * 200)
+        script = tmp_path / "session.keys"
+        script.write_text("# scroll\nj*2\n")
+        report = tmp_path / "latency.json"
+        recorded = tmp_path / "recorded.keys"
+
+        from txmd.cli import main
+
+        main(
+            test_file,
+            replay=script,
+            latency_report=report,
+            record_keys=recorded,
+        )
+
+        summary = json.loads(report.read_text())
+        assert summary["scroll_down"]["count"] == 2
+        assert recorded.read_text() == "j*2\n"
+
+    @patch("txmd.app.MarkdownViewerApp")
+    def test_main_with_max_memory(self, mock_app_class, tmp_path):
+        """Test that --max-memory hands the budget to the app in bytes."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Test\n")
+
+        from txmd.cli import main
+
+        main(test_file, max_memory="512M")
+        assert mock_app_class.call_args.kwargs["max_memory"] == 512 * 2**20
+
+        with patch("rich.console.Console.print") as mock_print:
+            with pytest.raises(SystemExit):
+                main(test_file, max_memory="lots")
+        assert "invalid size" in mock_print.call_args.args[0]
+
+    @patch("txmd.server.serve")
+    @patch("txmd.app.MarkdownViewerApp")
+    def test_main_with_server(self, mock_app_class, mock_serve):
+        """Test that --server starts the server instead of the viewer."""
+        from txmd.cli import main
+        from txmd.server import SERVER_IDLE_TIMEOUT
+
+        main(None, server=True)
+        main(None, server=True, idle_timeout=30)
+
+        assert mock_serve.call_args_list[0].args == (SERVER_IDLE_TIMEOUT,)
+        assert mock_serve.call_args_list[1].args == (30,)
+        mock_app_class.assert_not_called()
+
+    @patch("txmd.app.MarkdownViewerApp")
+    @patch("txmd.cli.read_stdin")
+    @patch("txmd.cli.open_stdin_stream")
+    def test_main_with_stream(
+        self, mock_open_stream, mock_read_stdin, mock_app_class
+    ):
+        """Test that --stream starts the app without reading stdin first."""
+        mock_stream = Mock()
+        mock_open_stream.return_value = mock_stream
+
+        from txmd.cli import main
+
+        main(None, stream=True)
+
+        mock_read_stdin.assert_not_called()
+        mock_app_class.assert_called_once_with(
+            "", None, stream=mock_stream, max_memory=None
+        )
+        mock_app_class.return_value.run.assert_called_once()
+
+    @patch("txmd.cli.open_stdin_stream", return_value=None)
+    @patch("rich.console.Console.print")
+    def test_main_stream_without_pipe_exits(self, mock_print, mock_open):
+        """Test that --stream with a terminal stdin reports missing input."""
+        from txmd.cli import main
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(None, stream=True)
+
+        assert exc_info.value.code == 1
+        mock_print.assert_called()
+
+    @patch("txmd.app.MarkdownViewerApp")
+    @patch("txmd.cli.open_stdin_stream")
+    @patch("rich.console.Console.print")
+    def test_main_stream_with_file_exits(
+        self, mock_print, mock_open_stream, mock_app_class, tmp_path
+    ):
+        """Test that --stream is rejected rather than ignored with a file."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Test\n")
+
+        from txmd.cli import main
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(test_file, stream=True)
+
+        assert exc_info.value.code == 1
+        assert "--stream" in mock_print.call_args.args[0]
+        mock_open_stream.assert_not_called()
+        mock_app_class.assert_not_called()
+
+    @patch("txmd.app.MarkdownViewerApp")
+    def test_main_with_follow(self, mock_app_class, tmp_path):
+        """Test that --follow passes the file to watch to the app."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Log\n")
+
+        from txmd.cli import main
+
+        main(test_file, follow=True)
+
+        assert mock_app_class.call_args.kwargs["follow"] == test_file
+        mock_app_class.return_value.run.assert_called_once()
+
+    @patch("txmd.app.MarkdownViewerApp")
+    def test_main_with_watch(self, mock_app_class, tmp_path):
+        """Test that --watch reads a private copy and passes the file."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Draft\n")
+
+        from txmd.cli import main
+
+        main(test_file, watch=True)
+
+        assert mock_app_class.call_args.args[0] == b"# Draft\n"
+        assert mock_app_class.call_args.kwargs["watch"] == test_file
+
+    @patch("rich.console.Console.print")
+    def test_main_follow_and_watch_exit(self, mock_print, tmp_path):
+        """Test that --follow and --watch are mutually exclusive."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Draft\n")
+
+        from txmd.cli import main
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(test_file, follow=True, watch=True)
+
+        assert exc_info.value.code == 1
+
+    @patch("txmd.cli.read_stdin")
+    @patch("rich.console.Console.print")
+    def test_main_follow_without_file_exits(self, mock_print, mock_read):
+        """Test that --follow without a file is reported as an error."""
+        from txmd.cli import main
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(None, follow=True)
+
+        assert exc_info.value.code == 1
+        mock_read.assert_not_called()
+
+    @patch("txmd.app.MarkdownViewerApp")
     def test_main_handles_exceptions(self, mock_app_class, tmp_path):
         """Test that main handles exceptions gracefully."""
         test_file = tmp_path / "test.md"
@@ -222,6 +483,58 @@ class TestMainCommand:
         assert exc_info.value.code == 1
 
 
+class TestRenderOption:
+    """Tests for printing the rendered document instead of the viewer."""
+
+    @patch("txmd.app.MarkdownViewerApp")
+    def test_render_file(self, mock_app_class, tmp_path, capsys):
+        """Test that --render prints the document at the given width."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Title\n\nSome text to wrap at width.\n")
+
+        from txmd.cli import main
+
+        main(test_file, render=True, width=12)
+
+        lines = capsys.readouterr().out.splitlines()
+        assert "Title" in lines[1]
+        assert lines[4:7] == ["Some text to", "wrap at     ", "width.      "]
+        mock_app_class.assert_not_called()
+
+    def test_render_when_stdout_is_not_a_terminal(self, tmp_path):
+        """Test that output to a pipe is rendered without --render."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("## Piped\n\n- item\n")
+
+        runner = CliRunner()
+        result = runner.invoke(app, [str(test_file)])
+
+        assert result.exit_code == 0
+        assert "Piped" in result.output
+        assert "• item" in result.output
+
+    def test_render_stdin(self):
+        """Test that piped input is rendered as it is read."""
+        runner = CliRunner()
+        result = runner.invoke(app, ["--render"], input="Hello *world*\n")
+
+        assert result.exit_code == 0
+        assert result.output.startswith("Hello world")
+
+    @patch("rich.console.Console.print")
+    def test_render_with_follow_exits(self, mock_print, tmp_path):
+        """Test that --follow is refused when rendering."""
+        test_file = tmp_path / "test.md"
+        test_file.write_text("# Log\n")
+
+        from txmd.cli import main
+
+        with pytest.raises(SystemExit) as exc_info:
+            main(test_file, follow=True, render=True)
+
+        assert exc_info.value.code == 1
+
+
 class TestVersionOption:
     """Tests for version option functionality."""
 
@@ -0,0 +1,221 @@
+"""Tests for the parsed document model."""
+
+from unittest.mock import patch
+
+from txmd.document import Document, map_file, match_blocks
+from txmd.toc import build_toc_tree, parse_markdown_headers
+
+
+class TestDocument:
+    """Tests for the Document class."""
+
+    def test_headers_from_blocks(self):
+        """Test that headings are collected while splitting into blocks."""
+        document = Document("# Title\n\nIntro\n\n## Section\n\nBody\n")
+
+        assert len(document) == 4
+        assert document.headers == [(1, "Title", 1), (2, "Section", 5)]
+
+    def test_headers_match_header_scanner(self):
+        """Test that the model agrees with parse_markdown_headers()."""
+        content = """# Title
+
+Text with a # hash.
+
+```python
+# Not a header
+```
+
+Setext Header
+-------------
+
+    # Indented code
+
+~~~~
+## Not a header
+~~~~
+
+### Closed ###
+"""
+        document = Document(content)
+
+        assert document.headers == parse_markdown_headers(content)
+
+    def test_headers_build_toc_tree(self):
+        """Test that the headers feed build_toc_tree() directly."""
+        document = Document("# A\n## B\n## C\n# D\n")
+        roots = build_toc_tree(document.headers)
+
+        assert [node.text for node in roots] == ["A", "D"]
+        assert [node.text for node in roots[0].children] == ["B", "C"]
+
+    def test_append_continues_line_numbers(self):
+        """Test that appended text is numbered after the existing content."""
+        document = Document("# Title\n\ntext\n")
+        blocks = document.append("\n## More\n")
+
+        assert blocks[-1].line_number == 5
+        assert document.headers[-1] == (2, "More", 5)
+        assert document.line_count == 5
+        assert document.content == "# Title\n\ntext\n\n## More\n"
+
+    def test_block_for_line(self):
+        """Test that source lines map to the block containing them."""
+        document = Document("# Title\n\nline a\nline b\n\n## Next\n")
+
+        assert document.block_for_line(1) == 0
+        assert document.block_for_line(4) == 1
+        assert document.block_for_line(6) == 2
+        assert document.block_for_line(99) == 2
+
+    def test_empty_document(self):
+        """Test that an empty document has no blocks or headers."""
+        document = Document()
+
+        assert len(document) == 0
+        assert document.headers == []
+        assert document.block_for_line(1) == 0
+
+
+class TestMatchBlocks:
+    """Tests for comparing two versions of a document."""
+
+    def test_block_hashes_follow_content(self):
+        """Test that equal blocks hash equally, wherever they are."""
+        document = Document("# A\n\ntext\n\n# A\n\nother\n")
+        hashes = document.block_hashes()
+
+        assert len(hashes) == len(document)
+        assert hashes[0] == hashes[2]
+        assert hashes[1] != hashes[3]
+
+    def test_edit_in_the_middle(self):
+        """Test that blocks around an edited block are matched."""
+        old = [1, 2, 3, 4, 5]
+        new = [1, 2, 9, 4, 5]
+
+        assert match_blocks(old, new) == [(0, 0, 2), (3, 3, 2)]
+
+    def test_insert_and_delete(self):
+        """Test that inserted and deleted blocks shift the runs."""
+        assert match_blocks([1, 2, 3], [1, 7, 8, 2, 3]) == [
+            (0, 0, 1),
+            (1, 3, 2),
+        ]
+        assert match_blocks([1, 2, 3, 4], [1, 4]) == [(0, 0, 1), (3, 1, 1)]
+
+    def test_repeated_blocks_match(self):
+        """Test that frequent blocks are not ignored as junk."""
+        old = [0] * 300 + [1]
+        new = [2] + [0] * 300 + [1]
+
+        assert match_blocks(old, new) == [(0, 1, 301)]
+
+    def test_identical_and_empty(self):
+        """Test the degenerate cases."""
+        assert match_blocks([1, 2], [1, 2]) == [(0, 0, 2)]
+        assert match_blocks([], [1]) == []
+
+
+class TestMappedDocument:
+    """Tests for documents backed by UTF-8 encoded bytes."""
+
+    def test_bytes_match_text(self):
+        """Test that parsing bytes gives the same document as text."""
+        content = "# Títle\n\nCafé ☕ text.\n\n## Ünïcode\n\nEnd\n"
+        from_text = Document(content)
+        from_bytes = Document(content.encode())
+
+        assert list(from_bytes) == list(from_text)
+        assert from_bytes.headers == from_text.headers
+        assert from_bytes.content == content
+
+    def test_chunk_boundaries_do_not_matter(self):
+        """Test that blocks and characters split across chunks survive."""
+        content = "".join(
+            f"## Sëction {i}\n\nTëxt {i}.\n\n" for i in range(50)
+        )
+        expected = Document(content)
+
+        with patch("txmd.document.SCAN_CHUNK_SIZE", 7):
+            document = Document(content.encode())
+
+        assert list(document) == list(expected)
+
+    def test_invalid_utf8_replaced(self):
+        """Test that undecodable bytes do not shift later blocks."""
+        data = b"# Title\n\nbad \xff\xfe bytes\n\n## Next\n"
+        document = Document(data)
+
+        assert document.block_text(1) == "bad �� bytes\n\n"
+        assert document.block_text(2) == "## Next\n"
+        assert document.headers[-1] == (2, "Next", 5)
+
+    def test_map_file(self, tmp_path):
+        """Test that a mapped file is parsed without being copied."""
+        path = tmp_path / "doc.md"
+        path.write_text("# Title\n\ntext\n")
+
+        data = map_file(path)
+        document = Document(data)
+
+        assert document.data is data
+        assert document.headers == [(1, "Title", 1)]
+        assert document.block_text(1) == "text\n"
+
+    def test_map_empty_file(self, tmp_path):
+        """Test that an empty file gives an empty document."""
+        path = tmp_path / "empty.md"
+        path.write_text("")
+
+        assert len(Document(map_file(path))) == 0
+
+    def test_append_to_mapped_document(self, tmp_path):
+        """Test that a read-only buffer is copied before appending."""
+        path = tmp_path / "doc.md"
+        path.write_text("# Title\n")
+        document = Document(map_file(path))
+
+        document.append("\n## More\n")
+
+        assert document.content == "# Title\n\n## More\n"
+        assert document.headers[-1] == (2, "More", 3)
+
+    def test_index_round_trip(self):
+        """Test that a document can be rebuilt from its index."""
+        content = "# A\n\ntext\n\nB\n-\n\n```\n# code\n```\n"
+        document = Document(content)
+
+        rebuilt = Document.from_index(content.encode(), document.get_index())
+
+        assert list(rebuilt) == list(document)
+        assert rebuilt.headers == document.headers
+        assert rebuilt.line_count == document.line_count
+
+    def test_replace_tail_after_append(self):
+        """Test that only the end of a grown buffer is parsed again."""
+        old = b"# Title\n\nfirst para"
+        new = old + b"graph\ncontinued\n\n## Next\n\ntext\n"
+        document = Document(old)
+
+        first, blocks = document.scan_tail(new)
+        assert first == 1
+        assert blocks[0].text == "first paragraph\ncontinued\n\n"
+
+        removed = document.replace_tail(new, first, blocks)
+
+        assert removed == []
+        assert list(document) == list(Document(new))
+        assert document.headers == [(1, "Title", 1), (2, "Next", 6)]
+        assert document.line_count == Document(new).line_count
+
+    def test_replace_tail_removes_cut_heading(self):
+        """Test that a heading continued by the new data is replaced."""
+        old = b"# Title\n\n## Nex"
+        new = b"# Title\n\n## Next\n"
+        document = Document(old)
+
+        removed = document.replace_tail(new, *document.scan_tail(new))
+
+        assert removed == [(2, "Nex", 3)]
+        assert document.headers == [(1, "Title", 1), (2, "Next", 3)]
@@ -0,0 +1,135 @@
+"""Tests for the keypress-to-frame latency instrumentation."""
+
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+from txmd.app import MarkdownViewerApp
+from txmd.latency import (
+    LatencyRecorder,
+    format_key_script,
+    instrumented_app,
+    parse_key_script,
+    replay,
+)
+
+CONTENT = "# Title\n\n" + "\n\n".join(
+    f"## Section {i}\n\nText of section {i}." for i in range(50)
+)
+
+
+class TestLatencyRecorder:
+    """Tests for LatencyRecorder class."""
+
+    def test_summary(self):
+        """Test that latencies are summarized in milliseconds."""
+        recorder = LatencyRecorder()
+        for ms in range(1, 101):
+            recorder.record("scroll_down", ms / 1000)
+        recorder.miss("scroll_down")
+        recorder.miss("scroll_up")
+
+        summary = recorder.summary()
+
+        stats = summary["scroll_down"]
+        assert stats["count"] == 100
+        assert stats["missed"] == 1
+        assert stats["p50"] == pytest.approx(50.5)
+        assert stats["p95"] == pytest.approx(95)
+        assert stats["p99"] == pytest.approx(99)
+        assert stats["max"] == pytest.approx(100)
+        # <8, <16, <33, <50, <100, <200, <500, >=500
+        assert stats["buckets"] == [7, 8, 17, 17, 50, 1, 0, 0]
+        assert summary["scroll_up"]["count"] == 0
+        assert summary["scroll_up"]["p50"] is None
+
+    def test_finish(self, tmp_path):
+        """Test that the report is printed and the summary saved."""
+        dump = tmp_path / "latency.json"
+        recorder = LatencyRecorder(dump=dump)
+        recorder.record("page_down", 0.02)
+        recorder.miss("scroll_up")
+        output = io.StringIO()
+
+        recorder.finish(output)
+
+        lines = output.getvalue().splitlines()
+        assert lines[1].split()[:2] == ["action", "keys"]
+        assert lines[2].split()[:3] == ["page_down", "1", "20.0"]
+        assert lines[3].split()[:3] == ["scroll_up", "0+1", "-"]
+        assert json.loads(dump.read_text())["page_down"]["count"] == 1
+
+
+class TestKeyScripts:
+    """Tests for parse_key_script and format_key_script functions."""
+
+    def test_parse(self):
+        """Test that repeats are expanded and comments skipped."""
+        script = "# read\nj*3 space\n  # then the TOC\nt down enter\n"
+
+        assert parse_key_script(script) == [
+            "j", "j", "j", "space", "t", "down", "enter"
+        ]
+
+    def test_invalid_repeat(self):
+        """Test that a bad repeat count is an error."""
+        with pytest.raises(ValueError):
+            parse_key_script("j*0")
+        with pytest.raises(ValueError):
+            parse_key_script("j*x")
+
+    def test_round_trip(self):
+        """Test that formatted keys read back the same."""
+        keys = ["j"] * 5 + ["space", "t"] + ["down"] * 2 + ["enter"]
+
+        script = format_key_script(keys, per_line=2)
+
+        assert script == "j*5 space\nt down*2\nenter\n"
+        assert parse_key_script(script) == keys
+
+
+class TestInstrumentedApp:
+    """Tests for instrumented_app function."""
+
+    async def test_actions(self):
+        """Test that keys are filed under the action they ran."""
+        recorder = LatencyRecorder()
+        keys = []
+        app = instrumented_app(MarkdownViewerApp, recorder, keys)(CONTENT)
+
+        with patch("txmd.latency.FRAME_TIMEOUT", 0.1):
+            await replay(app, ["k", "j", "j", "space", "t"])
+
+        assert keys == ["k", "j", "j", "space", "t"]
+        # Already at the top: scrolling up draws nothing
+        assert recorder.missed == {"scroll_up": 1}
+        assert len(recorder.samples["scroll_down"]) == 2
+        assert len(recorder.samples["page_down"]) == 1
+        assert len(recorder.samples["toggle_toc"]) == 1
+        assert all(
+            0 < sample < 5
+            for samples in recorder.samples.values()
+            for sample in samples
+        )
+        assert type(app).__name__ == "MarkdownViewerApp"
+
+    async def test_toc_jump(self):
+        """Test that selecting a TOC entry is filed as a TOC jump."""
+        recorder = LatencyRecorder()
+        app = instrumented_app(MarkdownViewerApp, recorder)(CONTENT)
+
+        # Expand the top header, then select its third section
+        await replay(app, ["t", "enter", "down", "down", "down", "enter"])
+
+        assert len(recorder.samples["toc_jump"]) == 1
+
+    async def test_quit(self):
+        """Test that a replay stops when the script quits the app."""
+        recorder = LatencyRecorder()
+        app = instrumented_app(MarkdownViewerApp, recorder)(CONTENT)
+
+        await replay(app, ["j", "q", "j"])
+
+        assert len(recorder.samples["scroll_down"]) == 1
@@ -0,0 +1,116 @@
+"""Tests for the memory diagnostics of txmd --memory."""
+
+import io
+import tracemalloc
+from unittest.mock import patch
+
+from txmd.app import MarkdownViewerApp
+from txmd.cli import _app_class
+from txmd.memory import MemoryDiagnostics, diagnosed_app
+from txmd.profile import Profiler
+
+CONTENT = "# Title\n\n" + "\n\n".join(
+    f"## Section {i}\n\nText of section {i}." for i in range(50)
+)
+
+
+class TestMemoryDiagnostics:
+    """Tests for MemoryDiagnostics class."""
+
+    def test_snapshots(self):
+        """Test that snapshots record what was allocated in between."""
+        diagnostics = MemoryDiagnostics()
+        diagnostics.input_size = 2**20
+        diagnostics.start()
+        try:
+            data = [bytes(1000) for _ in range(2000)]
+            diagnostics.snapshot("load")
+            diagnostics.snapshot("load")
+        finally:
+            tracemalloc.stop()
+
+        (snapshot,) = diagnostics.snapshots
+        assert snapshot.name == "load"
+        assert snapshot.traced >= 2_000_000
+        assert snapshot.sites[0].size_diff >= 2_000_000
+        assert snapshot.sites[0].traceback[0].filename == __file__
+        assert len(data) == 2000
+
+    def test_finish(self):
+        """Test that the report lists the snapshots and their sites."""
+        diagnostics = MemoryDiagnostics()
+        diagnostics.input_size = 1000
+        diagnostics.start()
+        data = [bytes(1000) for _ in range(100)]
+        diagnostics.snapshot("load")
+        output = io.StringIO()
+
+        diagnostics.finish(output)
+
+        lines = output.getvalue().splitlines()
+        assert lines[0].startswith("txmd memory (")
+        assert [line.split()[0] for line in lines[2:4]] == ["load", "exit"]
+        # About 100 bytes allocated per byte of input
+        assert float(lines[2].split()[2]) >= 100
+        assert "Top allocations until load:" in lines
+        assert "test_memory.py" in output.getvalue()
+        assert not tracemalloc.is_tracing()
+        assert len(data) == 100
+
+
+class TestDiagnosedApp:
+    """Tests for diagnosed_app function."""
+
+    async def test_phases_of_the_viewer(self):
+        """Test that loading, the first frame and the TOC are snapshot."""
+        diagnostics = MemoryDiagnostics()
+        try:
+            app = diagnosed_app(MarkdownViewerApp, diagnostics)(CONTENT)
+            async with app.run_test() as pilot:
+                await pilot.pause()
+                await pilot.pause()
+
+                # The TOC is built without being shown
+                assert app._toc_built
+                assert not app.toc_visible
+        finally:
+            tracemalloc.stop()
+
+        names = [snapshot.name for snapshot in diagnostics.snapshots]
+        assert names == ["load", "first_render", "toc"]
+        assert diagnostics.input_size == len(CONTENT)
+        assert type(app).__name__ == "MarkdownViewerApp"
+
+    async def test_background_load(self):
+        """Test that a document parsed in the background is snapshot."""
+        diagnostics = MemoryDiagnostics()
+        try:
+            with patch("txmd.app.BACKGROUND_LOAD_SIZE", 100):
+                app = diagnosed_app(MarkdownViewerApp, diagnostics)(CONTENT)
+                async with app.run_test() as pilot:
+                    await app.workers.wait_for_complete()
+                    await pilot.pause()
+        finally:
+            tracemalloc.stop()
+
+        names = [snapshot.name for snapshot in diagnostics.snapshots]
+        assert names == ["first_render", "load", "toc"]
+
+    async def test_with_the_profiler(self):
+        """Test that --memory and --profile both see the first frame."""
+        diagnostics = MemoryDiagnostics()
+        profiler = Profiler()
+        try:
+            app_class = _app_class(
+                MarkdownViewerApp, profiler, diagnostics=diagnostics
+            )
+            app = app_class(CONTENT)
+            async with app.run_test() as pilot:
+                await pilot.pause()
+                await pilot.pause()
+        finally:
+            tracemalloc.stop()
+
+        names = [snapshot.name for snapshot in diagnostics.snapshots]
+        assert names == ["load", "first_render", "toc"]
+        assert "first_paint" in [span.name for span in profiler.spans]
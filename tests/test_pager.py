@@ -0,0 +1,161 @@
+"""Tests for the line-oriented fast mode."""
+
+from typing import Tuple
+
+from txmd.pager import (
+    LineIndex,
+    exceeds_threshold,
+    highlight_line,
+    scan_lines,
+)
+from txmd.toc import parse_markdown_headers
+
+SAMPLE = (
+    "# Title\n"
+    "\n"
+    "Intro with **bold** text.\n"
+    "\n"
+    "```python\n"
+    "# not a header\n"
+    "```\n"
+    "\n"
+    "Setext\n"
+    "------\n"
+    "\n"
+    "## Section\n"
+    "last line"
+)
+
+
+def scan(content: str, chunk_size: int = 0) -> Tuple[LineIndex, list]:
+    """Index content with scan_lines(), returning the index and headers."""
+    data = content.encode()
+    index = LineIndex(data)
+    headers = []
+    for chunk in scan_lines(data, chunk_size or None):
+        index.add_chunk(chunk)
+        headers.extend(chunk.headers)
+    return index, headers
+
+
+class TestExceedsThreshold:
+    """Tests for exceeds_threshold function."""
+
+    def test_size_limit(self):
+        """Test that content larger than the size limit exceeds it."""
+        assert exceeds_threshold(b"x" * 11, size=10)
+        assert not exceeds_threshold(b"x" * 10, size=10)
+
+    def test_line_limit(self):
+        """Test that lines are counted for bytes and for text."""
+        assert exceeds_threshold(b"a\n" * 5, lines=5)
+        assert exceeds_threshold("a\n" * 5, lines=5)
+        assert not exceeds_threshold(b"a\n" * 4, lines=5)
+
+    def test_no_limits(self):
+        """Test that nothing exceeds missing limits."""
+        assert not exceeds_threshold(b"a\n" * 100)
+
+
+class TestScanLines:
+    """Tests for scan_lines function."""
+
+    def test_headers_match_the_toc_parser(self):
+        """Test that the headers are those of parse_markdown_headers()."""
+        index, headers = scan(SAMPLE)
+
+        assert headers == parse_markdown_headers(SAMPLE)
+        assert len(index) == 13
+
+    def test_small_chunks(self):
+        """Test that chunk boundaries do not change the outcome."""
+        for chunk_size in (1, 3, 7, 16):
+            index, headers = scan(SAMPLE, chunk_size)
+
+            assert headers == parse_markdown_headers(SAMPLE)
+            assert [index.line(n) for n in range(1, 14)] == SAMPLE.split(
+                "\n"
+            )
+
+    def test_code_fences(self):
+        """Test that fenced lines, fences included, are code."""
+        index, _ = scan(SAMPLE, 4)
+
+        assert [n for n in range(1, 14) if index.in_code(n)] == [5, 6, 7]
+
+    def test_unclosed_fence_runs_to_the_end(self):
+        """Test that an unclosed fence makes the rest of the file code."""
+        index, headers = scan("text\n~~~\n# code\nmore\n")
+
+        assert index.in_code(4)
+        assert headers == []
+
+    def test_thematic_break_is_no_header(self):
+        """Test that a dash line after a blank line is not a header."""
+        _, headers = scan("text\n\n---\n- item\n---\n")
+
+        assert headers == []
+
+    def test_multiline_setext_header(self):
+        """Test that a paragraph of several lines can be a setext header."""
+        content = "# Title\n\nA header on\ntwo lines\n===\n\ntext\n"
+
+        for chunk_size in (0, 1, 5, 16):
+            _, headers = scan(content, chunk_size)
+
+            assert headers == [
+                (1, "Title", 1),
+                (1, "A header on two lines", 3),
+            ]
+            assert headers == parse_markdown_headers(content)
+
+    def test_html_blocks_are_opaque(self):
+        """Test that header lines inside HTML blocks are no headers."""
+        content = (
+            "<div>\n# Not a header\n</div>\n\n"
+            "<!--\n\n# Commented out\n-->\n"
+            "text\n<span>\n# Header\n"
+        )
+
+        for chunk_size in (0, 1, 5, 16):
+            _, headers = scan(content, chunk_size)
+
+            assert headers == [(1, "Header", 11)]
+            assert headers == parse_markdown_headers(content)
+
+    def test_empty_buffer(self):
+        """Test that an empty buffer has no lines."""
+        index, _ = scan("")
+
+        assert len(index) == 0
+
+
+class TestHighlightLine:
+    """Tests for highlight_line function."""
+
+    def test_header_styled_whole(self):
+        """Test that a header line takes its level's style."""
+        assert highlight_line("## Section").style == "markdown.h2"
+
+    def test_code_line(self):
+        """Test that code lines are not styled inline."""
+        text = highlight_line("**not bold**", code=True)
+
+        assert text.style == "markdown.code_block"
+        assert not text.spans
+
+    def test_inline_markup(self):
+        """Test that emphasis and code spans are styled, markup kept."""
+        text = highlight_line("a **b** *c* `d`")
+        styles = {text.plain[s.start : s.end]: s.style for s in text.spans}
+
+        assert text.plain == "a **b** *c* `d`"
+        assert styles == {
+            "**b**": "markdown.strong",
+            "*c*": "markdown.em",
+            "`d`": "markdown.code",
+        }
+
+    def test_list_bullet_is_not_emphasis(self):
+        """Test that a '*' bullet does not start emphasized text."""
+        assert not highlight_line("* one * two").spans
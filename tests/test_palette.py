@@ -0,0 +1,105 @@
+"""Tests for the fuzzy section matcher."""
+
+import time
+
+from txmd.palette import HeaderMatcher
+from txmd.toc import HeaderIndex
+
+
+def _headers(*titles):
+    """Build a HeaderIndex with one level 2 header per title."""
+    headers = HeaderIndex()
+    for line, title in enumerate(titles, start=1):
+        headers.append(2, title, line)
+    return headers
+
+
+class TestHeaderMatcher:
+    """Tests for ranking headers against a query."""
+
+    def test_tiers(self):
+        """Test that prefix, word, substring and fuzzy matches rank so."""
+        headers = _headers(
+            "Uninstalling",  # substring
+            "Quick install",  # word start
+            "Installation",  # prefix
+            "Initial setup",  # no match
+            "Instructions for all",  # fuzzy
+        )
+        matcher = HeaderMatcher(headers)
+
+        assert matcher.match("install") == [2, 1, 0, 4]
+
+    def test_case_and_punctuation_ignored(self):
+        """Test that queries match whatever the case and separators."""
+        headers = _headers("API_Reference", "txmd.cli module", "Other")
+        matcher = HeaderMatcher(headers)
+
+        assert matcher.match("api ref") == [0]
+        assert matcher.match("  CLI ") == [1]
+        assert matcher.match("txmd/cli") == [1]
+
+    def test_empty_query_lists_first_headers(self):
+        """Test that an empty query lists the headers in order."""
+        matcher = HeaderMatcher(_headers(*"abcdef"), limit=4)
+
+        assert matcher.match("") == [0, 1, 2, 3]
+        assert HeaderMatcher(HeaderIndex()).match("a") == []
+
+    def test_limit(self):
+        """Test that at most ``limit`` results are returned, best first."""
+        headers = _headers(*[f"Section {i}" for i in range(100)], "Sect")
+        matcher = HeaderMatcher(headers, limit=10)
+
+        assert matcher.match("sect") == list(range(10))
+        assert matcher.match("section 9") == [9] + list(range(90, 99))
+
+    def test_extended_query_reuses_matches(self):
+        """Test that a longer query only scans the previous matches."""
+        headers = _headers(
+            *[f"Chapter {i}" for i in range(200)], "Glossary", "Gloss"
+        )
+        matcher = HeaderMatcher(headers)
+
+        assert matcher.match("glo") == [200, 201]
+        narrowed = matcher._narrowed
+        assert narrowed is not None and narrowed[0] == "glo"
+
+        assert matcher.match("glos") == [200, 201]
+        assert matcher.match("gloss") == [200, 201]
+        assert matcher.match("glossa") == [200]
+        assert matcher.match("glossary") == [200]
+        assert matcher._narrowed[0] == "glossary"
+
+        # A different query scans all the titles again
+        assert matcher.match("chapter 199") == [199]
+        assert matcher.match("gl") == [200, 201]
+
+    def test_matches_agree_with_full_scan(self):
+        """Test that reusing matches gives the results of a fresh matcher."""
+        titles = [f"{a} {b}" for a in ("red", "green") for b in "xyz"]
+        headers = _headers(*titles)
+        matcher = HeaderMatcher(headers, limit=5)
+
+        for query in ("g", "gr", "gre", "gree", "green", "green y", "r", "rx"):
+            expected = HeaderMatcher(headers, limit=5).match(query)
+            assert matcher.match(query) == expected, query
+
+    def test_ranking_is_fast_for_many_headers(self):
+        """Test that each keystroke ranks 100k headers within a frame."""
+        words = ["install", "server", "render", "table", "cache", "option"]
+        headers = HeaderIndex()
+        for i in range(100_000):
+            title = " ".join(words[(i * k) % len(words)] for k in (1, 5, 7))
+            headers.append(2, f"{title} {i}", i + 1)
+        matcher = HeaderMatcher(headers)
+
+        slowest = 0.0
+        for query in ("render", "srvr", "cache 4242", "tbl 9", "zebra"):
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                matcher.match(query[:end])
+                slowest = max(slowest, time.perf_counter() - start)
+
+        # One frame at 60 fps, with headroom for slow CI machines
+        assert slowest < 0.05
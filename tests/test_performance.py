@@ -0,0 +1,286 @@
+"""Performance regression tests, compared with stored baselines.
+
+These tests are marked ``perf`` and skipped unless pytest is given
+``--perf``. They time the header scanner, the TOC tree builder and the
+startup of the headless viewer on documents generated by
+``benchmarks/corpus.py``, and fail if a timing exceeds its baseline in
+``perf_baselines.json`` by more than its tolerance::
+
+    pytest --perf tests/test_performance.py
+
+The header scanner is also raced against a plain line-by-line pass, with
+a fixed limit that recording new baselines does not change.
+
+Timings are stored in units of a calibration loop, timed between the runs
+of every test, so that baselines recorded on one machine hold on a faster
+or slower one, and on a machine whose speed varies. After a deliberate
+change, record new baselines with ``--update-baselines`` and commit the
+file.
+"""
+
+import asyncio
+import json
+import platform
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import pytest
+
+from benchmarks.corpus import PRESETS, CorpusSpec, generate_document
+from benchmarks.suite import time_calls, time_viewer
+from txmd.document import Document
+from txmd.toc import build_toc_tree, parse_markdown_headers
+
+pytestmark = pytest.mark.perf
+
+# Baselines of the tests, in calibration units
+BASELINES_FILE = Path(__file__).with_name("perf_baselines.json")
+
+# Slowdown over the baseline above which a test fails; the startup of the
+# viewer depends on the event loop and the scheduler, and varies more
+TOLERANCE = 0.5
+STARTUP_TOLERANCE = 1.0
+
+# Runs of every timed call: the fastest counts, as the least disturbed
+REPEAT = 5
+STARTUP_REPEAT = 3
+
+# Corpora of the scanner and tree builder tests
+CORPORA = ("medium", "headers")
+
+# Most time the header scanner may take, relative to split_line_headers()
+# on the same document. It is about half, where a scanner that processes
+# every line in Python takes twice as long or more.
+LINE_SPLIT_LIMIT = 0.8
+
+# Patterns of split_line_headers()
+_HEADER_LINE = re.compile(r"^(#{1,6})\s+(.+?)(?:\s*#*)?$")
+_FENCE_LINE = re.compile(r"^```|^~~~")
+
+
+def count_words(text: str) -> int:
+    """Count the distinct words of text: the calibration workload.
+
+    Like the code under test, it splits lines and fills a dict in pure
+    Python, so machines and interpreters scale both alike.
+    """
+    counts: Dict[str, int] = {}
+    for line in text.splitlines():
+        for word in line.split():
+            counts[word] = counts.get(word, 0) + 1
+    return len(counts)
+
+
+def split_line_headers(content: str) -> List[Tuple[int, str, int]]:
+    """Find the ATX headers of text with a plain line-by-line pass.
+
+    This is the header parser txmd started with: it splits the lines and
+    matches a regex on each, and knows nothing of setext headers or HTML
+    blocks. The scanner has to stay well ahead of it.
+    """
+    headers = []
+    in_code_block = False
+    for line_num, line in enumerate(content.split("\n"), start=1):
+        stripped = line.strip()
+        if _FENCE_LINE.match(stripped):
+            in_code_block = not in_code_block
+            continue
+        if in_code_block or line.startswith(("    ", "\t")):
+            continue
+        match = _HEADER_LINE.match(stripped)
+        if match:
+            headers.append((len(match.group(1)), match.group(2), line_num))
+    return headers
+
+
+class Baselines:
+    """Compare timings with their baselines, or record new ones.
+
+    Attributes:
+        data (Dict[str, Any]): The content of ``BASELINES_FILE``.
+        update (bool): Record the timings instead of comparing them.
+    """
+
+    def __init__(self, data: Dict[str, Any], update: bool):
+        self.data = data
+        self.update = update
+        self._text = generate_document(CorpusSpec(size=200_000, seed=1))
+
+    def calibrate(self) -> float:
+        """Return the seconds taken by the calibration loop, at best."""
+        return min(time_calls(lambda: count_words(self._text), 3))
+
+    def measure(
+        self, func: Callable[[], Any], repeat: int = REPEAT
+    ) -> Tuple[float, float]:
+        """Time func, alternating with the calibration loop.
+
+        Calls that are much faster than the loop are timed in batches that
+        last about as long, as a single one would be lost in the noise.
+
+        Returns:
+            Tuple[float, float]: The fastest call of func, as the average
+                of its batch, and the fastest calibration loop, in seconds.
+        """
+        runs = []
+        loops = []
+        number = 0
+        for _ in range(repeat):
+            loops.append(self.calibrate())
+            if not number:
+                first = time_calls(func, 1)[0]
+                number = max(1, min(100, round(loops[0] / max(first, 1e-6))))
+            runs.append(sum(time_calls(func, number)) / number)
+        return min(runs), min(loops)
+
+    def check(
+        self,
+        name: str,
+        seconds: float,
+        calibration: float,
+        tolerance: float = TOLERANCE,
+    ) -> None:
+        """Fail if a timing regressed beyond tolerance, or record it.
+
+        Args:
+            name (str): The name of the baseline.
+            seconds (float): The timing.
+            calibration (float): The calibration loop, timed alongside.
+            tolerance (float): The allowed slowdown, e.g. 0.5 for 50%.
+        """
+        units = seconds / calibration
+        if self.update:
+            self.data["baselines"][name] = {
+                "units": round(units, 4),
+                "ms": round(seconds * 1000, 3),
+            }
+            return
+
+        baseline = self.data["baselines"].get(name)
+        if baseline is None:
+            pytest.fail(
+                f"no baseline for {name}: record it with --update-baselines"
+            )
+        limit = baseline["units"] * (1 + tolerance)
+        assert units <= limit, (
+            f"{name} took {units:.3f} calibration units "
+            f"({seconds * 1000:.1f} ms), more than {tolerance:.0%} over "
+            f"its baseline of {baseline['units']:.3f}"
+        )
+
+
+@pytest.fixture(scope="module")
+def baselines(request: pytest.FixtureRequest) -> Iterator[Baselines]:
+    """The baselines, saved at the end with --update-baselines."""
+    update = request.config.getoption("--update-baselines")
+    if BASELINES_FILE.exists():
+        data = json.loads(BASELINES_FILE.read_text())
+    else:
+        data = {"baselines": {}}
+
+    checker = Baselines(data, update)
+    yield checker
+
+    if update:
+        data["recorded_on"] = {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "calibration_ms": round(checker.calibrate() * 1000, 3),
+        }
+        BASELINES_FILE.write_text(
+            json.dumps(data, indent=2, sort_keys=True) + "\n"
+        )
+
+
+@pytest.fixture(scope="module")
+def documents() -> Dict[str, str]:
+    """The generated documents, by corpus name."""
+    return {
+        name: generate_document(PRESETS[name])
+        for name in ("small",) + CORPORA
+    }
+
+
+class TestHeaderScanner:
+    """Performance tests of the header scanners."""
+
+    @pytest.mark.parametrize("corpus", CORPORA)
+    def test_parse_markdown_headers(self, corpus, documents, baselines):
+        """Test the speed of the TOC header scanner."""
+        content = documents[corpus]
+
+        seconds, calibration = baselines.measure(
+            lambda: parse_markdown_headers(content)
+        )
+
+        baselines.check(
+            f"parse_markdown_headers[{corpus}]", seconds, calibration
+        )
+
+    @pytest.mark.parametrize("corpus", CORPORA)
+    def test_parse_markdown_headers_beats_line_split(self, corpus, documents):
+        """Test that the scanner beats a line-by-line pass by a margin."""
+        content = documents[corpus]
+        runs: Dict[Callable[[str], Any], List[float]] = {
+            split_line_headers: [],
+            parse_markdown_headers: [],
+        }
+
+        for _ in range(REPEAT):
+            for parse, times in runs.items():
+                times += time_calls(lambda: parse(content), 1)
+
+        reference = min(runs[split_line_headers])
+        scanner = min(runs[parse_markdown_headers])
+        assert scanner <= reference * LINE_SPLIT_LIMIT, (
+            f"parse_markdown_headers[{corpus}] took {scanner * 1000:.1f} ms, "
+            f"more than {LINE_SPLIT_LIMIT:.0%} of the "
+            f"{reference * 1000:.1f} ms of a line-by-line pass"
+        )
+
+    @pytest.mark.parametrize("corpus", CORPORA)
+    def test_document_scan(self, corpus, documents, baselines):
+        """Test the speed of the viewer's block and header scanner."""
+        data = documents[corpus].encode()
+
+        seconds, calibration = baselines.measure(lambda: Document(data))
+
+        baselines.check(f"document_scan[{corpus}]", seconds, calibration)
+
+
+class TestTreeBuilder:
+    """Performance tests of the TOC tree builder."""
+
+    @pytest.mark.parametrize("corpus", CORPORA)
+    def test_build_toc_tree(self, corpus, documents, baselines):
+        """Test the speed of building the tree of all the headers."""
+        headers = parse_markdown_headers(documents[corpus])
+
+        seconds, calibration = baselines.measure(
+            lambda: build_toc_tree(headers)
+        )
+
+        baselines.check(f"build_toc_tree[{corpus}]", seconds, calibration)
+
+
+class TestStartup:
+    """Performance tests of the startup of the headless viewer."""
+
+    @pytest.mark.parametrize("corpus", ("small", "medium"))
+    def test_first_frame(self, corpus, documents, baselines):
+        """Test the time from creating the app to its first frame."""
+        runs = []
+        loops = []
+        for _ in range(STARTUP_REPEAT):
+            loops.append(baselines.calibrate())
+            runs.append(asyncio.run(time_viewer(documents[corpus], jumps=0)))
+
+        for name in ("first_frame", "load"):
+            baselines.check(
+                f"{name}[{corpus}]",
+                min(run[name][0] for run in runs),
+                min(loops),
+                STARTUP_TOLERANCE,
+            )
@@ -0,0 +1,98 @@
+"""Tests for the --profile phase timings."""
+
+import io
+import pstats
+from unittest.mock import patch
+
+from txmd.app import MarkdownViewerApp
+from txmd.profile import Profiler, profiled_app
+
+CONTENT = "# Title\n\n" + "\n\n".join(
+    f"## Section {i}\n\nText of section {i}." for i in range(50)
+)
+
+
+class TestProfiler:
+    """Tests for Profiler class."""
+
+    def test_span(self):
+        """Test that a span records its timings."""
+        profiler = Profiler()
+
+        with profiler.span("read"):
+            sum(range(10000))
+
+        (span,) = profiler.spans
+        assert span.name == "read"
+        assert span.start >= 0
+        assert span.wall > 0
+        assert span.cpu >= 0
+
+    def test_unfinished_and_unstarted_phases(self):
+        """Test that phases missing an end or a start are left out."""
+        profiler = Profiler()
+
+        profiler.start("first_paint")
+        profiler.stop("load")
+
+        assert profiler.spans == []
+
+    def test_from_origin(self):
+        """Test that a phase can be timed from the start of the run."""
+        profiler = Profiler()
+        profiler.start("first_paint", from_origin=True)
+        profiler.stop("first_paint")
+
+        assert profiler.spans[0].start == 0
+
+    def test_finish(self, tmp_path):
+        """Test that the report lists the phases in starting order."""
+        dump = tmp_path / "txmd.prof"
+        profiler = Profiler(dump=dump)
+        profiler.start("load")
+        with profiler.span("read"):
+            pass
+        profiler.stop("load")
+        output = io.StringIO()
+
+        profiler.finish(output)
+
+        lines = output.getvalue().splitlines()
+        assert lines[0].startswith("txmd profile (")
+        assert [line.split()[0] for line in lines[2:4]] == ["load", "read"]
+        assert pstats.Stats(str(dump)).total_calls > 0
+
+
+class TestProfiledApp:
+    """Tests for profiled_app function."""
+
+    async def test_phases_of_the_viewer(self):
+        """Test that mounting, painting and the TOC are timed."""
+        profiler = Profiler()
+        app = profiled_app(MarkdownViewerApp, profiler)(CONTENT)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            await pilot.press("t")
+            await pilot.pause()
+
+            # The app's own mount handler still ran
+            assert app.title == "Markdown Viewer"
+
+        names = [span.name for span in profiler.spans]
+        assert {"compose", "on_mount", "first_paint", "populate_toc"} <= set(
+            names
+        )
+        assert type(app).__name__ == "MarkdownViewerApp"
+
+    async def test_background_load(self):
+        """Test that parsing a large document in the background is timed."""
+        profiler = Profiler()
+
+        with patch("txmd.app.BACKGROUND_LOAD_SIZE", 100):
+            app = profiled_app(MarkdownViewerApp, profiler)(CONTENT)
+            async with app.run_test() as pilot:
+                await app.workers.wait_for_complete()
+                await pilot.pause()
+
+        assert "load" in [span.name for span in profiler.spans]
@@ -0,0 +1,130 @@
+"""Tests for rendering markdown without the viewer."""
+
+import io
+import random
+import tracemalloc
+
+from rich.console import Console
+from rich.markdown import Markdown
+
+from txmd.blocks import split_blocks
+from txmd.render import render_blocks, render_stream
+
+
+def _console(width=40, terminal=False):
+    """Create a console rendering to a string."""
+    return Console(file=io.StringIO(), width=width, force_terminal=terminal)
+
+
+def _rich_output(text, width=40, terminal=False):
+    """Render markdown block by block with Rich alone."""
+    console = _console(width, terminal)
+    for block in split_blocks(text):
+        console.print(Markdown(block.text))
+        console.line()
+    return console.file.getvalue()
+
+
+class TestRenderBlocks:
+    """Tests for rendering parsed blocks."""
+
+    def test_matches_rich(self):
+        """Test that the output is the same as rendering with Rich."""
+        text = """# Title
+
+A plain paragraph that is long enough to be wrapped
+over a few lines of output.
+
+Text with **bold**, `code` and _emphasis_.
+
+- a list
+- of items
+
+```python
+print("code")
+```
+
+| a | b |
+|---|---|
+| 1 | 2 |
+"""
+        for terminal in (False, True):
+            console = _console(terminal=terminal)
+            render_blocks(split_blocks(text), console)
+
+            assert console.file.getvalue() == _rich_output(
+                text, terminal=terminal
+            )
+
+    def test_plain_paragraphs_match_rich(self):
+        """Test that wrapping plain paragraphs directly changes nothing."""
+        words = (
+            "a I lorem ipsum, dolor. sit (amet) 50% x+y=z tempor-incididunt"
+            " and/or 12 #tag 'quoted' \"double\" supercalifragilistic"
+        ).split()
+        rng = random.Random(3)
+        for _ in range(200):
+            lines = []
+            for _ in range(rng.randint(1, 4)):
+                line = [rng.choice(words) for _ in range(rng.randint(1, 15))]
+                lines.append(" ".join(["word"] + line))
+            text = "\n".join(lines) + "\n\n"
+            width = rng.choice([10, 20, 33, 80])
+
+            console = _console(width)
+            render_blocks(split_blocks(text), console)
+
+            assert console.file.getvalue() == _rich_output(text, width), text
+
+
+class TestRenderStream:
+    """Tests for rendering markdown read from a stream."""
+
+    def test_chunks_do_not_matter(self):
+        """Test that blocks and characters cut across reads survive."""
+        text = "".join(
+            f"## Sëction {i}\n\nTëxt {i} with *emphasis*.\n\n"
+            for i in range(20)
+        )
+        console = _console()
+
+        render_stream(io.BytesIO(text.encode()), console, chunk_size=7)
+
+        assert console.file.getvalue() == _rich_output(text)
+
+    def test_blocks_written_as_they_arrive(self):
+        """Test that complete blocks are shown before the input ends."""
+        console = _console()
+        seen = []
+
+        class Source:
+            chunks = [b"# First\n\nOne\n", b"\nTwo\n", b""]
+
+            def read(self, size):
+                seen.append(console.file.getvalue())
+                return self.chunks.pop(0)
+
+        render_stream(Source(), console)
+
+        assert seen[0] == ""
+        assert "First" in seen[1] and "One" not in seen[1]
+        assert "One" in seen[2] and "Two" not in seen[2]
+        assert "Two" in console.file.getvalue()
+
+    def test_memory_does_not_grow_with_input(self):
+        """Test that rendering does not keep the input or the output."""
+        paragraph = b"Some words to wrap in the output.\n" * 5 + b"\n"
+        small = io.BytesIO(paragraph * 1_000)
+        large = io.BytesIO(paragraph * 20_000)
+
+        peaks = []
+        for source in (small, large):
+            console = Console(file=open("/dev/null", "w"), width=80)
+            tracemalloc.start()
+            render_stream(source, console)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            console.file.close()
+
+        # 4 MB of input, rendered with a few chunks' worth of memory
+        assert peaks[1] < 2 * max(peaks[0], 1_000_000)
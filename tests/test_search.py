@@ -0,0 +1,150 @@
+"""Tests for the in-document search."""
+
+import pytest
+
+from txmd.search import SearchResults, TrigramIndex, search_buffer
+
+
+def find_lines(data, query, chunk_size=None):
+    """Search a buffer and return all the matching lines."""
+    if chunk_size is None:
+        chunks = search_buffer(data, query)
+    else:
+        chunks = search_buffer(data, query, chunk_size)
+    return [line for lines in chunks for line in lines]
+
+
+class TestSearchBuffer:
+    """Tests for the search_buffer function."""
+
+    DATA = b"# Title\n\nSome text.\nMore TEXT, and text.\n\n## Text\n"
+
+    def test_lines_of_matches(self):
+        """Test that every matching line is reported once, in order."""
+        assert find_lines(self.DATA, "text") == [3, 4, 6]
+
+    def test_smartcase(self):
+        """Test that an uppercase letter makes the search case-sensitive."""
+        assert find_lines(self.DATA, "TEXT") == [4]
+        assert find_lines(self.DATA, "Text") == [6]
+
+    def test_no_match_and_empty_query(self):
+        """Test that nothing is found for missing text or no query."""
+        assert find_lines(self.DATA, "missing") == []
+        assert find_lines(self.DATA, "") == []
+
+    def test_chunk_boundaries_do_not_matter(self):
+        """Test that matches split across chunks are found."""
+        data = "".join(f"line {i} needle\nfiller\n" for i in range(40))
+        expected = find_lines(data.encode(), "needle")
+
+        for chunk_size in (1, 3, 7, 64):
+            assert find_lines(data.encode(), "needle", chunk_size) == expected
+        assert expected == list(range(1, 80, 2))
+
+    def test_utf8_query(self):
+        """Test that non-ASCII text is searched as UTF-8."""
+        data = "# Café\n\nthé ☕\n".encode()
+
+        assert find_lines(data, "☕") == [3]
+        assert find_lines(data, "café") == [1]
+        assert find_lines(data, "CAFÉ") == []
+
+    def test_streams_chunks(self):
+        """Test that matches are yielded chunk by chunk."""
+        data = b"a\nb\na\n"
+
+        chunks = list(search_buffer(data, "a", 2))
+
+        assert chunks == [[1], [], [3]]
+
+
+class TestSearchResults:
+    """Tests for navigating between matches."""
+
+    def test_next_and_previous(self):
+        """Test that neighbouring matches are found by line."""
+        results = SearchResults("x")
+        results.extend([3, 10])
+        results.extend([25])
+
+        assert len(results) == 3
+        assert results.next_match(0) == 0
+        assert results.next_match(3) == 1
+        assert results.next_match(25) is None
+        assert results.previous_match(25) == 1
+        assert results.previous_match(26) == 2
+        assert results.previous_match(3) is None
+
+
+class TestTrigramIndex:
+    """Tests for the trigram index."""
+
+    DATA = "".join(
+        f"## Section {i}\n\nParagraph {i} about café №{i % 7}.\n\n"
+        for i in range(300)
+    ).encode()
+
+    def build(self, data, segment_size=256):
+        """Index a buffer in small segments."""
+        index = TrigramIndex()
+        for _ in index.index_buffer(data, segment_size):
+            pass
+        return index
+
+    def test_same_lines_as_linear_search(self):
+        """Test that indexed searches find exactly the same lines."""
+        index = self.build(self.DATA)
+
+        assert index.segment_count > 10
+        for query in ("section 12", "Section 299", "café №3", "CAFÉ", "a", ""):
+            assert find_lines(self.DATA, query) == [
+                line
+                for lines in index.search(self.DATA, query)
+                for line in lines
+            ]
+
+    def test_candidates_narrow_the_search(self):
+        """Test that only segments with every trigram are searched."""
+        index = self.build(self.DATA)
+
+        assert len(index.candidates("Paragraph 123")) < 5
+        assert index.candidates("missing") == []
+        # Without trigrams every segment is a candidate
+        assert len(index.candidates("a")) == index.segment_count
+
+    def test_grown_buffer_searched_past_index(self):
+        """Test that bytes added after indexing are still searched."""
+        index = self.build(self.DATA)
+        grown = self.DATA + b"\nneedle\npartial needle"
+
+        assert index.size == len(self.DATA)
+        assert find_lines(grown, "needle") == [
+            line for lines in index.search(grown, "needle") for line in lines
+        ]
+
+    def test_partial_last_line_not_indexed(self):
+        """Test that a line without its newline is left for later."""
+        index = self.build(b"first line\nsecond")
+
+        assert index.size == len(b"first line\n")
+
+    def test_serialization_round_trip(self):
+        """Test that a restored index searches like the original."""
+        index = self.build(self.DATA)
+
+        restored = TrigramIndex.from_bytes(index.to_bytes())
+
+        assert len(restored) == len(index)
+        assert restored.size == index.size
+        assert list(restored.search(self.DATA, "café №5")) == list(
+            index.search(self.DATA, "café №5")
+        )
+
+    def test_invalid_data_rejected(self):
+        """Test that truncated or foreign data raises ValueError."""
+        data = self.build(self.DATA).to_bytes()
+
+        for bad in (b"", b"x" * 100, data[:-1]):
+            with pytest.raises(ValueError):
+                TrigramIndex.from_bytes(bad)
@@ -0,0 +1,216 @@
+"""Tests for the warm server and the client handing commands to it."""
+
+import io
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+import txmd.server
+from txmd.server import (
+    NO_SERVER_ENV,
+    _accept,
+    _code_version,
+    delegate,
+    server_address,
+    server_supported,
+)
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32" or not server_supported(),
+    reason="the server needs Unix sockets",
+)
+
+
+@pytest.fixture
+def runtime_dir(tmp_path, monkeypatch) -> Path:
+    """Point the server socket at a temporary directory."""
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.delenv(NO_SERVER_ENV, raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def piped(monkeypatch) -> None:
+    """Make stdin and stdout pipes, like a command in a script."""
+    monkeypatch.setattr(sys, "stdin", io.StringIO())
+    monkeypatch.setattr(sys, "stdout", io.StringIO())
+
+
+def fake_server(
+    path: Path, reply: bytes, requests: List[Dict]
+) -> socket.socket:
+    """Serve one client on path, answering with reply then status 3."""
+    path.parent.mkdir(mode=0o700)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen()
+
+    def serve() -> None:
+        conn, _ = listener.accept()
+        with conn:
+            header, fds, _, _ = socket.recv_fds(conn, 4, 3)
+            for fd in fds:
+                os.close(fd)
+            size = struct.unpack("!I", header)[0]
+            payload = b""
+            while len(payload) < size:
+                payload += conn.recv(size - len(payload))
+            requests.append({"fds": len(fds), **json.loads(payload)})
+            conn.sendall(reply)
+            if reply == b"+":
+                conn.sendall(struct.pack("!i", 3))
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener
+
+
+def run_txmd(*args: str, env: Dict[str, str], cwd: Path):
+    """Run ``python -X importtime -m txmd`` with pipes for stdio."""
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "txmd", *args],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=cwd,
+        timeout=60,
+    )
+
+
+class TestServerAddress:
+    """Tests for server_address function."""
+
+    def test_runtime_dir(self, runtime_dir):
+        """Test that the socket lives in $XDG_RUNTIME_DIR/txmd."""
+        assert server_address() == runtime_dir / "txmd" / "server.sock"
+
+    def test_fallback_is_per_user(self, monkeypatch):
+        """Test that the temporary directory fallback is per user."""
+        monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+
+        assert server_address().parent.name == f"txmd-{os.getuid()}"
+
+
+class TestDelegate:
+    """Tests for delegate function."""
+
+    def test_no_server(self, runtime_dir, piped):
+        """Test that commands run in-process when no server listens."""
+        assert delegate(["README.md"]) is None
+
+    def test_disabled(self, runtime_dir, piped, monkeypatch):
+        """Test that TXMD_NO_SERVER skips the server."""
+        requests: List[Dict] = []
+        fake_server(server_address(), b"+", requests)
+        monkeypatch.setenv(NO_SERVER_ENV, "1")
+
+        assert delegate(["README.md"]) is None
+        assert requests == []
+
+    def test_request(self, runtime_dir, piped):
+        """Test that the command and its context reach the server."""
+        requests: List[Dict] = []
+        listener = fake_server(server_address(), b"+", requests)
+
+        assert delegate(["--render", "README.md"]) == 3
+        listener.close()
+        request = requests[0]
+        assert request["fds"] == 3
+        assert request["argv"] == ["--render", "README.md"]
+        assert request["cwd"] == os.getcwd()
+        assert request["env"]["XDG_RUNTIME_DIR"] == str(runtime_dir)
+        assert request["version"] == _code_version()
+
+    def test_refused(self, runtime_dir, piped):
+        """Test that a refused command runs in-process."""
+        requests: List[Dict] = []
+        fake_server(server_address(), b"-", requests)
+
+        assert delegate(["README.md"]) is None
+
+    def test_shared_directory_is_ignored(self, runtime_dir, piped):
+        """Test that a socket others can reach is not trusted."""
+        requests: List[Dict] = []
+        fake_server(server_address(), b"+", requests)
+        server_address().parent.chmod(0o755)
+
+        assert delegate(["README.md"]) is None
+        assert requests == []
+
+
+class TestServe:
+    """Tests for the txmd --server command."""
+
+    def test_child_closes_the_listener(self, tmp_path, monkeypatch):
+        """Test the forked command does not hold the server socket."""
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(str(tmp_path / "server.sock"))
+        listener.listen()
+        listener_fd = listener.fileno()
+        report_read, report_write = os.pipe()
+
+        def run_request(conn, request, fds) -> None:
+            try:
+                os.fstat(listener_fd)
+                report = b"open"
+            except OSError:
+                report = b"closed"
+            os.write(report_write, report)
+            os._exit(0)
+
+        monkeypatch.setattr(txmd.server, "_run_request", run_request)
+        client, conn = socket.socketpair()
+        request = json.dumps({"version": _code_version()}).encode()
+        with listener, client:
+            socket.send_fds(
+                client, [struct.pack("!I", len(request))], [0, 1, 2]
+            )
+            client.sendall(request)
+            pid = _accept(conn, listener)
+            assert pid is not None
+            os.waitpid(pid, 0)
+            assert client.recv(1) == b"+"
+            os.close(report_write)
+            with os.fdopen(report_read, "rb") as report:
+                assert report.read() == b"closed"
+
+    def test_commands_run_in_the_server(self, runtime_dir, tmp_path):
+        """Test rendering, exit status and the idle timeout end to end."""
+        (tmp_path / "doc.md").write_text("# Served\n\nBody text.\n")
+        env = {**os.environ, "XDG_RUNTIME_DIR": str(runtime_dir)}
+        env.pop(NO_SERVER_ENV, None)
+        started = subprocess.run(
+            [sys.executable, "-m", "txmd", "--server", "--idle-timeout", "2"],
+            capture_output=True,
+            text=True,
+            env=env,
+            timeout=60,
+        )
+        assert "listening" in started.stdout
+        socket_path = runtime_dir / "txmd" / "server.sock"
+        assert socket_path.exists()
+
+        rendered = run_txmd("--render", "doc.md", env=env, cwd=tmp_path)
+        failed = run_txmd("--follow", env=env, cwd=tmp_path)
+
+        # The client hands the command over before importing Typer
+        assert "Served" in rendered.stdout
+        assert "Body text." in rendered.stdout
+        assert "| typer" not in rendered.stderr
+        assert failed.returncode == 1
+        assert "--follow requires a file" in failed.stdout
+        assert "| typer" not in failed.stderr
+
+        deadline = time.monotonic() + 30
+        while socket_path.exists() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert not socket_path.exists()
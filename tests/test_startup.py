@@ -0,0 +1,192 @@
+"""Import-time regression tests for the txmd command's startup paths."""
+
+import os
+import subprocess
+import sys
+from typing import Dict, List
+from unittest.mock import patch
+
+import pytest
+
+# Budgets for the cumulative import time of each path, in milliseconds.
+# They are several times what the paths take on a developer machine, but
+# well below what importing Textual (~300 ms) would add.
+VERSION_BUDGET_MS = 150
+ERROR_BUDGET_MS = 600
+
+
+def import_times(*args: str, stdin: str = "") -> Dict[str, int]:
+    """Run ``python -X importtime -m txmd`` and collect its imports.
+
+    Args:
+        *args (str): The command line arguments of txmd.
+        stdin (str): What to pipe to the command.
+
+    Returns:
+        Dict[str, int]: The cumulative import time in microseconds of
+            every module imported, by name.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "txmd", *args],
+        input=stdin,
+        capture_output=True,
+        text=True,
+        # Measure this process even if a txmd server is running
+        env={**os.environ, "TXMD_NO_SERVER": "1"},
+        timeout=60,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def total_ms(times: Dict[str, int], roots: List[str]) -> float:
+    """Return the time spent importing modules and their dependencies."""
+    return sum(times.get(name, 0) for name in roots) / 1000
+
+
+class TestStartupImports:
+    """Tests for the modules imported by the fast startup paths."""
+
+    def test_version_skips_typer_and_textual(self):
+        """Test that --version only imports the txmd package."""
+        times = import_times("--version")
+
+        assert "txmd" in times
+        assert "typer" not in times
+        assert "textual" not in times
+        assert (
+            total_ms(times, ["txmd", "importlib.metadata"]) < VERSION_BUDGET_MS
+        )
+
+    def test_missing_input_skips_textual(self):
+        """Test that a usage error is reported without loading Textual."""
+        times = import_times("--follow")
+
+        assert "txmd.cli" in times
+        assert not [name for name in times if name.startswith("textual")]
+        assert total_ms(times, ["txmd", "txmd.cli"]) < ERROR_BUDGET_MS
+
+    @pytest.mark.skipif(
+        sys.platform == "win32", reason="pipes are read differently"
+    )
+    def test_render_skips_textual(self):
+        """Test that rendering to a pipe does not load Textual."""
+        times = import_times(stdin="# Title\n\ntext\n")
+
+        assert "txmd.render" in times
+        assert "txmd.profile" not in times
+        assert "txmd.latency" not in times
+        assert not [name for name in times if name.startswith("textual")]
+
+    def test_viewer_skips_diagnostics(self):
+        """Test that the viewer imports the budget but no diagnostics."""
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, txmd.app; "
+                "print(sorted(set(sys.modules) & "
+                "{'txmd.budget', 'txmd.memory', 'txmd.profile'}))",
+            ],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+
+        assert result.stdout.strip() == "['txmd.budget']"
+
+
+class TestMainModule:
+    """Tests for the txmd entry point."""
+
+    def test_version_fast_path(self, capsys, monkeypatch):
+        """Test that --version is answered without the Typer app."""
+        from txmd import __main__, __version__
+
+        monkeypatch.setattr(sys, "argv", ["txmd", "--version"])
+        __main__.main()
+
+        assert capsys.readouterr().out == f"txmd version {__version__}\n"
+
+    def test_version_after_separator_is_a_file(self, monkeypatch):
+        """Test that arguments after -- are handed to the Typer app."""
+        from txmd import __main__
+
+        monkeypatch.setenv("TXMD_NO_SERVER", "1")
+        monkeypatch.setattr(sys, "argv", ["txmd", "--", "-v"])
+        with patch("txmd.cli.app") as mock_app:
+            __main__.main()
+
+        mock_app.assert_called_once_with()
+
+    def test_version_as_an_option_value_is_not_the_version(self, monkeypatch):
+        """Test that -v after an option taking a value is left to Typer."""
+        from txmd import __main__
+
+        monkeypatch.setenv("TXMD_NO_SERVER", "1")
+        monkeypatch.setattr(
+            sys, "argv", ["txmd", "--record-keys", "-v", "notes.md"]
+        )
+        with patch("txmd.cli.app") as mock_app:
+            __main__.main()
+
+        mock_app.assert_called_once_with()
+
+    def test_version_before_an_option_value(self):
+        """Test that -v before any option taking a value is the version."""
+        from txmd.__main__ import asks_for_version
+
+        assert asks_for_version(["-v"])
+        assert asks_for_version(["--follow", "--version", "doc.md"])
+        assert asks_for_version(["-v", "--width", "80"])
+        assert not asks_for_version(["--width", "-v"])
+        assert not asks_for_version(["--max-memory=1G", "doc.md"])
+        assert not asks_for_version(["--", "-v"])
+
+    def test_value_options_match_the_cli(self):
+        """Test that VALUE_OPTIONS lists every option taking a value."""
+        import typer.main
+
+        from txmd.__main__ import VALUE_OPTIONS
+        from txmd.cli import app
+
+        options = {
+            opt
+            for param in typer.main.get_command(app).params
+            if param.param_type_name == "option" and not param.is_flag
+            for opt in param.opts
+        }
+
+        assert options == VALUE_OPTIONS
+
+    def test_server_command_is_not_delegated(self, monkeypatch):
+        """Test that txmd --server never hands itself to a server."""
+        from txmd import __main__
+
+        monkeypatch.setattr(sys, "argv", ["txmd", "--server"])
+        with patch("txmd.server.delegate") as mock_delegate, patch(
+            "txmd.cli.app"
+        ) as mock_app:
+            __main__.main()
+
+        mock_delegate.assert_not_called()
+        mock_app.assert_called_once_with()
+
+    def test_delegated_exit_status(self, monkeypatch):
+        """Test that the exit status of a served command is kept."""
+        from txmd import __main__
+
+        monkeypatch.setattr(sys, "argv", ["txmd", "doc.md"])
+        with patch("txmd.server.delegate", return_value=2), patch(
+            "txmd.cli.app"
+        ) as mock_app:
+            with pytest.raises(SystemExit) as exit:
+                __main__.main()
+
+        assert exit.value.code == 2
+        mock_app.assert_not_called()
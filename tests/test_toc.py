@@ -1,6 +1,14 @@
 """Tests for the Table of Contents module."""
 
-from txmd.toc import HeaderNode, build_toc_tree, parse_markdown_headers
+import random
+import tracemalloc
+
+from txmd.toc import (
+    HeaderIndex,
+    HeaderNode,
+    build_toc_tree,
+    parse_markdown_headers,
+)
 
 
 class TestParseMarkdownHeaders:
@@ -192,6 +200,89 @@ def foo():
         assert headers[0] == (1, "Real Header", 1)
         assert headers[1] == (2, "Another Real Header", 7)
 
+    def test_parse_fence_closed_only_by_matching_fence(self):
+        """Test that shorter or different fences do not close a fence."""
+        content = """````
+```
+~~~
+# Still code
+````
+# After Fence"""
+
+        headers = parse_markdown_headers(content)
+
+        assert headers == [(1, "After Fence", 6)]
+
+    def test_parse_unterminated_fence(self):
+        """Test that an unclosed fence hides headers to the end."""
+        content = "# Title\n```\n# Not a header\n"
+
+        headers = parse_markdown_headers(content)
+
+        assert headers == [(1, "Title", 1)]
+
+    def test_parse_setext_headers(self):
+        """Test parsing headers underlined with = and -."""
+        content = """Main Title
+==========
+
+Some text.
+
+Multi-line
+Section
+-------
+
+- list item
+---"""
+
+        headers = parse_markdown_headers(content)
+
+        assert headers == [
+            (1, "Main Title", 1),
+            (2, "Multi-line Section", 6),
+        ]
+
+    def test_parse_thematic_break_is_not_setext(self):
+        """Test that --- after a blank line is not a header underline."""
+        content = "# Title\n\n---\n\nText"
+
+        headers = parse_markdown_headers(content)
+
+        assert headers == [(1, "Title", 1)]
+
+    def test_parse_headers_in_html_blocks_ignored(self):
+        """Test that headers inside HTML blocks are ignored."""
+        content = "<div>\n# Inside\n</div>\n\n# Outside\n"
+
+        headers = parse_markdown_headers(content)
+
+        assert headers == [(1, "Outside", 5)]
+
+    def test_parse_headers_in_lists_ignored(self):
+        """Test that indented headers and underlines in lists are text."""
+        content = (
+            "- item\n\n  # In item\n\n  Text\n  ---\n\n"
+            "Para\n\n  # Indented\n"
+        )
+
+        headers = parse_markdown_headers(content)
+
+        assert headers == [(1, "Indented", 10)]
+
+    def test_parse_agrees_with_document(self):
+        """Test that the headers are those of the viewer's document."""
+        from txmd.document import Document
+
+        content = (
+            "Setext\n===\n<div>\n# x\n</div>\n\n```\n# y\n```\n## z\n"
+            "- a\n\n  <div>\n  # b\n\n```\n\nc\n```\n  # c\n"
+            "<!--\n# d\n-->\ntext\n<span>\n# e\n"
+        )
+
+        assert parse_markdown_headers(content) == list(
+            Document(content).headers
+        )
+
 
 class TestBuildTocTree:
     """Tests for build_toc_tree function."""
@@ -375,3 +466,136 @@ class TestHeaderNode:
         assert len(parent.children) == 1
         assert len(parent.children[0].children) == 1
         assert parent.children[0].children[0].text == "Grandchild"
+
+
+class TestHeaderIndex:
+    """Tests for the array-backed table of contents."""
+
+    HEADERS = [
+        (1, "A", 1),
+        (2, "B", 2),
+        (3, "C", 3),
+        (2, "D", 4),
+        (1, "E", 5),
+        (3, "F", 6),
+    ]
+
+    def test_behaves_like_header_list(self):
+        """Test that the index reads back as (level, text, line) tuples."""
+        headers = HeaderIndex(self.HEADERS)
+
+        assert len(headers) == 6
+        assert headers == self.HEADERS
+        assert headers[1] == (2, "B", 2)
+        assert headers[-1] == (3, "F", 6)
+        assert headers[4:] == [(1, "E", 5), (3, "F", 6)]
+        assert headers.text(3) == "D"
+        assert headers.level(3) == 2
+        assert headers.line_number(3) == 4
+
+    def test_children_match_build_toc_tree(self):
+        """Test that children are the ones build_toc_tree() attaches."""
+        headers = HeaderIndex(self.HEADERS)
+
+        assert list(headers.children()) == [0, 4]
+        assert list(headers.children(0)) == [1, 3]
+        assert list(headers.children(1)) == [2]
+        assert list(headers.children(4)) == [5]
+        assert list(headers.children(5)) == []
+
+    def test_skipped_levels(self):
+        """Test that a shallower header after a deeper one is a sibling."""
+        headers = HeaderIndex(
+            [(1, "A", 1), (3, "B", 2), (2, "C", 3), (3, "D", 4)]
+        )
+
+        assert list(headers.children(0)) == [1, 2]
+        assert list(headers.children(2)) == [3]
+        assert [headers.parent(i) for i in range(4)] == [-1, 0, 0, 2]
+
+    def test_has_children(self):
+        """Test that only headers followed by deeper ones have children."""
+        headers = HeaderIndex(self.HEADERS)
+
+        assert [headers.has_children(i) for i in range(len(headers))] == [
+            True,
+            True,
+            False,
+            False,
+            True,
+            False,
+        ]
+
+    def test_ancestors(self):
+        """Test that ancestors are listed from the root level down."""
+        headers = HeaderIndex(self.HEADERS)
+
+        assert headers.ancestors(2) == [0, 1]
+        assert headers.ancestors(3) == [0]
+        assert headers.ancestors(5) == [4]
+        assert headers.ancestors(0) == []
+
+    def test_find_by_line(self):
+        """Test that lines map to the last header at or before them."""
+        headers = HeaderIndex([(1, "A", 3), (2, "B", 10), (2, "C", 20)])
+
+        assert headers.find(1) == -1
+        assert headers.find(3) == 0
+        assert headers.find(15) == 1
+        assert headers.find(20) == 2
+        assert headers.find(999) == 2
+
+    def test_truncate(self):
+        """Test that truncated headers can be appended again."""
+        headers = HeaderIndex(self.HEADERS)
+
+        headers.truncate(3)
+        assert headers == self.HEADERS[:3]
+        assert headers.append(2, "Dé", 4) == 3
+        assert headers[3] == (2, "Dé", 4)
+        assert headers.parent(3) == 0
+
+        headers.truncate(0)
+        assert headers == []
+
+    def test_to_tree_matches_stack_algorithm(self):
+        """Test the tree on random header sequences."""
+        rng = random.Random(12)
+        for _ in range(50):
+            flat = [
+                (rng.randint(1, 6), f"H{i}", i + 1)
+                for i in range(rng.randint(0, 40))
+            ]
+
+            assert build_toc_tree(flat) == _stack_tree(flat)
+            assert HeaderIndex(flat).to_tree() == _stack_tree(flat)
+
+    def test_smaller_than_tree(self):
+        """Test that the index takes a fraction of the memory of nodes."""
+        flat = [(i % 3 + 1, f"Section {i}", i * 4 + 1) for i in range(20000)]
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            index = HeaderIndex(flat)
+            index_size = tracemalloc.get_traced_memory()[0] - before
+            before = tracemalloc.get_traced_memory()[0]
+            tree = build_toc_tree(index)
+            tree_size = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+
+        assert len(tree) == 20000 // 3 + 1
+        assert index_size * 5 < tree_size
+
+
+def _stack_tree(headers):
+    """Build the TOC tree with the stack algorithm, for reference."""
+    roots, stack = [], []
+    for level, text, line_number in headers:
+        node = HeaderNode(level, text, line_number)
+        while stack and stack[-1].level >= level:
+            stack.pop()
+        (stack[-1].children if stack else roots).append(node)
+        stack.append(node)
+    return roots
@@ -1,9 +1,16 @@
 """UI interaction tests for the Textual markdown viewer app."""
 
+import os
+import time
+from unittest.mock import patch
+
 from textual.containers import ScrollableContainer
 from textual.widgets import Tree
 
-from txmd.cli import MarkdownViewerApp
+from txmd.cache import DocumentCache
+from txmd.app import MarkdownViewerApp
+from txmd.pager import PagerView
+from txmd.view import DocumentView
 
 
 class TestTOCToggle:
@@ -180,13 +187,44 @@ class TestTOCNavigation:
 
         async with app.run_test() as pilot:
             await pilot.pause()
+            await _show_toc(pilot)
+
+            # Should have added every header to the tree
+            toc_keys = _toc_keys(app)
+            assert len(toc_keys) == 4
+            assert any("Main Title" in key for key in toc_keys)
+            assert any("Section 1" in key for key in toc_keys)
+            assert any("Subsection 1.1" in key for key in toc_keys)
+            assert any("Section 2" in key for key in toc_keys)
+
+    async def test_toc_built_lazily(self):
+        """Test that TOC entries are only added when they are shown."""
+        content = """# Main Title
+## Section 1
+### Subsection 1.1
+## Section 2
+# Appendix"""
+        app = MarkdownViewerApp(content, "test.md")
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            tree = app.query_one("#toc-tree", Tree)
 
-            # Should have parsed headers into toc_nodes
-            assert len(app.toc_nodes) == 4
-            assert any("Main Title" in key for key in app.toc_nodes.keys())
-            assert any("Section 1" in key for key in app.toc_nodes.keys())
-            assert any("Subsection 1.1" in key for key in app.toc_nodes.keys())
-            assert any("Section 2" in key for key in app.toc_nodes.keys())
+            # Nothing until the TOC is first shown
+            assert app.toc_nodes == {}
+            assert len(tree.root.children) == 0
+
+            # Then only the top level
+            await _show_toc(pilot, expand=False)
+            assert sorted(app.toc_nodes) == [0, 4]
+            assert tree.root.children[0].data == 0
+            assert tree.root.children[0].allow_expand is True
+            assert tree.root.children[1].allow_expand is False
+
+            # Children are added when their parent is expanded
+            tree.root.children[0].expand()
+            await pilot.pause()
+            assert sorted(app.toc_nodes) == [0, 1, 3, 4]
 
     async def test_toc_hierarchical_structure(self):
         """Test that TOC builds hierarchical tree structure."""
@@ -199,7 +237,7 @@ class TestTOCNavigation:
         async with app.run_test() as pilot:
             await pilot.pause()
 
-            tree = app.query_one("#toc-tree", Tree)
+            tree = await _show_toc(pilot)
 
             # Root should have 1 child (Title)
             assert len(tree.root.children) == 1
@@ -222,7 +260,7 @@ class TestTOCNavigation:
         async with app.run_test() as pilot:
             await pilot.pause()
 
-            tree = app.query_one("#toc-tree", Tree)
+            tree = await _show_toc(pilot)
             title_node = tree.root.children[0]
 
             # Section 1 and Section 2 are leaf nodes
@@ -242,7 +280,7 @@ class TestTOCNavigation:
         async with app.run_test() as pilot:
             await pilot.pause()
 
-            tree = app.query_one("#toc-tree", Tree)
+            tree = await _show_toc(pilot)
             title_node = tree.root.children[0]
             section1_node = title_node.children[0]
 
@@ -299,6 +337,33 @@ Content here."""
             # Test passes if no exception was raised
             assert True
 
+    async def test_toc_jump_lands_on_header(self):
+        """Test that a TOC jump shows the header despite tall code blocks."""
+        code = "\n".join(f"value_{i} = {i}" for i in range(200))
+        content = (
+            "# Title\n\n"
+            f"```python\n{code}\n```\n\n"
+            "## Section Below\n\n"
+            + "\n\n".join(f"Paragraph {i}" for i in range(50))
+        )
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(80, 30)) as pilot:
+            await pilot.pause()
+
+            await pilot.press("t")
+            await pilot.pause()
+            # Move past Title to its only child and select it
+            app.query_one("#toc-tree", Tree).root.expand_all()
+            await pilot.press("down")
+            await pilot.press("down")
+            await pilot.press("enter")
+            await pilot.pause()
+
+            view = app.query_one("#content", DocumentView)
+            rows = [view.render_line(y).text for y in range(6)]
+            assert any("Section Below" in row for row in rows)
+
 
 class TestTOCCodeBlockFiltering:
     """Tests for filtering out headers in code blocks."""
@@ -318,10 +383,11 @@ def foo():
 
         async with app.run_test() as pilot:
             await pilot.pause()
+            await _show_toc(pilot)
 
             # Should only have 2 headers, not 3
             assert len(app.toc_nodes) == 2
-            toc_keys = app.toc_nodes.keys()
+            toc_keys = _toc_keys(app)
             assert any("Real Header" in key for key in toc_keys)
             assert any("Another Real Header" in key for key in toc_keys)
             assert not any("Not a header" in key for key in toc_keys)
@@ -338,10 +404,11 @@ def foo():
 
         async with app.run_test() as pilot:
             await pilot.pause()
+            await _show_toc(pilot)
 
             # Should only have 2 headers
             assert len(app.toc_nodes) == 2
-            toc_keys = app.toc_nodes.keys()
+            toc_keys = _toc_keys(app)
             assert any("Real Header" in key for key in toc_keys)
             assert any("Another Real Header" in key for key in toc_keys)
 
@@ -415,3 +482,553 @@ class TestQuitAction:
 
             # App should have exited
             assert not app.is_running
+
+
+class TestStreamingInput:
+    """Tests for progressive rendering of a piped stream."""
+
+    async def test_stream_blocks_appended_as_they_arrive(self):
+        """Test that blocks are shown before the stream is closed."""
+        read_fd, write_fd = os.pipe()
+        stream = os.fdopen(read_fd, "rb", buffering=0)
+        app = MarkdownViewerApp("", stream=stream)
+
+        async with app.run_test() as pilot:
+            tree = await _show_toc(pilot)
+            os.write(write_fd, b"# Title\n\nFirst paragraph.\n\n## Next")
+            await _wait_for(pilot, lambda: "Title" in app.content)
+
+            # Completed blocks are shown, the unfinished tail is held back
+            assert app.content == "# Title\n\n"
+            assert app.query_one(DocumentView).block_count == 1
+            assert _toc_keys(app) == ["Title:1"]
+
+            os.write(write_fd, b" Section\n")
+            os.close(write_fd)
+            await app.workers.wait_for_complete()
+            await pilot.pause()
+
+            assert app.content.endswith("## Next Section\n")
+            assert app.document.headers[-1] == (2, "Next Section", 5)
+
+            # Streamed headers are nested like a fully parsed document
+            title_node = tree.root.children[0]
+            assert title_node.allow_expand is True
+            title_node.expand()
+            await pilot.pause()
+            assert _toc_keys(app) == ["Title:1", "Next Section:5"]
+            assert len(title_node.children) == 1
+            assert title_node.children[0].allow_expand is False
+
+        stream.close()
+
+    async def test_quit_while_stream_is_open(self):
+        """Test that quitting does not wait for the producer to finish."""
+        read_fd, write_fd = os.pipe()
+        stream = os.fdopen(read_fd, "rb", buffering=0)
+        app = MarkdownViewerApp("", stream=stream)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            await pilot.press("q")
+            await pilot.pause()
+            assert not app.is_running
+
+        os.close(write_fd)
+        stream.close()
+
+    async def test_stream_read_without_select(self):
+        """Test the reader thread used where select() takes no pipes.
+
+        It is the only path on Windows, and is forced elsewhere.
+        """
+        read_fd, write_fd = os.pipe()
+        stream = os.fdopen(read_fd, "rb", buffering=0)
+        app = MarkdownViewerApp("", stream=stream)
+
+        with patch("txmd.app.SELECT_PIPES", False):
+            async with app.run_test() as pilot:
+                os.write(write_fd, b"# Title\n\ntext\n")
+                await _wait_for(pilot, lambda: "Title" in app.content)
+                assert app.document.headers[0] == (1, "Title", 1)
+
+                # Quitting does not wait for the blocked read
+                await pilot.press("q")
+                await pilot.pause()
+                assert not app.is_running
+
+        os.close(write_fd)
+        stream.close()
+
+
+class TestFollowFile:
+    """Tests for following a file that is being appended to."""
+
+    async def test_appended_content_is_shown(self, tmp_path):
+        """Test that appended blocks and headers appear incrementally."""
+        path = tmp_path / "log.md"
+        path.write_bytes(b"# Log\n\n## Run 1\n\nstarted")
+        app = MarkdownViewerApp(path.read_bytes(), "log.md", follow=path)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            tree = await _show_toc(pilot)
+            run_node = tree.root.children[0].children[0]
+
+            with open(path, "ab") as f:
+                f.write(b" and done\n\n## Run 2\n\nstarted\n")
+            await _wait_for(pilot, lambda: "Run 2:7" in _toc_keys(app))
+
+            assert app.content.endswith(
+                "started and done\n\n## Run 2\n\nstarted\n"
+            )
+            assert app.query_one(DocumentView).block_count == 5
+            assert _toc_keys(app) == ["Log:1", "Run 1:3", "Run 2:7"]
+            # Existing TOC entries are kept, not rebuilt
+            assert tree.root.children[0].children[0] is run_node
+            assert len(tree.root.children[0].children) == 2
+
+    async def test_rewritten_file_is_reloaded(self, tmp_path):
+        """Test that a file that shrank is parsed again from scratch."""
+        path = tmp_path / "log.md"
+        path.write_bytes(b"# Old\n\nlots of old content\n")
+        app = MarkdownViewerApp(path.read_bytes(), "log.md", follow=path)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            tree = await _show_toc(pilot)
+            path.write_bytes(b"# New\n")
+            await _wait_for(pilot, lambda: "New:1" in _toc_keys(app))
+
+            assert _toc_keys(app) == ["New:1"]
+            assert app.content == "# New\n"
+            assert len(tree.root.children) == 1
+
+
+class TestWatchFile:
+    """Tests for reloading a file that is edited."""
+
+    async def test_edit_keeps_toc_expansion(self, tmp_path):
+        """Test that an edit updates the TOC without collapsing it."""
+        path = tmp_path / "doc.md"
+        path.write_bytes(b"# Title\n\n## One\n\ntext\n\n## Two\n")
+        app = MarkdownViewerApp(path.read_bytes(), "doc.md", watch=path)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            tree = await _show_toc(pilot)
+            title_node = tree.root.children[0]
+
+            # Body edit: the outline is the same, only lines move
+            path.write_bytes(b"# Title\n\nintro\n\n## One\n\ntext\n\n## Two\n")
+            await _wait_for(pilot, lambda: "Two:9" in _toc_keys(app))
+            assert tree.root.children[0] is title_node
+            assert _toc_keys(app) == ["Title:1", "One:5", "Two:9"]
+
+            # Outline edit: the tree is rebuilt with the same state
+            path.write_bytes(b"# Title\n\n## One\n\n## Three\n\n## Two\n")
+            await _wait_for(pilot, lambda: "Three:5" in _toc_keys(app))
+            assert tree.root.children[0].is_expanded
+            assert "intro" not in app.content
+
+    async def test_unchanged_save_is_ignored(self, tmp_path):
+        """Test that saving identical content does not reload anything."""
+        path = tmp_path / "doc.md"
+        path.write_bytes(b"# Title\n")
+        app = MarkdownViewerApp(path.read_bytes(), "doc.md", watch=path)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            document = app.document
+            path.write_bytes(b"# Title\n")
+            await pilot.pause(0.5)
+
+            assert app.document is document
+
+
+class TestBackgroundLoading:
+    """Tests for parsing large documents after the first frame."""
+
+    async def test_first_frame_does_not_wait_for_parsing(self):
+        """Test that a large document starts as fast as a small one."""
+        small = "# Title\n\ntext\n"
+        large = "# Title\n\n" + "".join(
+            f"## Section {i}\n\nParagraph for section {i}.\n\n"
+            for i in range(100_000)
+        )
+
+        startup = []
+        for content in (small, large):
+            start = time.perf_counter()
+            app = MarkdownViewerApp(content.encode())
+            async with app.run_test():
+                startup.append(time.perf_counter() - start)
+                loading = app.sub_title
+
+        assert loading.startswith("loading")
+        assert startup[1] < startup[0] + 0.1
+
+    async def test_blocks_and_toc_after_loading(self):
+        """Test that a document loaded in the background is complete."""
+        content = "# Title\n\n" + "".join(
+            f"## Section {i}\n\nParagraph {i}.\n\n" for i in range(50)
+        )
+
+        with patch("txmd.app.BACKGROUND_LOAD_SIZE", 0), patch(
+            "txmd.app.LOAD_FIRST_CHUNK_SIZE", 64
+        ):
+            app = MarkdownViewerApp(content)
+
+        async with app.run_test() as pilot:
+            await _show_toc(pilot, expand=False)
+            await _wait_for(pilot, lambda: not app.sub_title)
+            app.query_one("#toc-tree", Tree).root.children[0].expand()
+            await pilot.pause()
+            view = app.query_one(DocumentView)
+
+            assert view.block_count == 101
+            assert len(app.toc_nodes) == 51
+            assert "Section 49:199" in _toc_keys(app)
+
+            await pilot.press("t")
+            await pilot.press("end")
+            await pilot.pause()
+            assert view.scroll_y == view.max_scroll_y > 0
+
+    async def test_cache_used_by_loader(self, tmp_path):
+        """Test that the loader saves to the cache and loads from it."""
+        content = b"# Cached\n\n## Section\n\ntext\n"
+        cache = DocumentCache(tmp_path)
+
+        app = MarkdownViewerApp(content, cache=cache)
+        async with app.run_test() as pilot:
+            await _wait_for(pilot, lambda: not app.sub_title)
+        assert len(list(tmp_path.iterdir())) == 1
+
+        app = MarkdownViewerApp(content, cache=cache)
+        with patch("txmd.app.scan_buffer") as mock_scan:
+            async with app.run_test() as pilot:
+                await _wait_for(pilot, lambda: not app.sub_title)
+        mock_scan.assert_not_called()
+        assert app.document.headers == [(1, "Cached", 1), (2, "Section", 3)]
+
+
+class TestFastMode:
+    """Tests for showing documents above the threshold as source lines."""
+
+    CONTENT = "# Title\n\n" + "".join(
+        f"## Section {i}\n\nText {i}{' needle' if i % 10 == 5 else ''}.\n\n"
+        for i in range(100)
+    )
+
+    async def test_threshold_selects_pager(self):
+        """Test that only content above a threshold is paged."""
+        for kwargs, fast in (
+            ({}, False),
+            ({"fast_size": 1024}, True),
+            ({"fast_lines": 1000}, False),
+            ({"fast_lines": 100}, True),
+        ):
+            app = MarkdownViewerApp(self.CONTENT, **kwargs)
+            async with app.run_test() as pilot:
+                await pilot.pause()
+                assert app.fast_mode is fast
+                assert bool(app.query(PagerView)) is fast
+
+    async def test_blocks_never_parsed(self):
+        """Test that the lines and the TOC are there without blocks."""
+        with patch("txmd.app.LOAD_FIRST_CHUNK_SIZE", 64):
+            app = MarkdownViewerApp(self.CONTENT, fast_size=0)
+
+        with patch("txmd.app.scan_buffer") as mock_scan:
+            async with app.run_test(size=(80, 24)) as pilot:
+                await _wait_for(pilot, lambda: app.sub_title == "fast mode")
+                await _show_toc(pilot)
+                view = app.query_one(PagerView)
+
+                assert len(app.document) == 0
+                assert view.block_count == 402
+                assert len(app.toc_nodes) == 101
+                assert "Section 99:399" in _toc_keys(app)
+        mock_scan.assert_not_called()
+
+    async def test_toc_and_search_jump_to_lines(self):
+        """Test that TOC entries and matches scroll to their line."""
+        app = MarkdownViewerApp(self.CONTENT, fast_size=0)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await _wait_for(pilot, lambda: app.sub_title == "fast mode")
+            view = app.query_one(PagerView)
+            app._jump_to_header(51)
+            await pilot.pause()
+            assert view.scroll_y == 202
+
+            await pilot.press("slash", *"needle", "enter")
+            await _wait_for(pilot, lambda: app.search and app.search.complete)
+            await pilot.press("n")
+            await pilot.pause()
+            assert len(app.search) == 10
+            assert view.scroll_y == app.search.lines[app._search_index] - 3
+
+
+class TestSearch:
+    """Tests for the search bar and match navigation."""
+
+    CONTENT = "# Title\n\n" + "".join(
+        f"## Section {i}\n\nText {i}{' needle' if i % 10 == 5 else ''}.\n\n"
+        for i in range(100)
+    )
+
+    async def test_typing_jumps_to_first_match(self):
+        """Test that the view follows the query as it is typed."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.press("slash", *"needle")
+            await _wait_for(pilot, lambda: app.search and app.search.complete)
+            view = app.query_one(DocumentView)
+            search = app.query_one("#search")
+
+            # "n" and "q" went to the search bar, not to the bindings
+            assert search.value == "needle"
+            assert len(app.search) == 10
+            assert app.search.lines[0] == 25
+            assert view.scroll_y > 0
+            assert search.border_subtitle == "1/10"
+
+    async def test_next_and_previous_match(self):
+        """Test that n and N step through the matches and wrap around."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.press("slash", *"needle")
+            await _wait_for(pilot, lambda: app.search and app.search.complete)
+            await pilot.press("enter", "n", "n")
+            assert app._search_index == 2
+            assert app.query_one("#search").border_subtitle == "3/10"
+
+            await pilot.press("N", "N", "N")
+            assert app._search_index == 9
+
+    async def test_next_match_from_scroll_position(self):
+        """Test that n looks below the viewport after scrolling away."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.press("slash", *"needle")
+            await _wait_for(pilot, lambda: app.search and app.search.complete)
+            await pilot.press("enter")
+            view = app.query_one(DocumentView)
+            line = app.search.lines[6]
+            app._scroll_to_line(line + 2)
+            await pilot.press("n")
+
+            assert app._search_index == 7
+            assert view.line_at(int(view.scroll_y)) < app.search.lines[7]
+
+    async def test_escape_while_typing_restores_position(self):
+        """Test that cancelling the search scrolls back and clears it."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.press("slash", *"needle")
+            await _wait_for(pilot, lambda: app.search and app.search.complete)
+            await pilot.press("escape")
+            await pilot.pause()
+            view = app.query_one(DocumentView)
+
+            assert view.scroll_y == 0
+            assert app.search is None
+            assert not app.query_one("#search").has_class("visible")
+            assert app.focused is view
+
+    async def test_new_query_cancels_stale_search(self):
+        """Test that results of a superseded query are dropped."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        with patch("txmd.search.SEARCH_CHUNK_SIZE", 16):
+            async with app.run_test(size=(80, 24)) as pilot:
+                await pilot.press("slash", *"Text 9")
+                await _wait_for(
+                    pilot, lambda: app.search and app.search.complete
+                )
+
+                assert app.search.query == "Text 9"
+                assert len(app.search) == 11
+
+    async def test_search_uses_trigram_index(self, tmp_path):
+        """Test that large documents are indexed, and the index cached."""
+        cache = DocumentCache(tmp_path)
+
+        with patch("txmd.app.SEARCH_INDEX_SIZE", 0):
+            app = MarkdownViewerApp(self.CONTENT.encode(), cache=cache)
+            async with app.run_test(size=(80, 24)) as pilot:
+                await _wait_for(pilot, lambda: not app.sub_title)
+                await pilot.press("slash")
+                await _wait_for(pilot, lambda: app.search_index is not None)
+                await pilot.press(*"needle")
+                await _wait_for(
+                    pilot, lambda: app.search and app.search.complete
+                )
+
+                assert len(app.search) == 10
+        assert len(list(tmp_path.glob("*.trigrams"))) == 1
+
+        app = MarkdownViewerApp(self.CONTENT.encode(), cache=cache)
+        with patch("txmd.app.SEARCH_INDEX_SIZE", 0), patch(
+            "txmd.app.TrigramIndex"
+        ) as mock_index:
+            async with app.run_test(size=(80, 24)) as pilot:
+                await pilot.press("slash")
+                await _wait_for(pilot, lambda: app.search_index is not None)
+        mock_index.assert_not_called()
+
+
+class TestSectionPalette:
+    """Tests for jumping to a section from the palette."""
+
+    CONTENT = "# Title\n\n" + "".join(
+        f"## Section {i}\n\nText {i}.\n\n" for i in range(50)
+    )
+
+    async def test_jump_to_section(self):
+        """Test that typing part of a header and Enter scroll to it."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.press("s", *"sect 42")
+            palette = app.query_one("#palette")
+            view = app.query_one(DocumentView)
+
+            # "s" and "t" went to the palette, not to the bindings
+            assert palette.results[0] == 43
+            assert app.toc_visible is False
+
+            await pilot.press("enter")
+            await pilot.pause()
+
+            assert "visible" not in palette.classes
+            assert view.has_focus
+            assert view.line_at(int(view.scroll_y)) == 171
+
+    async def test_cursor_and_escape(self):
+        """Test that arrows pick a result and Escape closes the palette."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.press("s", *"section 4", "down", "down", "up")
+            palette = app.query_one("#palette")
+            results = app.query_one("#palette-results")
+
+            assert palette.results[:2] == [5, 41]
+            assert results.highlighted == 1
+
+            await pilot.press("escape")
+            await pilot.pause()
+
+            assert "visible" not in palette.classes
+            assert app.query_one(DocumentView).has_focus
+            assert app.query_one(DocumentView).scroll_y == 0
+
+
+class TestScrollSpy:
+    """Tests for the TOC cursor following the scroll position."""
+
+    CONTENT = "".join(
+        f"# Part {part}\n\n"
+        + "".join(f"## Section {part}.{i}\n\nText {i}.\n\n" for i in range(10))
+        for part in "AB"
+    )
+
+    async def test_cursor_follows_scrolling(self):
+        """Test that the cursor moves to the section at the top."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            tree = await _show_toc(pilot)
+            headers = app.document.headers
+            view = app.query_one(DocumentView)
+
+            app._scroll_to_line(headers.line_number(15))
+            await _wait_for(pilot, lambda: tree.cursor_node.data == 15)
+
+            assert tree.cursor_node.label.plain == "Section B.3"
+            assert view.has_focus is False  # The TOC keeps the focus
+
+            app._scroll_to_line(headers.line_number(3), position_at_top=True)
+            await _wait_for(pilot, lambda: tree.cursor_node.data == 3)
+
+    async def test_collapsed_section_selects_parent(self):
+        """Test that a hidden entry falls back to its shown ancestor."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            tree = await _show_toc(pilot, expand=False)
+            app._scroll_to_line(app.document.headers.line_number(16))
+            await _wait_for(pilot, lambda: tree.cursor_node.data == 11)
+
+            assert 16 not in app.toc_nodes
+
+    async def test_updates_are_throttled(self):
+        """Test that many scroll steps move the cursor only once."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            tree = await _show_toc(pilot)
+            await pilot.pause(0.2)
+            view = app.query_one(DocumentView)
+
+            with patch.object(
+                app, "_sync_toc_cursor", wraps=app._sync_toc_cursor
+            ) as sync:
+                for y in range(1, 40):
+                    view.scroll_to(y=y, animate=False)
+                await pilot.pause(0.3)
+
+            assert sync.call_count == 1
+            assert tree.cursor_node.data == app.document.headers.find(
+                view.line_at(int(view.scroll_y) + 2)
+            )
+
+    async def test_hidden_toc_not_updated(self):
+        """Test that scrolling with the TOC hidden schedules nothing."""
+        app = MarkdownViewerApp(self.CONTENT)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.press("j", "j", "j")
+
+            assert app._scroll_spy is None
+
+
+async def _wait_for(pilot, condition, timeout=5.0):
+    """Pause the pilot until condition() is true or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await pilot.pause(0.05)
+
+
+async def _show_toc(pilot, expand=True):
+    """Show the TOC and expand all of its entries.
+
+    Returns:
+        Tree: The TOC tree widget.
+    """
+    await pilot.press("t")
+    await pilot.pause()
+    tree = pilot.app.query_one("#toc-tree", Tree)
+    pending = list(tree.root.children) if expand else []
+    while pending:
+        node = pending.pop()
+        if node.allow_expand:
+            node.expand()
+            await pilot.pause()
+            pending.extend(node.children)
+    return tree
+
+
+def _toc_keys(app):
+    """Return "text:line" for every entry added to the TOC, in order."""
+    return [
+        f"{app.toc_nodes[node_id].label}:{app.document.headers[node_id][2]}"
+        for node_id in sorted(app.toc_nodes)
+    ]
@@ -0,0 +1,291 @@
+"""Tests for the virtualized document view."""
+
+from txmd.app import MarkdownViewerApp
+from txmd.document import Document, match_blocks
+from txmd.view import DocumentView, estimate_block_height
+
+
+def make_document(sections: int) -> str:
+    """Build a markdown document with the given number of sections."""
+    return "# Title\n\n" + "".join(
+        f"## Section {i}\n\nParagraph for section {i}.\n\n"
+        for i in range(sections)
+    )
+
+
+class TestEstimateBlockHeight:
+    """Tests for estimate_block_height function."""
+
+    def test_blank_block_has_no_height(self):
+        """Test that a block of blank lines takes no space."""
+        assert estimate_block_height(0) == 0
+
+    def test_paragraph_height(self):
+        """Test that a paragraph counts its lines plus a separator."""
+        assert estimate_block_height(2) == 3
+
+    def test_h1_height_includes_panel(self):
+        """Test that level-1 headers account for their panel border."""
+        assert estimate_block_height(1, level=1) == 4
+
+
+class TestDocumentView:
+    """Tests for DocumentView rendering and virtualization."""
+
+    async def test_blocks_split_once(self):
+        """Test that the content is split into blocks up front."""
+        app = MarkdownViewerApp(make_document(3))
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+
+            # Title + 3 x (header, paragraph)
+            assert view.block_count == 7
+
+    async def test_only_visible_blocks_rendered(self):
+        """Test that a large document only renders around the viewport."""
+        app = MarkdownViewerApp(make_document(2000))
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+
+            assert view.block_count == 4001
+            assert 0 < view.rendered_count < 40
+
+            await pilot.press("end")
+            await pilot.pause()
+
+            assert view.rendered_count < 80
+
+    async def test_rendered_text_visible(self):
+        """Test that rendered lines contain the block text."""
+        app = MarkdownViewerApp("# Title\n\nHello *world*.\n")
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            text = "\n".join(
+                view.render_line(y).text for y in range(view.size.height)
+            )
+
+            assert "Title" in text
+            assert "Hello world." in text
+
+    async def test_heights_corrected_after_render(self):
+        """Test that rendered blocks replace their estimated height."""
+        # A long paragraph wraps to more lines than its source has
+        content = "# Title\n\n" + "word " * 200 + "\n"
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+
+            assert view.block_offset(1) == 4
+            assert view.virtual_size.height > 4 + 2
+
+    async def test_end_reaches_bottom(self):
+        """Test that End lands on the bottom despite height estimates."""
+        content = make_document(500) + "Last paragraph " * 100
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+
+            await pilot.press("end")
+            await pilot.pause()
+
+            assert view.scroll_y == view.max_scroll_y
+            last = view.render_line(view.size.height - 2).text
+            assert "Last paragraph" in last
+
+    async def test_append_extends_document(self):
+        """Test that appended text adds blocks and scrollable height."""
+        app = MarkdownViewerApp("# Title\n")
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            height = view.virtual_size.height
+
+            view.append("\n## More\n\ntext\n")
+            await pilot.pause()
+
+            assert view.block_count == 3
+            assert view.virtual_size.height > height
+
+    async def test_resize_drops_rendered_blocks(self):
+        """Test that changing the width re-renders at the new width."""
+        content = "# Title\n\n" + "word " * 100 + "\n"
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(100, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            wide_height = view.virtual_size.height
+
+            await pilot.resize_terminal(50, 24)
+            await pilot.pause()
+
+            assert view.virtual_size.height > wide_height
+
+    async def test_viewport_block_count(self):
+        """Test that the viewport counts its blocks and their overscan."""
+        content = "\n\n".join(f"Line {i}." for i in range(100))
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            top = view.block_at(0)
+            bottom = view.block_at(view.size.height - 1)
+
+            assert view.viewport_block_count == (
+                bottom - top + 1 + 2 * view.overscan
+            )
+            assert view.viewport_block_count > view.size.height // 2
+
+    async def test_shrink_cache(self):
+        """Test that shrinking the cache drops the oldest rendered blocks."""
+        app = MarkdownViewerApp(make_document(50))
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            await pilot.press("end")
+            await pilot.pause()
+            rendered = view.rendered_count
+
+            view.shrink_cache(4)
+
+            assert rendered > 4
+            assert view.rendered_count == 4
+            assert view.cache_size == 4
+            # Dropped blocks are rendered again from the source
+            rows = [view.render_line(y).text for y in range(view.size.height)]
+            assert any("Section 49" in row for row in rows)
+
+
+class TestUpdateDocument:
+    """Tests for swapping in a new version of the document."""
+
+    async def test_unchanged_blocks_not_rendered_again(self):
+        """Test that only edited blocks are rendered after an update."""
+        content = make_document(5)
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            old = view.document
+            kept = view._get_rendered(1)
+
+            new = Document(content.replace("section 2.", "section two."))
+            view.update_document(
+                new, match_blocks(old.block_hashes(), new.block_hashes())
+            )
+
+            assert view.document is new
+            assert view._get_rendered(1) is kept
+            assert 6 not in view._rendered
+            await pilot.pause()
+            assert any(
+                "section two" in view.render_line(y).text
+                for y in range(view.size.height)
+            )
+
+    async def test_scroll_position_kept(self):
+        """Test that the block at the top stays there after an insert."""
+        content = make_document(200)
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            target = view.document.block_for_line(
+                content.split("\n").index("## Section 100") + 1
+            )
+            view.scroll_to(y=view.block_offset(target), animate=False)
+            await pilot.pause()
+            top_text = view.render_line(0).text
+
+            old = view.document
+            new = Document(content.replace("# Title\n", "# Title\n\nNew\n"))
+            view.update_document(
+                new, match_blocks(old.block_hashes(), new.block_hashes())
+            )
+            await pilot.pause()
+
+            assert view.block_at(round(view.scroll_y)) == target + 1
+            assert view.render_line(0).text == top_text
+
+
+class TestLineOffsetMap:
+    """Tests for mapping source lines to scroll offsets."""
+
+    async def test_block_for_line(self):
+        """Test that source lines map to the block containing them."""
+        content = "# Title\n\nline a\nline b\n\n## Next\n"
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+
+            assert view.block_for_line(1) == 0
+            assert view.block_for_line(3) == 1
+            assert view.block_for_line(4) == 1
+            assert view.block_for_line(6) == 2
+            assert view.block_for_line(99) == 2
+
+    async def test_offset_for_line_matches_rendered_row(self):
+        """Test that the offset of a header is where the header is drawn."""
+        code = "\n".join(f"line_{i} = {i}" for i in range(300))
+        content = (
+            f"# Title\n\n```python\n{code}\n```\n\n## Target\n\n"
+            + "Text\n\n" * 50
+        )
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(80, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+
+            target_line = content.split("\n").index("## Target") + 1
+            offset = view.offset_for_line(target_line)
+            view.scroll_to(y=offset, animate=False)
+            await pilot.pause()
+
+            rows = [view.render_line(y).text for y in range(3)]
+            assert any("Target" in row for row in rows)
+
+    async def test_offsets_rebuilt_after_resize(self):
+        """Test that offsets follow the new layout after a resize."""
+        content = "# Title\n\n" + "word " * 200 + "\n\n## Target\n"
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(120, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+            wide_offset = view.offset_for_line(5)
+
+            await pilot.resize_terminal(40, 24)
+            await pilot.pause()
+
+            assert view.offset_for_line(5) > wide_offset
+
+    async def test_line_at_inverts_offset_for_line(self):
+        """Test that the row of a line maps back to that line."""
+        content = "# Title\n\n" + "word " * 200 + "\n\n```\na\nb\nc\n```\n"
+        app = MarkdownViewerApp(content)
+
+        async with app.run_test(size=(40, 24)) as pilot:
+            await pilot.pause()
+            view = app.query_one("#content", DocumentView)
+
+            for line_number in (1, 3, 6, 7, 8, 9):
+                offset = view.offset_for_line(line_number)
+                assert view.line_at(offset) == line_number
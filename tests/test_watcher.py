@@ -0,0 +1,70 @@
+"""Tests for the file change watcher."""
+
+import pytest
+
+from txmd.watcher import FileWatcher, _load_inotify
+
+
+@pytest.fixture(
+    params=[
+        pytest.param(True, id="inotify"),
+        pytest.param(False, id="polling"),
+    ]
+)
+def use_inotify(request):
+    """Run a test with inotify (where available) and with polling."""
+    if request.param and _load_inotify() is None:
+        pytest.skip("inotify is not available")
+    return request.param
+
+
+class TestFileWatcher:
+    """Tests for the FileWatcher class."""
+
+    def test_detects_append(self, tmp_path, use_inotify):
+        """Test that appending to the file is reported."""
+        path = tmp_path / "doc.md"
+        path.write_text("# Title\n")
+        watcher = FileWatcher(
+            path, poll_interval=0.01, use_inotify=use_inotify
+        )
+        try:
+            assert watcher.uses_inotify == use_inotify
+            with open(path, "a") as f:
+                f.write("\nmore\n")
+            assert watcher.wait(2.0) is True
+        finally:
+            watcher.close()
+
+    def test_timeout_without_change(self, tmp_path, use_inotify):
+        """Test that waiting on an idle file times out."""
+        path = tmp_path / "doc.md"
+        path.write_text("# Title\n")
+        watcher = FileWatcher(
+            path, poll_interval=0.01, use_inotify=use_inotify
+        )
+        try:
+            assert watcher.wait(0.05) is False
+        finally:
+            watcher.close()
+
+    def test_detects_replaced_file(self, tmp_path, use_inotify):
+        """Test that a file replaced by a rename is still watched."""
+        path = tmp_path / "doc.md"
+        path.write_text("# Title\n")
+        watcher = FileWatcher(
+            path, poll_interval=0.01, use_inotify=use_inotify
+        )
+        try:
+            new = tmp_path / "new.md"
+            new.write_text("# Rewritten\n\ntext\n")
+            new.replace(path)
+            assert watcher.wait(2.0) is True
+            while watcher.wait(0.05):
+                pass
+
+            with open(path, "a") as f:
+                f.write("\nmore\n")
+            assert watcher.wait(2.0) is True
+        finally:
+            watcher.close()
@@ -1,8 +1,21 @@
 """txmd - A terminal-based markdown viewer with pipeline support."""
 
-try:
-    from importlib.metadata import version
+from typing import Any
 
-    __version__ = version("txmd")
-except Exception:
-    __version__ = "unknown"
+
+def __getattr__(name: str) -> Any:
+    """Look the version up on first use.
+
+    Reading the installed package metadata takes tens of milliseconds,
+    which every command would pay at startup if it was done on import.
+    """
+    if name == "__version__":
+        try:
+            from importlib.metadata import version
+
+            value = version("txmd")
+        except Exception:
+            value = "unknown"
+        globals()["__version__"] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
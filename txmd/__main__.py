@@ -0,0 +1,74 @@
+"""Entry point of the txmd command, also run by ``python -m txmd``."""
+
+import sys
+from typing import List
+
+# Options of txmd.cli that take a value, which may be "-v" or "--version"
+VALUE_OPTIONS = frozenset(
+    {
+        "--width",
+        "--fast-size",
+        "--fast-lines",
+        "--idle-timeout",
+        "--profile-dump",
+        "--latency-report",
+        "--record-keys",
+        "--replay",
+        "--max-memory",
+    }
+)
+
+
+def asks_for_version(args: List[str]) -> bool:
+    """Tell whether a command line asks for the version.
+
+    Only the arguments before the first ``--`` and the first option that
+    takes a value are looked at: after them, ``-v`` may be a file name or
+    the value of the option, which only the Typer app can tell.
+
+    Args:
+        args (List[str]): The command line arguments.
+
+    Returns:
+        bool: True if ``--version`` or ``-v`` comes first.
+    """
+    for arg in args:
+        if arg in ("--version", "-v"):
+            return True
+        if arg == "--" or arg in VALUE_OPTIONS:
+            return False
+    return False
+
+
+def main() -> None:
+    """Run the txmd command line.
+
+    ``--version`` is answered before the command line parser is imported:
+    Typer loads Rich with it, which costs more than the rest of the
+    command. Other commands are handed to a warm ``txmd --server`` if one
+    is listening (see ``txmd.server``), and run by the Typer app in
+    ``txmd.cli`` otherwise.
+    """
+    args = sys.argv[1:]
+    if asks_for_version(args):
+        from txmd import __version__
+
+        print(f"txmd version {__version__}")
+        return
+
+    if "--" in args:
+        args = args[: args.index("--")]
+    if "--server" not in args:
+        from txmd.server import delegate
+
+        code = delegate(sys.argv[1:])
+        if code is not None:
+            sys.exit(code)
+
+    from txmd.cli import app
+
+    app()
+
+
+if __name__ == "__main__":
+    main()
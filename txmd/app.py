@@ -0,0 +1,1369 @@
+"""Textual application of the txmd markdown viewer."""
+
+import codecs
+import os
+import queue
+import select
+import sys
+import threading
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from textual import events, work
+from textual.app import App, ComposeResult
+from textual.binding import Binding
+from textual.containers import ScrollableContainer
+from textual.timer import Timer
+from textual.widgets import Input, Tree
+from textual.widgets.tree import TreeNode
+from textual.worker import Worker, get_current_worker
+
+from txmd.blocks import Block, BlockSplitter
+from txmd.budget import current_rss, estimate_layout_memory
+from txmd.cache import DocumentCache
+from txmd.document import (
+    SCAN_CHUNK_SIZE,
+    Buffer,
+    Document,
+    map_file,
+    match_blocks,
+    scan_buffer,
+)
+from txmd.pager import (
+    LineChunk,
+    PagerView,
+    exceeds_threshold,
+    scan_lines,
+)
+from txmd.palette import SectionPalette
+from txmd.search import SearchResults, TrigramIndex, search_buffer
+from txmd.view import DocumentView
+from txmd.watcher import FileWatcher
+
+# Maximum number of bytes requested from a piped stream per read
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Seconds to wait for piped data before re-checking for cancellation
+STREAM_POLL_INTERVAL = 0.1
+
+# Whether select() can wait on a pipe: on Windows it only takes sockets,
+# so the stream is read by blocking reads in a thread of its own
+SELECT_PIPES = sys.platform != "win32"
+
+# Seconds a watched file must stay unchanged before it is reloaded
+WATCH_DEBOUNCE = 0.1
+
+# Inputs larger than this (in bytes) are parsed by a background worker;
+# smaller ones parse in less time than it takes to draw a frame
+BACKGROUND_LOAD_SIZE = 256 * 1024
+
+# Size of the first chunk parsed in the background, small enough for the
+# first blocks to be shown within a frame or two
+LOAD_FIRST_CHUNK_SIZE = 16 * 1024
+
+# Documents larger than this (in bytes) get a trigram index when they are
+# first searched; smaller ones are scanned in a few milliseconds
+SEARCH_INDEX_SIZE = 4 * 1024 * 1024
+
+# Inputs larger than this (in bytes) are shown in fast mode, as source
+# lines, rather than laid out as Markdown blocks
+FAST_MODE_SIZE = 64 * 1024 * 1024
+
+# Minimum seconds between two moves of the TOC cursor while scrolling, so
+# holding a key repaints the TOC a few times a second, not once per line
+SCROLL_SPY_INTERVAL = 0.1
+
+# Fraction of the --max-memory budget at which the viewer starts saving
+# memory, so that it degrades before reaching the limit rather than after
+MEMORY_HIGH_WATER = 0.8
+
+# Seconds between two checks of the memory use against the budget
+MEMORY_CHECK_INTERVAL = 1.0
+
+# Fewest rendered blocks kept by the document view once memory is low;
+# it keeps more when its viewport and overscan span more blocks (a tall
+# terminal on short paragraphs), so that drawing a screen never evicts
+# blocks of the same screen
+LOW_MEMORY_CACHE_SIZE = 16
+
+
+class MarkdownViewerApp(App[None]):
+    """A Textual app to display markdown content.
+
+    This class provides a terminal user interface for viewing Markdown files
+    with vim-style navigation keybindings. It extends Textual's App class to
+    create a virtualized DocumentView that only renders the visible part of
+    the document.
+
+    Attributes:
+        document (Document): The content parsed into blocks, shared by the
+            document view and the TOC.
+        stream (Optional[BinaryIO]): A binary stream whose content is
+            appended to the viewer block by block as it arrives.
+        follow (Optional[Path]): A file whose appended content is added to
+            the viewer as it is written.
+        watch (Optional[Path]): A file that is reloaded whenever it is
+            saved, re-rendering only the blocks that changed.
+        cache (Optional[DocumentCache]): The parse cache the document is
+            loaded from, or saved to after parsing.
+        fast_mode (bool): True if the document is shown as source lines by
+            a PagerView, because it is above the fast mode threshold or
+            laying it out would not fit in ``max_memory``.
+        max_memory (Optional[int]): The memory budget of the process, in
+            bytes, if any.
+        low_memory (bool): True once the viewer saves memory to stay
+            within ``max_memory``: fewer rendered blocks are kept, and
+            searches scan the document instead of building an index.
+
+    Example:
+        >>> app = MarkdownViewerApp("# Hello\\nThis is markdown content")
+        >>> app.run()
+    """
+
+    CSS = """
+    #toc-tree {
+        display: none;
+        layer: overlay;
+        offset: 0 0;
+        width: 40;
+        height: 100%;
+        padding: 1;
+        background: $panel;
+        border-right: solid $primary;
+    }
+
+    #toc-tree.visible {
+        display: block;
+    }
+
+    #content {
+        width: 100%;
+        height: 100%;
+        background: $surface;
+        margin-left: 0;
+    }
+
+    #content.toc-visible {
+        margin-left: 40;
+    }
+
+    DocumentView, PagerView {
+        padding: 1 2;
+        background: $surface;
+        color: $text;
+    }
+
+    #search {
+        display: none;
+        dock: bottom;
+    }
+
+    #search.visible {
+        display: block;
+    }
+    """
+
+    BINDINGS = [
+        Binding("q", "quit", "Quit"),
+        Binding("j", "scroll_down", "Scroll Down"),
+        Binding("k", "scroll_up", "Scroll Up"),
+        Binding("up", "scroll_up", "Up"),
+        Binding("down", "scroll_down", "Down"),
+        Binding("pageup", "page_up", "Page Up"),
+        Binding("pagedown", "page_down", "Page Down"),
+        Binding("home", "scroll_home", "Top"),
+        Binding("end", "scroll_end", "Bottom"),
+        Binding("ctrl+c", "quit", "Quit"),
+        Binding("space", "page_down", "Page Down"),
+        Binding("b", "page_up", "Page Up"),
+        Binding("t", "toggle_toc", "Toggle TOC"),
+        Binding("slash", "search", "Search"),
+        Binding("n", "next_match", "Next Match"),
+        Binding("N", "previous_match", "Previous Match"),
+        Binding("s", "jump_to_section", "Jump to Section"),
+    ]
+
+    def __init__(
+        self,
+        content: Union[str, Buffer, Document],
+        filename: Optional[str] = None,
+        stream: Optional[BinaryIO] = None,
+        follow: Optional[Path] = None,
+        watch: Optional[Path] = None,
+        cache: Optional[DocumentCache] = None,
+        fast_size: Optional[int] = FAST_MODE_SIZE,
+        fast_lines: Optional[int] = None,
+        max_memory: Optional[int] = None,
+    ):
+        """Initialize the MarkdownViewerApp.
+
+        Args:
+            content (Union[str, Buffer, Document]): The markdown content
+                to display in the viewer, as text, as UTF-8 encoded bytes
+                (e.g. a mapped file), or as a document already parsed from
+                it (e.g. by the parse cache).
+            filename (Optional[str]): The name of the file being viewed.
+            stream (Optional[BinaryIO]): An optional stream to read further
+                content from in the background (e.g. piped stdin).
+            follow (Optional[Path]): An optional file to watch for appended
+                content, usually the file ``content`` was loaded from.
+            watch (Optional[Path]): An optional file to reload when it is
+                edited, usually the file ``content`` was loaded from.
+            cache (Optional[DocumentCache]): An optional parse cache to
+                look ``content`` up in before parsing it.
+            fast_size (Optional[int]): Size in bytes above which ``content``
+                is shown in fast mode, or None for no limit.
+            fast_lines (Optional[int]): Number of lines above which
+                ``content`` is shown in fast mode, or None for no limit.
+            max_memory (Optional[int]): Resident set size, in bytes, that
+                the process should stay under, or None for no limit.
+        """
+        super().__init__()
+        self.cache = cache
+        self.max_memory = max_memory
+        self.low_memory = False
+        # Decided from the size alone, before anything is parsed. Reloads
+        # and appends need the blocks, so watched files are never paged.
+        self.fast_mode = (
+            not isinstance(content, Document)
+            and follow is None
+            and watch is None
+            and (
+                exceeds_threshold(content, fast_size, fast_lines)
+                or (stream is None and self._exceeds_budget(len(content)))
+            )
+        )
+        if isinstance(content, Document):
+            self.document = content
+            self._loading = False
+        elif self.fast_mode:
+            self.document = Document(content, scan=False)
+            self._loading = True
+        else:
+            # Large inputs are parsed once the first frame is on screen
+            self._loading = (
+                cache is not None or len(content) > BACKGROUND_LOAD_SIZE
+            )
+            self.document = Document(content, scan=not self._loading)
+        self.filename = filename or "(stdin)"
+        self.stream = stream
+        self.follow = follow
+        self.watch = watch
+        self.toc_visible = False
+        self.header_positions: Dict[str, int] = {}
+        # TOC entries added to the tree so far, by header id (the index of
+        # the header in document.headers)
+        self.toc_nodes: Dict[int, TreeNode] = {}
+        self._toc_built = False
+        # Ids of the entries whose children were added (-1 for the root)
+        self._toc_loaded: Set[int] = set()
+        # Lines matching the current search query, if any
+        self.search: Optional[SearchResults] = None
+        # Index of the match last jumped to
+        self._search_index: Optional[int] = None
+        # Trigram index of the document, once built by the index worker
+        self.search_index: Optional[TrigramIndex] = None
+        self._indexing = False
+        # Scroll position when the search bar was opened
+        self._search_origin = 0.0
+        # Pending move of the TOC cursor to the section at the top
+        self._scroll_spy: Optional[Timer] = None
+
+    @property
+    def content(self) -> str:
+        """str: The markdown content displayed in the viewer."""
+        return self.document.content
+
+    def compose(self) -> ComposeResult:
+        """Create child widgets for the app.
+
+        This method is called by Textual to build the widget hierarchy.
+        It creates a DocumentView for the content, and optionally overlays
+        a TOC tree.
+
+        Returns:
+            ComposeResult: The composed widgets for the application.
+        """
+        # Main content - virtualized document view (yield first for focus)
+        if self.fast_mode:
+            yield PagerView(self.document, id="content")
+        else:
+            yield DocumentView(self.document, id="content")
+
+        # TOC tree (hidden by default, will overlay when visible)
+        tree = Tree(self.filename, id="toc-tree")
+        tree.can_focus = False  # Don't steal focus when hidden
+        yield tree
+
+        # Search bar (hidden until '/' is pressed)
+        yield Input(placeholder="Search", id="search")
+
+        # Section palette (hidden until 's' is pressed)
+        yield SectionPalette(id="palette")
+
+    def action_quit(self) -> None:
+        """Quit the application.
+
+        This action is bound to 'q' and Ctrl+C keys by default.
+        """
+        self.exit()
+
+    def action_scroll_down(self) -> None:
+        """Scroll down by one line.
+
+        This action is bound to 'j' and down arrow keys.
+        Scrolling is performed without animation for immediate response.
+        """
+        self.query_one(ScrollableContainer).scroll_down(animate=False)
+
+    def action_scroll_up(self) -> None:
+        """Scroll up by one line.
+
+        This action is bound to 'k' and up arrow keys.
+        Scrolling is performed without animation for immediate response.
+        """
+        self.query_one(ScrollableContainer).scroll_up(animate=False)
+
+    def action_page_down(self) -> None:
+        """Scroll down by one page (viewport height).
+
+        This action is bound to PageDown, Space, and 'b' keys.
+        If the TOC tree is focused, Space navigates to the selected section.
+        Otherwise, scrolling is performed without animation for immediate
+        response.
+        """
+        # Check if TOC tree is focused - if so, navigate to section
+        tree = self.query_one("#toc-tree", Tree)
+        if tree.has_focus and tree.cursor_node is not None:
+            node_id = tree.cursor_node.data
+            if node_id is not None:
+                line_number = self.document.headers.line_number(node_id)
+                self._scroll_to_line(line_number, position_at_top=True)
+                return
+
+        # Normal page down behavior
+        self.query_one(ScrollableContainer).scroll_page_down(animate=False)
+
+    def action_page_up(self) -> None:
+        """Scroll up by one page (viewport height).
+
+        This action is bound to PageUp key.
+        Scrolling is performed without animation for immediate response.
+        """
+        self.query_one(ScrollableContainer).scroll_page_up(animate=False)
+
+    def action_scroll_home(self) -> None:
+        """Scroll to the top of the document.
+
+        This action is bound to the Home key.
+        Scrolling is performed without animation for immediate response.
+        """
+        self.query_one(ScrollableContainer).scroll_home(animate=False)
+
+    def action_scroll_end(self) -> None:
+        """Scroll to the bottom of the document.
+
+        This action is bound to the End key.
+        Scrolling is performed without animation for immediate response.
+        """
+        self.query_one(ScrollableContainer).scroll_end(animate=False)
+
+    def action_toggle_toc(self) -> None:
+        """Toggle the visibility of the Table of Contents tree.
+
+        This action is bound to the 't' key. It shows or hides the TOC
+        sidebar by adding/removing the 'visible' CSS class and shifts
+        the content to the right when TOC is visible.
+        """
+        toc_tree = self.query_one("#toc-tree", Tree)
+        content = self.query_one("#content", ScrollableContainer)
+        self.toc_visible = not self.toc_visible
+
+        if self.toc_visible and not self._toc_built:
+            self._populate_toc()
+
+        if self.toc_visible:
+            toc_tree.add_class("visible")
+            content.add_class("toc-visible")
+            toc_tree.can_focus = True  # Allow focus when visible
+            toc_tree.focus()
+            # Once the tree is laid out, point at the current section
+            self.call_after_refresh(self._sync_toc_cursor)
+        else:
+            toc_tree.remove_class("visible")
+            content.remove_class("toc-visible")
+            toc_tree.can_focus = False  # Prevent focus when hidden
+            # Return focus to the scrollable container
+            content.focus()
+
+    def action_search(self) -> None:
+        """Open the search bar.
+
+        This action is bound to the '/' key. The document is searched as
+        the query is typed, and the view jumps to the first match below
+        the current position. Enter keeps the matches for ``n``/``N``,
+        Escape closes the bar.
+        """
+        search = self.query_one("#search", Input)
+        self._search_origin = self._content_view().scroll_y
+        search.add_class("visible")
+        search.focus()
+        if (
+            not self._indexing
+            and not self.low_memory
+            and len(self.document.data) > SEARCH_INDEX_SIZE
+        ):
+            self._indexing = True
+            self._build_search_index()
+
+    def action_jump_to_section(self) -> None:
+        """Open the palette to jump to a section by name.
+
+        This action is bound to the 's' key. The headers are matched
+        fuzzily as the name is typed, and Enter jumps to the highlighted
+        one, like selecting it in the TOC.
+        """
+        self.query_one("#palette", SectionPalette).open(self.document.headers)
+
+    def action_next_match(self) -> None:
+        """Jump to the next line matching the search query.
+
+        This action is bound to the 'n' key. Matches wrap around at the
+        end of the document.
+        """
+        self._step_match(forward=True)
+
+    def action_previous_match(self) -> None:
+        """Jump to the previous line matching the search query.
+
+        This action is bound to the 'N' key. Matches wrap around at the
+        start of the document.
+        """
+        self._step_match(forward=False)
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        """Search the document again whenever the query changes.
+
+        Args:
+            event: The input change event
+        """
+        if event.input.id != "search":
+            return
+        self._search_index = None
+        if event.value:
+            self.search = SearchResults(event.value)
+            self._search_document(self.search)
+        else:
+            self.search = None
+            self.workers.cancel_group(self, "search")
+            self._restore_search_origin()
+        self._update_search_status()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """Keep the matches and give the focus back to the document.
+
+        Args:
+            event: The input submission event
+        """
+        if event.input.id != "search":
+            return
+        self._content_view().focus()
+
+    async def on_tree_node_selected(self, event: Tree.NodeSelected) -> None:
+        """Handle tree node selection to navigate to headers.
+
+        When a user selects a TOC entry, this method scrolls the markdown
+        view to the corresponding header.
+
+        Args:
+            event: The tree node selection event containing the selected node
+        """
+        if event.node.data is None:
+            return
+
+        self._jump_to_header(event.node.data)
+
+    def on_section_palette_selected(
+        self, message: SectionPalette.Selected
+    ) -> None:
+        """Jump to the header chosen in the section palette.
+
+        Args:
+            message: The message holding the id of the chosen header
+        """
+        self._jump_to_header(message.header_id)
+        self._content_view().focus()
+
+    def on_tree_node_expanded(self, event: Tree.NodeExpanded) -> None:
+        """Add the children of a TOC entry when it is first expanded.
+
+        Args:
+            event: The tree node expansion event
+        """
+        self._load_toc_children(event.node)
+
+    async def on_key(self, event: events.Key) -> None:
+        """Handle key events for enhanced tree navigation.
+
+        Args:
+            event: The key event
+        """
+        if event.key == "escape" and self._close_search():
+            event.prevent_default()
+            event.stop()
+            return
+
+        # Check if the tree is focused
+        tree = self.query_one("#toc-tree", Tree)
+        if not tree.has_focus:
+            return
+
+        # Handle Enter key - toggle expansion
+        if event.key == "enter":
+            if tree.cursor_node is not None:
+                # Toggle expansion if the node has children
+                if tree.cursor_node.allow_expand:
+                    self._load_toc_children(tree.cursor_node)
+                    tree.cursor_node.toggle()
+                    event.prevent_default()
+                    event.stop()
+
+    def _content_view(self) -> Union[DocumentView, PagerView]:
+        """Return the widget displaying the document, in either mode."""
+        if self.fast_mode:
+            return self.query_one("#content", PagerView)
+        return self.query_one("#content", DocumentView)
+
+    def _jump_to_header(self, header_id: int) -> None:
+        """Scroll the markdown view to a header.
+
+        Args:
+            header_id (int): The index of the header in
+                ``self.document.headers``.
+        """
+        headers = self.document.headers
+        if header_id < len(headers):
+            self._scroll_to_line(headers.line_number(header_id))
+
+    def _scroll_to_line(
+        self, line_number: int, position_at_top: bool = False
+    ) -> None:
+        """Scroll the markdown view to a specific line number.
+
+        The target row comes from the view's line-to-offset map, so the
+        jump lands exactly on the line whatever the height of the code
+        blocks and tables above it.
+
+        Args:
+            line_number: The line number to scroll to (1-indexed)
+            position_at_top: If True, position the line near the top of the
+                viewport (2 rows down). If False, put the line on the first
+                row of the viewport.
+        """
+        view = self._content_view()
+        if view.block_count == 0 or line_number < 1:
+            return
+
+        target_y = view.offset_for_line(line_number)
+
+        if position_at_top:
+            # Position ~2 rows below the top for visibility
+            target_y = max(0, target_y - 2)
+
+        # Jump without animation: rows passed through during an animation
+        # would be rendered and could change the layout under the target
+        view.scroll_to(y=target_y, animate=False)
+
+    async def on_mount(self) -> None:
+        """Handle app mount event.
+
+        This lifecycle method is called when the app is first mounted.
+        It sets the application title and initial focus. The TOC is only
+        populated when it is first shown. Large documents are parsed in the
+        background after the first frame, so the viewer is responsive
+        straight away.
+        """
+        self.title = "Markdown Viewer"
+        self._reset_toc()
+        # Ensure content container has focus for scrolling
+        view = self._content_view()
+        view.focus()
+        view.watch(view, "scroll_y", self._on_content_scrolled, init=False)
+        if self.max_memory is not None:
+            self.set_interval(MEMORY_CHECK_INTERVAL, self._check_memory)
+        if self.fast_mode:
+            self.sub_title = "fast mode, indexing..."
+            size = len(self.document.data) / (1024 * 1024)
+            if self.low_memory:
+                message = (
+                    f"Document too large for the memory budget "
+                    f"({size:.1f} MB): showing the source in fast mode"
+                )
+            else:
+                message = (
+                    f"Large document ({size:.1f} MB): showing the source "
+                    "in fast mode"
+                )
+            self.notify(message, timeout=3)
+            self.call_after_refresh(self._load_lines)
+        elif self._loading:
+            self.sub_title = "loading..."
+            self.call_after_refresh(self._load_document)
+        else:
+            self._start_updates()
+
+    def _start_updates(self) -> None:
+        """Start the workers that add content after the initial document."""
+        if self.stream is not None:
+            self.sub_title = "reading..."
+            self._read_stream()
+        if self.follow is not None:
+            self.sub_title = "following"
+            self._follow_file()
+        if self.watch is not None:
+            self.sub_title = "watching"
+            self._watch_file()
+
+    @work(thread=True, exclusive=True, group="load")
+    def _load_document(self) -> None:
+        """Parse the document in a thread worker, showing blocks early.
+
+        The document is looked up in the parse cache first, if any. On a
+        miss, blocks are handed to the UI thread chunk by chunk, starting
+        with a small chunk so the top of the document shows up right away,
+        and the parsed document is saved to the cache at the end.
+        """
+        worker = get_current_worker()
+        document = self.document
+        data = document.data
+        if self.cache is not None:
+            cached = self.cache.load(data)
+            if cached is not None:
+                self.call_from_thread(self._set_document, cached)
+                self.call_from_thread(self._finish_loading)
+                return
+
+        size = max(1, len(data))
+        done = 0
+        chunk_size = LOAD_FIRST_CHUNK_SIZE
+        for blocks in scan_buffer(data, first_chunk_size=chunk_size):
+            if worker.is_cancelled:
+                return
+            done = min(size, done + chunk_size)
+            chunk_size = min(chunk_size * 2, SCAN_CHUNK_SIZE)
+            self.call_from_thread(
+                self._add_loaded_blocks, blocks, done * 100 // size
+            )
+
+        if self.cache is not None:
+            self.cache.save(data, document)
+        self.call_from_thread(self._finish_loading)
+
+    @work(thread=True, exclusive=True, group="load")
+    def _load_lines(self) -> None:
+        """Index the lines and headers of a document shown in fast mode.
+
+        Like ``_load_document()``, the first chunk is small, and the lines
+        and TOC entries of every chunk are handed to the UI thread as soon
+        as it is scanned.
+        """
+        worker = get_current_worker()
+        data = self.document.data
+        size = max(1, len(data))
+        chunks = scan_lines(data, first_chunk_size=LOAD_FIRST_CHUNK_SIZE)
+        for chunk in chunks:
+            if worker.is_cancelled:
+                return
+            self.call_from_thread(
+                self._add_loaded_lines, chunk, chunk.end * 100 // size
+            )
+        self.call_from_thread(self._finish_loading)
+
+    def _add_loaded_lines(self, chunk: LineChunk, percent: int) -> None:
+        """Show lines indexed by the fast mode worker.
+
+        Args:
+            chunk (LineChunk): The next chunk of the document.
+            percent (int): How much of the document has been indexed.
+        """
+        self.sub_title = f"fast mode, indexing {percent}%"
+        headers = self.document.headers
+        start = len(headers)
+        for level, title, line_number in chunk.headers:
+            headers.append(level, title, line_number)
+        self.query_one("#content", PagerView).add_lines(chunk)
+        self._extend_toc(start)
+
+    def _add_loaded_blocks(self, blocks: List[Block], percent: int) -> None:
+        """Show blocks parsed by the loading worker.
+
+        Args:
+            blocks (List[Block]): The next blocks of the document.
+            percent (int): How much of the document has been parsed.
+        """
+        self.sub_title = f"loading {percent}%"
+        start = len(self.document.headers)
+        self.query_one("#content", DocumentView).add_scanned_blocks(blocks)
+        self._extend_toc(start)
+        # Parsing grows memory fastest: check between chunks too
+        self._check_memory()
+
+    def _finish_loading(self) -> None:
+        """Clear the loading indicator once the document is parsed."""
+        self._loading = False
+        self.sub_title = "fast mode" if self.fast_mode else ""
+        self._start_updates()
+
+    @work(thread=True, exclusive=True, group="stream")
+    def _read_stream(self) -> None:
+        """Read the input stream in chunks and append completed blocks.
+
+        Runs in a thread worker so the UI stays responsive while a slow
+        producer is still writing. Each chunk is split into complete
+        Markdown blocks, which are handed to the UI thread as soon as they
+        are available.
+        """
+        worker = get_current_worker()
+        splitter = BlockSplitter(self.document.line_count + 1)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        for chunk in self._stream_chunks(worker):
+            blocks = splitter.feed(decoder.decode(chunk))
+            if blocks:
+                self.call_from_thread(self._append_blocks, blocks)
+
+        if worker.is_cancelled:
+            return
+        blocks = splitter.feed(decoder.decode(b"", final=True))
+        blocks += splitter.close()
+        self.call_from_thread(self._append_blocks, blocks)
+        self.call_from_thread(setattr, self, "sub_title", "")
+
+    def _stream_chunks(self, worker: Worker) -> Iterator[bytes]:
+        """Yield the chunks of the input stream as they arrive.
+
+        Reads wait with a timeout, so quitting never blocks on a quiet
+        pipe. Where ``select()`` cannot wait on pipes, blocking reads run
+        in a daemon thread and hand their chunks over through a queue, so
+        a producer that never closes the pipe cannot keep the process from
+        exiting either.
+
+        Args:
+            worker (Worker): The worker reading the stream.
+
+        Yields:
+            bytes: The chunks, until the end of the stream or until the
+                worker is cancelled.
+        """
+        stream = self.stream
+        assert stream is not None
+        if SELECT_PIPES:
+            while not worker.is_cancelled:
+                readable, _, _ = select.select(
+                    [stream], [], [], STREAM_POLL_INTERVAL
+                )
+                if not readable:
+                    continue
+                chunk = stream.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+            return
+
+        chunks: "queue.Queue[bytes]" = queue.Queue()
+
+        def read() -> None:
+            try:
+                while True:
+                    chunk = stream.read(STREAM_CHUNK_SIZE)
+                    chunks.put(chunk)
+                    if not chunk:
+                        return
+            except (OSError, ValueError):
+                # The stream was closed under the read
+                chunks.put(b"")
+
+        threading.Thread(target=read, name="txmd-stream", daemon=True).start()
+        while not worker.is_cancelled:
+            try:
+                chunk = chunks.get(timeout=STREAM_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if not chunk:
+                return
+            yield chunk
+
+    @work(thread=True, exclusive=True, group="follow")
+    def _follow_file(self) -> None:
+        """Watch the followed file and add the content appended to it.
+
+        Runs in a thread worker that sleeps until the file changes (see
+        ``FileWatcher``), so following costs no CPU while the file is idle.
+        Only the appended bytes, and the last block they may continue, are
+        parsed; a file that shrank was rewritten and is parsed again.
+        """
+        assert self.follow is not None
+        worker = get_current_worker()
+        watcher = FileWatcher(self.follow)
+        size = len(self.document.data)
+        try:
+            while not worker.is_cancelled:
+                if not watcher.wait(STREAM_POLL_INTERVAL):
+                    continue
+                try:
+                    new_size = os.stat(self.follow).st_size
+                    if new_size == size:
+                        continue
+                    data = map_file(self.follow)
+                except OSError:
+                    # Being replaced: wait for the next notification
+                    continue
+                size = len(data)
+                if size < len(self.document.data):
+                    self.call_from_thread(self._set_document, Document(data))
+                else:
+                    first, blocks = self.document.scan_tail(data)
+                    self.call_from_thread(
+                        self._replace_tail, data, first, blocks
+                    )
+        finally:
+            watcher.close()
+
+    def _replace_tail(
+        self, data: Buffer, first: int, blocks: List[Block]
+    ) -> None:
+        """Replace the last blocks of the document after the file grew.
+
+        The TOC entries of the replaced blocks are removed and those of the
+        new blocks appended, without rebuilding the tree. If the view was
+        scrolled to the bottom, it stays at the bottom.
+
+        Args:
+            data (Buffer): The new content of the file.
+            first (int): The index of the first block to replace.
+            blocks (List[Block]): The blocks replacing the old ones.
+        """
+        view = self.query_one("#content", DocumentView)
+        at_bottom = view.scroll_y >= view.max_scroll_y
+        removed = view.replace_tail(data, first, blocks)
+        start = len(self.document.headers) - sum(
+            1 for block in blocks if block.level
+        )
+        self._truncate_toc(start, len(removed))
+        self._extend_toc(start)
+        if at_bottom:
+            view.scroll_end(animate=False)
+
+    def _set_document(self, document: Document) -> None:
+        """Display a new document and rebuild the TOC.
+
+        Args:
+            document (Document): The parsed document to display.
+        """
+        if document.data is not self.document.data:
+            self._reset_search_index()
+        self.document = document
+        self.query_one("#content", DocumentView).set_document(document)
+        self._reset_toc()
+
+    @work(thread=True, exclusive=True, group="watch")
+    def _watch_file(self) -> None:
+        """Reload the watched file whenever it is saved.
+
+        The file is parsed and its blocks hashed and compared with the
+        displayed version in this thread worker; the UI thread only swaps
+        in the new document and renders the blocks that changed.
+        """
+        assert self.watch is not None
+        worker = get_current_worker()
+        watcher = FileWatcher(self.watch)
+        hashes = self.document.block_hashes()
+        try:
+            while not worker.is_cancelled:
+                if not watcher.wait(STREAM_POLL_INTERVAL):
+                    continue
+                # Editors often save in several steps (truncate and write,
+                # or write and rename): wait for the file to settle
+                while not worker.is_cancelled and watcher.wait(WATCH_DEBOUNCE):
+                    pass
+                try:
+                    data = self.watch.read_bytes()
+                except OSError:
+                    # Replaced right now: the watcher reports the new file
+                    continue
+                document = Document(data)
+                new_hashes = document.block_hashes()
+                if new_hashes == hashes:
+                    continue
+                runs = match_blocks(hashes, new_hashes)
+                hashes = new_hashes
+                self.call_from_thread(self._update_document, document, runs)
+        finally:
+            watcher.close()
+
+    def _update_document(
+        self, document: Document, runs: List[Tuple[int, int, int]]
+    ) -> None:
+        """Display a new version of the document after the file changed.
+
+        Unchanged blocks keep their rendered lines and the scroll position
+        is preserved (see ``DocumentView.update_document()``). The TOC is
+        left alone when only the line numbers of its headers moved, and
+        otherwise rebuilt with the same entries expanded.
+
+        Args:
+            document (Document): The new version of the document.
+            runs (List[Tuple[int, int, int]]): Runs of blocks the old and
+                the new version have in common, from ``match_blocks()``.
+        """
+        old_headers = self.document.headers
+        self.document = document
+        self.query_one("#content", DocumentView).update_document(
+            document, runs
+        )
+        self._reset_search_index()
+
+        headers = document.headers
+        if [h[:2] for h in headers] == [h[:2] for h in old_headers]:
+            # Same outline: entries read their line from the document
+            return
+        if not self._toc_built:
+            self._reset_toc()
+            return
+
+        tree = self.query_one("#toc-tree", Tree)
+        expanded = {
+            _tree_path(node)
+            for node in _iter_tree(tree.root)
+            if node.is_expanded
+        }
+        cursor = tree.cursor_node
+        cursor_path = _tree_path(cursor) if cursor is not None else None
+        self._reset_toc()
+        pending = list(tree.root.children)
+        while pending:
+            node = pending.pop()
+            path = _tree_path(node)
+            if path in expanded:
+                self._load_toc_children(node)
+                node.expand()
+                pending.extend(node.children)
+            if path == cursor_path:
+                # Lines are laid out again on the next refresh
+                self.call_after_refresh(tree.move_cursor, node)
+
+    def _append_blocks(self, blocks: List[Block]) -> None:
+        """Append complete markdown blocks to the view and the TOC.
+
+        Args:
+            blocks (List[Block]): Parsed blocks continuing the document.
+        """
+        if not blocks:
+            return
+
+        start = len(self.document.headers)
+        self.query_one("#content", DocumentView).extend(blocks)
+        self._extend_toc(start)
+
+    def _exceeds_budget(self, size: int) -> bool:
+        """Return whether laying out a document would break the budget.
+
+        If so, the viewer is in low memory mode from the start.
+
+        Args:
+            size (int): The size of the document, in bytes.
+        """
+        if self.max_memory is None:
+            return False
+        needed = (current_rss() or 0) + estimate_layout_memory(size)
+        if needed <= self.max_memory * MEMORY_HIGH_WATER:
+            return False
+        self.low_memory = True
+        return True
+
+    def _check_memory(self) -> None:
+        """Save memory once the process nears the --max-memory budget.
+
+        Rendered blocks beyond a screenful are dropped (they are rendered
+        again from the source when shown) and the search index is freed
+        and not built again. This happens at ``MEMORY_HIGH_WATER`` of the
+        budget, so that the process stays under it.
+        """
+        if self.max_memory is None or self.low_memory:
+            return
+        rss = current_rss()
+        if rss is None or rss < self.max_memory * MEMORY_HIGH_WATER:
+            return
+        self.low_memory = True
+        view = self._content_view()
+        if isinstance(view, DocumentView):
+            view.shrink_cache(
+                max(LOW_MEMORY_CACHE_SIZE, view.viewport_block_count)
+            )
+        self._reset_search_index()
+        self.notify(
+            f"Memory use near the budget ({rss / 2**20:.0f} of "
+            f"{self.max_memory / 2**20:.0f} MB): keeping fewer rendered "
+            "blocks",
+            severity="warning",
+            timeout=5,
+        )
+
+    def _reset_toc(self) -> None:
+        """Start over with the TOC of a new document.
+
+        The tree is only populated again if it was already shown.
+        """
+        if self._toc_built:
+            self._populate_toc()
+
+    def _populate_toc(self) -> None:
+        """Populate the TOC tree widget with the top-level headings.
+
+        Only the top-level entries are added. The entries below a heading
+        are added when it is first expanded (see ``_load_toc_children``),
+        so opening the TOC of a reference with 100k headings costs about
+        as much as opening the TOC of a short note.
+        """
+        tree = self.query_one("#toc-tree", Tree)
+        tree.clear()
+        self.toc_nodes.clear()
+        self._toc_loaded.clear()
+        self._toc_built = True
+        self._load_toc_children(tree.root)
+        tree.root.expand()
+
+    def _load_toc_children(self, tree_node: TreeNode) -> None:
+        """Add the entries below a TOC entry, unless already added.
+
+        Args:
+            tree_node (TreeNode): The entry, or the root of the tree.
+        """
+        node_id = -1 if tree_node.is_root else tree_node.data
+        if node_id in self._toc_loaded:
+            return
+        self._toc_loaded.add(node_id)
+        for child_id in self.document.headers.children(node_id):
+            self._add_toc_entry(tree_node, child_id)
+
+    def _add_toc_entry(self, parent: TreeNode, node_id: int) -> None:
+        """Add the entry of a header to the TOC tree.
+
+        Args:
+            parent (TreeNode): The entry of the parent header, or the root.
+            node_id (int): The index of the header in document.headers.
+        """
+        headers = self.document.headers
+        self.toc_nodes[node_id] = parent.add(
+            headers.text(node_id),
+            data=node_id,
+            # Leaf nodes should not show expand/collapse controls
+            allow_expand=headers.has_children(node_id),
+        )
+
+    def _on_content_scrolled(self) -> None:
+        """Schedule moving the TOC cursor after the view scrolled.
+
+        This runs on every change of the scroll position, so it only
+        starts a timer: the cursor moves at most once per
+        ``SCROLL_SPY_INTERVAL``, and not at all while the TOC is hidden.
+        """
+        if self.toc_visible and self._scroll_spy is None:
+            self._scroll_spy = self.set_timer(
+                SCROLL_SPY_INTERVAL, self._sync_toc_cursor
+            )
+
+    def _sync_toc_cursor(self) -> None:
+        """Move the TOC cursor to the section at the top of the view.
+
+        The top row is mapped to a source line through the view's offset
+        map, and the line to its section by bisecting the sorted header
+        lines, so the cost does not depend on the size of the tree. If
+        the section's entry is not shown (its parent is collapsed), the
+        cursor goes to the closest ancestor that is.
+        """
+        self._scroll_spy = None
+        # The timer can fire while the app is exiting, after its screens
+        # are gone
+        if not self.toc_visible or not self.screen_stack:
+            return
+
+        view = self._content_view()
+        headers = self.document.headers
+        # Look a little below the top, where jumps put their target line
+        node_id = headers.find(view.line_at(int(view.scroll_y) + 2))
+        while node_id >= 0:
+            tree_node = self.toc_nodes.get(node_id)
+            if tree_node is not None and tree_node.line >= 0:
+                tree = self.query_one("#toc-tree", Tree)
+                if tree.cursor_node is not tree_node:
+                    tree.move_cursor(tree_node)
+                return
+            node_id = headers.parent(node_id)
+
+    def _extend_toc(self, start: int) -> None:
+        """Add headers appended to the document to the TOC tree.
+
+        New headers are nested under their parent in the header index.
+        They are only added to the tree if their parent's entries are
+        shown.
+
+        Args:
+            start (int): The id of the first new header.
+        """
+        headers = self.document.headers
+        for node_id in range(start, len(headers)):
+            parent_id = headers.parent(node_id)
+            if parent_id in self._toc_loaded:
+                if parent_id < 0:
+                    parent = self.query_one("#toc-tree", Tree).root
+                else:
+                    parent = self.toc_nodes[parent_id]
+                self._add_toc_entry(parent, node_id)
+            elif parent_id in self.toc_nodes:
+                self.toc_nodes[parent_id].allow_expand = True
+
+    def _truncate_toc(self, count: int, removed: int) -> None:
+        """Remove the entries of headers removed from the document.
+
+        Args:
+            count (int): Number of headers kept from the old document.
+            removed (int): Number of headers removed from its end.
+        """
+        if not removed:
+            return
+        headers = self.document.headers
+        parent_ids = set()
+        # Children first, so no entry is removed twice
+        for node_id in range(count + removed - 1, count - 1, -1):
+            self._toc_loaded.discard(node_id)
+            tree_node = self.toc_nodes.pop(node_id, None)
+            if tree_node is not None:
+                parent = tree_node.parent
+                if parent is not None and not parent.is_root:
+                    parent_ids.add(parent.data)
+                tree_node.remove()
+        for parent_id in parent_ids:
+            if parent_id in self.toc_nodes:
+                self.toc_nodes[parent_id].allow_expand = headers.has_children(
+                    parent_id
+                )
+
+    @work(thread=True, exclusive=True, group="search")
+    def _search_document(self, results: SearchResults) -> None:
+        """Search the document in a thread worker, streaming the matches.
+
+        Starting a new search cancels this one (the worker is exclusive),
+        and the search stops at the next chunk boundary.
+
+        Args:
+            results (SearchResults): The results to fill, which must be
+                the app's current ones for the matches to be shown.
+        """
+        worker = get_current_worker()
+        data = self.document.data
+        index = self.search_index
+        if index is not None:
+            chunks = index.search(data, results.query)
+        else:
+            chunks = search_buffer(data, results.query)
+        for lines in chunks:
+            if worker.is_cancelled:
+                return
+            if lines:
+                self.call_from_thread(self._add_search_lines, results, lines)
+        self.call_from_thread(self._finish_search, results)
+
+    @work(thread=True, exclusive=True, group="index")
+    def _build_search_index(self) -> None:
+        """Build the trigram index of the document in a thread worker.
+
+        The index is loaded from the parse cache if possible, and saved to
+        it after being built. Searches scan the whole document until the
+        index is ready, and use it from then on.
+        """
+        worker = get_current_worker()
+        data = self.document.data
+        if isinstance(data, bytearray):
+            # The buffer of a stream grows while it is indexed and hashed
+            data = bytes(data)
+
+        index = None
+        if self.cache is not None:
+            index = self.cache.load_search_index(data)
+        cached = index is not None
+        if index is None:
+            index = TrigramIndex()
+            for _ in index.index_buffer(data):
+                if worker.is_cancelled:
+                    return
+            if self.cache is not None:
+                self.cache.save_search_index(data, index)
+        self.call_from_thread(self._set_search_index, worker, index, cached)
+
+    def _set_search_index(
+        self, worker: Worker, index: TrigramIndex, cached: bool
+    ) -> None:
+        """Use a trigram index for the next searches and report its cost.
+
+        Args:
+            worker (Worker): The worker that built the index.
+            index (TrigramIndex): The index of the current document.
+            cached (bool): True if the index was loaded from the cache.
+        """
+        if worker.is_cancelled:
+            # The document changed while the index was being built
+            return
+        self.search_index = index
+        size = index.memory / (1024 * 1024)
+        if cached:
+            message = f"Search index loaded from cache ({size:.1f} MB)"
+        else:
+            message = (
+                f"Search index built in {index.build_time:.1f}s "
+                f"({size:.1f} MB, {len(index)} trigrams)"
+            )
+        self.notify(message, timeout=3)
+
+    def _reset_search_index(self) -> None:
+        """Drop the trigram index of a document that was replaced."""
+        self.workers.cancel_group(self, "index")
+        self.search_index = None
+        self._indexing = False
+
+    def _add_search_lines(
+        self, results: SearchResults, lines: List[int]
+    ) -> None:
+        """Record matching lines and jump to the first one below the origin.
+
+        Args:
+            results (SearchResults): The results the lines belong to.
+            lines (List[int]): The next matching lines.
+        """
+        if results is not self.search:
+            return
+        results.extend(lines)
+        if self._search_index is None:
+            view = self._content_view()
+            origin = view.line_at(int(self._search_origin))
+            index = results.next_match(origin - 1)
+            if index is not None:
+                self._jump_to_match(index)
+        self._update_search_status()
+
+    def _finish_search(self, results: SearchResults) -> None:
+        """Wrap around to the first match if none was below the origin.
+
+        Args:
+            results (SearchResults): The results of the finished search.
+        """
+        if results is not self.search:
+            return
+        results.complete = True
+        if self._search_index is None and results.lines:
+            self._jump_to_match(0)
+        self._update_search_status()
+
+    def _step_match(self, forward: bool) -> None:
+        """Jump to the next or previous match.
+
+        While the last match jumped to is on screen, its neighbour is
+        taken. Once the view was scrolled away from it, the closest match
+        to the top line of the viewport is looked up by bisection instead.
+
+        Args:
+            forward (bool): True for the next match, False for the
+                previous one.
+        """
+        results = self.search
+        if not results:
+            return
+        view = self._content_view()
+        top = int(view.scroll_y)
+        current = self._search_index
+        if current is not None and (
+            top
+            <= view.offset_for_line(results.lines[current])
+            < top + view.scrollable_content_region.height
+        ):
+            step = 1 if forward else -1
+            index: Optional[int] = (current + step) % len(results)
+        else:
+            line_number = view.line_at(top)
+            if forward:
+                index = results.next_match(line_number - 1)
+            else:
+                index = results.previous_match(line_number)
+            if index is None:
+                index = 0 if forward else len(results) - 1
+        self._jump_to_match(index)
+        self._update_search_status()
+
+    def _jump_to_match(self, index: int) -> None:
+        """Scroll to a matching line.
+
+        Args:
+            index (int): The index of the match in the search results.
+        """
+        assert self.search is not None
+        self._search_index = index
+        self._scroll_to_line(self.search.lines[index], position_at_top=True)
+
+    def _update_search_status(self) -> None:
+        """Show the position of the current match below the search bar."""
+        search = self.query_one("#search", Input)
+        results = self.search
+        if results is None:
+            status = ""
+        elif not results.lines:
+            status = "no matches" if results.complete else "searching..."
+        else:
+            current = (
+                "-" if self._search_index is None else self._search_index + 1
+            )
+            total = len(results) if results.complete else f"{len(results)}+"
+            status = f"{current}/{total}"
+        search.border_subtitle = status
+
+    def _restore_search_origin(self) -> None:
+        """Scroll back to where the view was when the search started."""
+        view = self._content_view()
+        view.scroll_to(y=self._search_origin, animate=False)
+
+    def _close_search(self) -> bool:
+        """Hide the search bar.
+
+        Closing the bar while typing cancels the search and scrolls back
+        to where it started; otherwise the matches are only hidden.
+
+        Returns:
+            bool: True if the bar was open.
+        """
+        search = self.query_one("#search", Input)
+        if not search.has_class("visible"):
+            return False
+        if search.has_focus:
+            self.workers.cancel_group(self, "search")
+            self.search = None
+            self._search_index = None
+            search.value = ""
+            self._restore_search_origin()
+        search.remove_class("visible")
+        self._content_view().focus()
+        return True
+
+
+def _iter_tree(node: TreeNode) -> Iterator[TreeNode]:
+    """Iterate over the descendants of a tree node in document order."""
+    for child in node.children:
+        yield child
+        yield from _iter_tree(child)
+
+
+def _tree_path(node: TreeNode) -> Tuple[str, ...]:
+    """Return the labels from the top level of the tree down to a node."""
+    path = []
+    while node.parent is not None:
+        path.append(str(node.label))
+        node = node.parent
+    return tuple(reversed(path))
@@ -0,0 +1,421 @@
+"""Splitting of Markdown text into top-level blocks for txmd.
+
+The line patterns and the setext heading rule defined here are the only
+definition of the block syntax txmd recognises: the fast mode scanner
+(``txmd.pager``) compiles the same patterns for bytes. Each pattern
+matches at the start of a line and stops before its newline, which it
+may or may not be given.
+"""
+
+import re
+from typing import List, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+# Indentation every line pattern below starts with: up to 3 spaces, as 4
+# start an indented code block
+LINE_INDENT = " {0,3}"
+
+# Opening line of a fenced code block: up to 3 spaces, then ``` or ~~~;
+# a backtick fence cannot have backticks in its info string
+FENCE_PATTERN = re.compile(
+    r" {0,3}(?P<fence>`{3,}(?=[^`\n]*(?:\n|\Z))|~{3,})"
+)
+
+# Closing line of a fenced code block, by fence character: it closes the
+# block if it is at least as long as the opening fence
+CLOSING_FENCE_PATTERNS = {
+    "`": re.compile(r" {0,3}(`{3,})[ \t\r]*(?=\n|\Z)"),
+    "~": re.compile(r" {0,3}(~{3,})[ \t\r]*(?=\n|\Z)"),
+}
+
+# ATX heading line: up to 3 spaces, 1-6 '#', then whitespace or end of line
+HEADING_PATTERN = re.compile(r" {0,3}(?P<hashes>#{1,6})(?=[ \t\r\n]|\Z)")
+
+# Setext heading underline: up to 3 spaces, then only '=' or only '-'
+SETEXT_UNDERLINE_PATTERN = re.compile(
+    r" {0,3}(?P<underline>=+|-+)[ \t\r]*(?=\n|\Z)"
+)
+
+# Start of a list item: bullet (-, +, *) or ordered (1. / 1)) marker
+LIST_ITEM_PATTERN = re.compile(r" {0,3}(?:[-+*]|\d{1,9}[.)])(?:[ \t]|$)")
+
+# First lines that cannot start a paragraph (and so a setext heading):
+# list items, block quotes, HTML and indented code
+NOT_PARAGRAPH_PATTERN = re.compile(
+    r"(?: {0,3}(?:[-+*]|\d{1,9}[.)])(?:[ \t]|$)| {0,3}[>]| {0,3}<| {4}|\t)"
+)
+
+# Block-level HTML tag names: an HTML block opened by one of them can
+# interrupt a paragraph (CommonMark HTML block type 6)
+_HTML_BLOCK_TAGS = (
+    "address|article|aside|base|basefont|blockquote|body|caption|center"
+    "|col|colgroup|dd|details|dialog|dir|div|dl|dt|fieldset|figcaption"
+    "|figure|footer|form|frame|frameset|h[1-6]|head|header|hr|html|iframe"
+    "|legend|li|link|main|menu|menuitem|nav|noframes|ol|optgroup|option|p"
+    "|param|search|section|summary|table|tbody|td|tfoot|th|thead|title|tr"
+    "|track|ul"
+)
+
+# First line of an HTML block, by kind (the CommonMark HTML block types):
+# - raw: <pre>, <script>, <style> or <textarea>, up to their closing tag
+# - comment, instruction, declaration, cdata: up to their terminator
+# - block: a block-level tag, up to the next blank line
+# - tag: any other tag alone on its line (but not a closing raw tag), up
+#   to the next blank line; it cannot interrupt a paragraph
+HTML_BLOCK_PATTERN = re.compile(
+    # The lookahead lets the regex engine rule out other lines at once
+    r" {0,3}(?=<)(?i:"
+    r"(?P<raw><(?:pre|script|style|textarea)(?=[ \t\r\n>]|\Z))"
+    r"|(?P<comment><!--)"
+    r"|(?P<instruction><\?)"
+    r"|(?P<declaration><![A-Za-z])"
+    r"|(?P<cdata><!\[CDATA\[)"
+    rf"|(?P<block></?(?:{_HTML_BLOCK_TAGS})(?=[ \t\r\n>]|/>|\Z))"
+    r"|(?P<tag>(?:<[A-Za-z][A-Za-z0-9-]*"
+    r"(?:[ \t]+[A-Za-z_:][A-Za-z0-9_.:-]*"
+    r"(?:[ \t]*=[ \t]*(?:[^ \t\r\n\"'=<>`]+|'[^'\n]*'|\"[^\"\n]*\"))?)*"
+    r"[ \t]*/?>|</(?!(?:pre|script|style|textarea)[ \t>])"
+    r"[A-Za-z][A-Za-z0-9-]*[ \t]*>)[ \t\r]*(?=\n|\Z))"
+    r")"
+)
+
+# End of the HTML blocks that do not end at a blank line, by kind
+HTML_BLOCK_ENDS = {
+    "raw": re.compile(r"(?i:</(?:pre|script|style|textarea)>)"),
+    "comment": re.compile(r"-->"),
+    "instruction": re.compile(r"\?>"),
+    "declaration": re.compile(r">"),
+    "cdata": re.compile(r"\]\]>"),
+}
+
+# Characters a line must start with to match any of the patterns above
+MARKUP_START = frozenset(" \t#`~=-+*><0123456789")
+
+
+def after_indent(pattern: Pattern[str]) -> str:
+    """Return the source of a line pattern without its indentation.
+
+    Scanners that combine several line patterns into one regex match the
+    indentation once, before the alternatives.
+
+    Args:
+        pattern (Pattern[str]): One of the line patterns above.
+
+    Returns:
+        str: The source of the pattern after its ``LINE_INDENT``.
+    """
+    assert pattern.pattern.startswith(LINE_INDENT)
+    return pattern.pattern[len(LINE_INDENT) :]
+
+
+class Block(NamedTuple):
+    """A top-level block of a Markdown document.
+
+    Attributes:
+        text (str): The markdown source of the block, including its
+            trailing newline and the blank lines that follow it.
+        line_number (int): Line number in the document of the block's
+            first non-blank line (1-indexed).
+        level (int): Heading level (1-6) if the block is a heading with
+            text, 0 otherwise.
+        title (str): The heading text, empty if the block is not a heading.
+    """
+
+    text: str
+    line_number: int
+    level: int = 0
+    title: str = ""
+
+
+def heading_title(text: str) -> str:
+    """Extract the text of an ATX heading.
+
+    Args:
+        text (str): The rest of the heading line after its '#' marker.
+
+    Returns:
+        str: The heading text without surrounding whitespace or a closing
+            sequence of '#' characters.
+    """
+    text = text.strip()
+    closed = text.rstrip("#")
+    if not closed:
+        return ""
+    if closed[-1] in " \t":
+        return closed.rstrip()
+    return text
+
+
+def setext_title(lines: Sequence[str]) -> Optional[str]:
+    """Extract the text of a setext heading from the lines it underlines.
+
+    Args:
+        lines (Sequence[str]): The lines between the underline and the
+            last blank line, heading, fence, HTML block or thematic break
+            above it, in order.
+
+    Returns:
+        Optional[str]: The lines joined by spaces, or None if they are not
+            a paragraph (e.g. they start a list or a block quote), in
+            which case the underline is a thematic break.
+    """
+    if not lines or NOT_PARAGRAPH_PATTERN.match(lines[0]):
+        return None
+    return " ".join(line.strip() for line in lines)
+
+
+class BlockSplitter:
+    """Incrementally split Markdown text into complete top-level blocks.
+
+    Text can be fed in arbitrary chunks (for example as it arrives on a
+    pipe). A block is only emitted once the first line of the *next* block
+    has been seen, so that blank-line separated continuations (indented
+    code, loose lists) stay together and fenced code blocks are never cut
+    in half. ATX and setext headings always form a block of their own, and
+    are recognised while splitting, so a single pass yields both the
+    blocks to render and the headers of the table of contents. HTML blocks
+    are opaque: headings and fences inside them are raw HTML.
+
+    Emitted blocks keep their trailing newline and the blank lines that
+    follow them, so joining the text of everything returned by ``feed()``
+    and ``close()`` reproduces the input exactly.
+
+    Example:
+        >>> splitter = BlockSplitter()
+        >>> splitter.feed("# Title\\n\\nSome text")
+        [Block(text='# Title\\n\\n', line_number=1, level=1, title='Title')]
+        >>> splitter.close()
+        [Block(text='Some text', line_number=3, level=0, title='')]
+    """
+
+    def __init__(self, line_number: int = 1) -> None:
+        """Initialize the BlockSplitter.
+
+        Args:
+            line_number (int): Line number of the first line of the text
+                that will be fed (1-indexed).
+        """
+        self._first_line = line_number
+        self._reset()
+
+    def _reset(self) -> None:
+        """Forget all buffered text and parsing state."""
+        self._line_number = self._first_line
+        self._partial = ""
+        self._lines: List[str] = []
+        self._leading_blanks = 0
+        self._fence: Optional[Tuple[str, int]] = None
+        # Whether an HTML block is open, and its end unless a blank line
+        self._html = False
+        self._html_end: Optional[Pattern[str]] = None
+        self._heading: Optional[Tuple[int, str]] = None
+        self._paragraph: Optional[int] = None
+        self._boundary = True
+        self._started = False
+        self._seen_blank = False
+        self._split_next = False
+        self._in_list = False
+
+    def feed(self, text: str) -> List[Block]:
+        """Consume a chunk of text and return the blocks it completed.
+
+        Args:
+            text (str): The next chunk of Markdown text.
+
+        Returns:
+            List[Block]: Blocks that are now known to be complete, in order.
+        """
+        blocks: List[Block] = []
+        data = self._partial + text
+        start = 0
+        while True:
+            end = data.find("\n", start)
+            if end == -1:
+                break
+            end += 1
+            self._process_line(data[start:end], blocks)
+            start = end
+        self._partial = data[start:]
+        return blocks
+
+    def close(self) -> List[Block]:
+        """Flush any buffered text at end of input.
+
+        The splitter is reset, so it can be reused for a new document.
+
+        Returns:
+            List[Block]: The final block, or an empty list if nothing is
+                buffered.
+        """
+        blocks: List[Block] = []
+        if self._partial:
+            self._process_line(self._partial, blocks)
+        if self._lines:
+            self._emit(self._lines, blocks)
+        self._reset()
+        return blocks
+
+    def _emit(self, lines: List[str], blocks: List[Block]) -> None:
+        """Turn buffered lines into a block and start the next one."""
+        text = "".join(lines)
+        level, title = self._heading or (0, "")
+        line_number = self._line_number + self._leading_blanks
+        blocks.append(Block(text, line_number, level, title))
+        self._line_number += text.count("\n")
+        self._leading_blanks = 0
+        self._heading = None
+        self._lines = []
+
+    def _process_line(self, line: str, blocks: List[Block]) -> None:
+        """Route one line into the current block.
+
+        Args:
+            line (str): A complete line, with its newline unless it is the
+                last line of the input.
+            blocks (List[Block]): Completed blocks to append to.
+        """
+        stripped = line.strip()
+
+        if self._fence is not None:
+            self._lines.append(line)
+            char, length = self._fence
+            closing = CLOSING_FENCE_PATTERNS[char].match(line)
+            if closing and len(closing.group(1)) >= length:
+                self._fence = None
+                self._boundary = True
+            return
+
+        if self._html:
+            if stripped or self._html_end is not None:
+                self._lines.append(line)
+                end = self._html_end
+                if end is not None and end.search(line):
+                    self._html = False
+                    self._boundary = True
+                return
+            # A blank line ends the HTML block, and is handled below
+            self._html = False
+
+        if not stripped:
+            self._lines.append(line)
+            if not self._started:
+                self._leading_blanks += 1
+            self._seen_blank = self._started
+            self._paragraph = None
+            self._boundary = True
+            return
+
+        # Lines of plain text cannot match any of the patterns below
+        markup = line[0] in MARKUP_START
+        if markup:
+            underline = SETEXT_UNDERLINE_PATTERN.match(line) is not None
+            if underline and self._paragraph is not None:
+                if not self._in_list:
+                    self._end_setext_heading(line, blocks)
+                    return
+            indented = line[0] in " \t"
+            is_list_item = LIST_ITEM_PATTERN.match(line) is not None
+            heading = HEADING_PATTERN.match(line)
+            if heading and self._in_list and indented:
+                heading = None
+            html = None
+            if "<" in line[:4] and not (self._in_list and indented):
+                html = HTML_BLOCK_PATTERN.match(line)
+        else:
+            underline = indented = is_list_item = False
+            heading = html = None
+
+        if self._started:
+            if heading or self._split_next:
+                split = True
+            elif self._seen_blank:
+                split = not (indented or (self._in_list and is_list_item))
+            else:
+                split = False
+            if split:
+                self._emit(self._lines, blocks)
+                self._started = False
+
+        if not self._started:
+            self._in_list = is_list_item
+            self._started = True
+            self._boundary = True
+        if html and html.lastgroup == "tag" and not self._boundary:
+            # A lone tag cannot interrupt a paragraph
+            html = None
+        if underline:
+            # A thematic break: like a blank line, the next line can start
+            # a paragraph
+            self._paragraph = None
+        elif self._boundary:
+            if markup and (heading or NOT_PARAGRAPH_PATTERN.match(line)):
+                self._paragraph = None
+            else:
+                self._paragraph = len(self._lines)
+        self._boundary = underline
+        self._seen_blank = False
+        self._split_next = heading is not None
+        self._lines.append(line)
+
+        if heading:
+            marker_end = heading.end(1)
+            title = heading_title(line[marker_end:])
+            self._heading = (len(heading.group(1)), title) if title else None
+            return
+
+        if html:
+            end = HTML_BLOCK_ENDS.get(html.lastgroup or "")
+            if end is not None and end.search(line, html.end()):
+                # The block ends on its first line
+                self._boundary = True
+            else:
+                self._html = True
+                self._html_end = end
+            self._paragraph = None
+            return
+
+        match = FENCE_PATTERN.match(line) if markup else None
+        if match:
+            fence = match.group(1)
+            self._fence = (fence[0], len(fence))
+            self._paragraph = None
+
+    def _end_setext_heading(self, line: str, blocks: List[Block]) -> None:
+        """Turn the current paragraph and its underline into a heading.
+
+        Lines of the current block before the paragraph (e.g. a fenced
+        code block directly above it) are emitted as a block of their own.
+
+        Args:
+            line (str): The underline, a line of only '=' or only '-'.
+            blocks (List[Block]): Completed blocks to append to.
+        """
+        start = self._paragraph
+        assert start is not None
+        if start:
+            lines = self._lines
+            self._emit(lines[:start], blocks)
+            self._lines = lines[start:]
+
+        title = setext_title(self._lines)
+        assert title is not None
+        level = 1 if line.lstrip()[0] == "=" else 2
+        self._heading = (level, title)
+        self._lines.append(line)
+        self._paragraph = None
+        self._seen_blank = False
+        self._split_next = True
+
+
+def split_blocks(text: str, line_number: int = 1) -> List[Block]:
+    """Split a complete Markdown document into top-level blocks.
+
+    Args:
+        text (str): The markdown content to split.
+        line_number (int): Line number of the first line of ``text``
+            (1-indexed).
+
+    Returns:
+        List[Block]: The blocks, whose texts concatenate to ``text``.
+    """
+    splitter = BlockSplitter(line_number)
+    return splitter.feed(text) + splitter.close()
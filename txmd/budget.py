@@ -0,0 +1,109 @@
+"""The memory budget of txmd, for ``txmd --max-memory``.
+
+The app imports this module whatever the options: it only reads the
+resident set size of the process, which costs nothing, and imports no
+other txmd module. The ``tracemalloc`` diagnostics of ``txmd --memory``
+are in ``txmd.memory``.
+"""
+
+import os
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+# Growth of the resident set size while a document is laid out as
+# Markdown blocks, per byte of input: the mapped pages of the input, and
+# the block and header indexes at their peak while parsing (--memory on
+# the benchmark corpora peaks at up to 1 traced byte per input byte)
+LAYOUT_BYTES_PER_BYTE = 2
+
+# Growth of the resident set size once the render cache of the document
+# view is full, whatever the size of the document (40-60 MB when paging
+# through the benchmark corpora, about half of it in fast mode)
+RENDER_MEMORY = 48 * 1024 * 1024
+
+# Suffixes accepted by parse_size(), as powers of 1024
+_SIZE_SUFFIXES = {"": 0, "K": 1, "M": 2, "G": 3, "T": 4}
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # Windows
+    _PAGE_SIZE = 4096
+
+
+def parse_size(text: str) -> int:
+    """Parse a size in bytes, with an optional binary suffix.
+
+    Args:
+        text (str): A number of bytes, optionally followed by K, M, G or
+            T (powers of 1024), with or without a trailing B or iB.
+
+    Returns:
+        int: The size in bytes.
+
+    Raises:
+        ValueError: If text is not a size.
+
+    Example:
+        >>> parse_size("512M")
+        536870912
+    """
+    value = text.strip().upper()
+    for unit in ("IB", "B"):
+        if value.endswith(unit) and value != unit:
+            value = value[: -len(unit)]
+            break
+    suffix = value[-1:] if value[-1:] in _SIZE_SUFFIXES else ""
+    number = value[: len(value) - len(suffix)]
+    try:
+        size = float(number)
+    except ValueError:
+        raise ValueError(f"invalid size: {text!r}") from None
+    if size < 0:
+        raise ValueError(f"invalid size: {text!r}")
+    return int(size * 1024 ** _SIZE_SUFFIXES[suffix])
+
+
+def current_rss() -> Optional[int]:
+    """Return the resident set size of the process, in bytes.
+
+    Returns:
+        Optional[int]: The size read from ``/proc/self/statm`` on Linux;
+            elsewhere the peak size so far, which is never less than the
+            current one; None if neither is available.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def peak_rss() -> Optional[int]:
+    """Return the highest resident set size of the process, in bytes.
+
+    Returns:
+        Optional[int]: The size, or None where ``resource`` is missing.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def estimate_layout_memory(size: int) -> int:
+    """Estimate the memory needed to lay out a document as Markdown.
+
+    Args:
+        size (int): The size of the document, in bytes.
+
+    Returns:
+        int: The estimated growth of the resident set size, in bytes, from
+            loading the document to paging through all of it.
+    """
+    return RENDER_MEMORY + size * LAYOUT_BYTES_PER_BYTE
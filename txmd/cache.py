@@ -0,0 +1,279 @@
+"""Persistent on-disk cache of parsed documents for txmd."""
+
+import hashlib
+import json
+import os
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Optional, Union
+
+from txmd import __version__
+from txmd.document import Buffer, Document, DocumentIndex
+from txmd.search import TrigramIndex
+
+# Default upper bound for the total size of the cache directory
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Bumped whenever the layout of cache entries changes
+CACHE_FORMAT = 2
+
+# Suffix of cache entries; temporary files being written use another one
+CACHE_SUFFIX = ".json"
+
+# Suffix of the search index entries stored next to the parsed documents
+INDEX_SUFFIX = ".trigrams"
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory, following the XDG base directory spec.
+
+    Returns:
+        Path: ``$XDG_CACHE_HOME/txmd``, or ``~/.cache/txmd`` if the
+            variable is unset or empty.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return Path(base) / "txmd"
+
+
+class DocumentCache:
+    """Size-bounded on-disk cache of parsed documents.
+
+    Entries are keyed by a BLAKE2 hash of the content and the txmd
+    version, and store the ``DocumentIndex`` needed to rebuild a
+    ``Document`` without parsing: the block boundaries, the first line of
+    every block (the line-offset index used for TOC jumps) and the
+    headings.
+
+    The trigram index used to search a document (see ``TrigramIndex``)
+    can be stored under the same key, in its own binary entry.
+
+    Several txmd processes can share the cache: entries are written to a
+    temporary file and atomically moved into place, so readers only ever
+    see complete entries, and unreadable entries are treated as misses.
+    Reading an entry refreshes its modification time, and the least
+    recently used entries are deleted once the directory grows beyond
+    ``max_size`` bytes.
+
+    Attributes:
+        directory (Path): The directory holding the cache entries.
+        max_size (int): Maximum total size of the entries, in bytes.
+
+    Example:
+        >>> cache = DocumentCache()
+        >>> document = cache.load(content)
+        >>> if document is None:
+        ...     document = Document(content)
+        ...     cache.save(content, document)
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_size: int = CACHE_MAX_BYTES,
+    ):
+        """Initialize the DocumentCache.
+
+        Args:
+            directory (Optional[Path]): Where to store the entries.
+                Defaults to ``default_cache_dir()``.
+            max_size (int): Maximum total size of the entries, in bytes.
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_size = max_size
+
+    def key(self, content: Union[str, Buffer]) -> str:
+        """Compute the cache key of some content.
+
+        Args:
+            content (Union[str, Buffer]): The markdown content, as text or
+                UTF-8 encoded bytes.
+
+        Returns:
+            str: A hex digest of the content and the txmd version.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"txmd {__version__} {CACHE_FORMAT}\0".encode())
+        digest.update(_encode_content(content))
+        return digest.hexdigest()
+
+    def load(self, content: Union[str, Buffer]) -> Optional[Document]:
+        """Rebuild the parsed document of some content from the cache.
+
+        Args:
+            content (Union[str, Buffer]): The markdown content, as text or
+                UTF-8 encoded bytes (e.g. a mapped file, which the
+                document then reads from).
+
+        Returns:
+            Optional[Document]: The document, or None if the content is
+                not cached or its entry is unreadable.
+        """
+        data = _encode_content(content)
+        path = self._path(self.key(data))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            document = Document.from_index(data, self._decode(data, entry))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            # Another process may have evicted the entry meanwhile
+            pass
+        return document
+
+    def save(self, content: Union[str, Buffer], document: Document) -> None:
+        """Store the parsed document of some content in the cache.
+
+        Failures to write (e.g. a read-only file system) are ignored, as
+        the cache is only an optimization.
+
+        Args:
+            content (Union[str, Buffer]): The markdown content, as text or
+                UTF-8 encoded bytes.
+            document (Document): The document parsed from ``content``.
+        """
+        entry = self._encode(document.get_index())
+        payload = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        self._write(self._path(self.key(content)), payload)
+
+    def load_search_index(
+        self, content: Union[str, Buffer]
+    ) -> Optional[TrigramIndex]:
+        """Restore the search index of some content from the cache.
+
+        Args:
+            content (Union[str, Buffer]): The markdown content, as text or
+                UTF-8 encoded bytes.
+
+        Returns:
+            Optional[TrigramIndex]: The index, or None if it is not
+                cached or its entry is unreadable.
+        """
+        data = _encode_content(content)
+        path = self._path(self.key(data), INDEX_SUFFIX)
+        try:
+            index = TrigramIndex.from_bytes(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        if index.size > len(data):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            # Another process may have evicted the entry meanwhile
+            pass
+        return index
+
+    def save_search_index(
+        self, content: Union[str, Buffer], index: TrigramIndex
+    ) -> None:
+        """Store the search index of some content in the cache.
+
+        Failures to write are ignored, as for ``save()``.
+
+        Args:
+            content (Union[str, Buffer]): The markdown content, as text or
+                UTF-8 encoded bytes.
+            index (TrigramIndex): The index built from ``content``.
+        """
+        path = self._path(self.key(content), INDEX_SUFFIX)
+        self._write(path, index.to_bytes())
+
+    def _path(self, key: str, suffix: str = CACHE_SUFFIX) -> Path:
+        """Return the path of the entry for a cache key."""
+        return self.directory / f"{key}{suffix}"
+
+    def _write(self, path: Path, payload: bytes) -> None:
+        """Atomically write an entry, then evict old entries if needed."""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.directory, prefix=".", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._evict()
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits."""
+        entries = []
+        total = 0
+        for path in self.directory.iterdir():
+            if path.suffix not in (CACHE_SUFFIX, INDEX_SUFFIX):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                # Already evicted by another process
+                pass
+            total -= size
+
+    @staticmethod
+    def _encode(index: DocumentIndex) -> dict:
+        """Convert a document index to JSON-serializable data."""
+        return {
+            "version": __version__,
+            "format": CACHE_FORMAT,
+            "ends": index.ends.tolist(),
+            "lines": index.lines.tolist(),
+            "spans": index.spans.tolist(),
+            "headings": index.headings,
+            "line_count": index.line_count,
+        }
+
+    @staticmethod
+    def _decode(data: Buffer, entry: dict) -> DocumentIndex:
+        """Convert cached data back to a document index.
+
+        Raises:
+            ValueError: If the entry does not describe ``data``.
+        """
+        if entry["version"] != __version__:
+            raise ValueError("Cache entry from another version")
+        if entry["format"] != CACHE_FORMAT:
+            raise ValueError("Cache entry in another format")
+        index = DocumentIndex(
+            array("q", entry["ends"]),
+            array("q", entry["lines"]),
+            array("l", entry["spans"]),
+            [tuple(heading) for heading in entry["headings"]],
+            entry["line_count"],
+        )
+        blocks = len(index.ends)
+        if len(index.lines) != blocks or len(index.spans) != blocks:
+            raise ValueError("Cache entry is inconsistent")
+        if (index.ends[-1] if blocks else 0) != len(data):
+            raise ValueError("Cache entry does not match the content")
+        return index
+
+
+def _encode_content(content: Union[str, Buffer]) -> Buffer:
+    """Return markdown content as UTF-8 encoded bytes."""
+    if isinstance(content, str):
+        return content.encode("utf-8", "surrogateescape")
+    return content
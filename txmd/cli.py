@@ -1,19 +1,25 @@
 # txmd/cli.py
+"""Command line interface of txmd.
+
+Only Typer is imported with this module. The viewer (Textual), Rich and
+the parsers are imported by ``main()`` on the paths that use them, so
+``--version``, usage errors and ``--render`` never load Textual.
+"""
+
+import os
 import sys
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Dict, Optional
+from typing import (
+    Annotated,
+    Any,
+    BinaryIO,
+    ContextManager,
+    List,
+    Optional,
+)
 
 import typer
-from rich.console import Console
-from textual import events
-from textual.app import App, ComposeResult
-from textual.binding import Binding
-from textual.containers import ScrollableContainer
-from textual.widgets import Markdown, Tree
-from textual.widgets.tree import TreeNode
-
-from txmd import __version__
-from txmd.toc import HeaderNode, build_toc_tree, parse_markdown_headers
 
 app = typer.Typer(
     name="txmd",
@@ -22,334 +28,6 @@ app = typer.Typer(
 )
 
 
-class MarkdownViewerApp(App[None]):
-    """A Textual app to display markdown content.
-
-    This class provides a terminal user interface for viewing Markdown files
-    with vim-style navigation keybindings. It extends Textual's App class to
-    create a scrollable container with a Markdown widget.
-
-    Attributes:
-        content (str): The markdown content to display in the viewer.
-
-    Example:
-        >>> app = MarkdownViewerApp("# Hello\\nThis is markdown content")
-        >>> app.run()
-    """
-
-    CSS = """
-    #toc-tree {
-        display: none;
-        layer: overlay;
-        offset: 0 0;
-        width: 40;
-        height: 100%;
-        padding: 1;
-        background: $panel;
-        border-right: solid $primary;
-    }
-
-    #toc-tree.visible {
-        display: block;
-    }
-
-    #content {
-        width: 100%;
-        height: 100%;
-        background: $surface;
-        margin-left: 0;
-    }
-
-    #content.toc-visible {
-        margin-left: 40;
-    }
-
-    Markdown {
-        width: 100%;
-        height: auto;
-        padding: 1 2;
-        background: $surface;
-        color: $text;
-    }
-    """
-
-    BINDINGS = [
-        Binding("q", "quit", "Quit"),
-        Binding("j", "scroll_down", "Scroll Down"),
-        Binding("k", "scroll_up", "Scroll Up"),
-        Binding("up", "scroll_up", "Up"),
-        Binding("down", "scroll_down", "Down"),
-        Binding("pageup", "page_up", "Page Up"),
-        Binding("pagedown", "page_down", "Page Down"),
-        Binding("home", "scroll_home", "Top"),
-        Binding("end", "scroll_end", "Bottom"),
-        Binding("ctrl+c", "quit", "Quit"),
-        Binding("space", "page_down", "Page Down"),
-        Binding("b", "page_up", "Page Up"),
-        Binding("t", "toggle_toc", "Toggle TOC"),
-    ]
-
-    def __init__(self, content: str, filename: Optional[str] = None):
-        """Initialize the MarkdownViewerApp.
-
-        Args:
-            content (str): The markdown content to display in the viewer.
-            filename (Optional[str]): The name of the file being viewed.
-        """
-        super().__init__()
-        self.content = content
-        self.filename = filename or "(stdin)"
-        self.toc_visible = False
-        self.header_positions: Dict[str, int] = {}
-        self.toc_nodes: Dict[str, HeaderNode] = {}
-
-    def compose(self) -> ComposeResult:
-        """Create child widgets for the app.
-
-        This method is called by Textual to build the widget hierarchy.
-        It creates a ScrollableContainer with a Markdown widget, and
-        optionally overlays a TOC tree.
-
-        Returns:
-            ComposeResult: The composed widgets for the application.
-        """
-        # Main content - scrollable container (yield first for focus)
-        with ScrollableContainer(id="content"):
-            yield Markdown(self.content)
-
-        # TOC tree (hidden by default, will overlay when visible)
-        tree = Tree(self.filename, id="toc-tree")
-        tree.can_focus = False  # Don't steal focus when hidden
-        yield tree
-
-    def action_quit(self) -> None:
-        """Quit the application.
-
-        This action is bound to 'q' and Ctrl+C keys by default.
-        """
-        self.exit()
-
-    def action_scroll_down(self) -> None:
-        """Scroll down by one line.
-
-        This action is bound to 'j' and down arrow keys.
-        Scrolling is performed without animation for immediate response.
-        """
-        self.query_one(ScrollableContainer).scroll_down(animate=False)
-
-    def action_scroll_up(self) -> None:
-        """Scroll up by one line.
-
-        This action is bound to 'k' and up arrow keys.
-        Scrolling is performed without animation for immediate response.
-        """
-        self.query_one(ScrollableContainer).scroll_up(animate=False)
-
-    def action_page_down(self) -> None:
-        """Scroll down by one page (viewport height).
-
-        This action is bound to PageDown, Space, and 'b' keys.
-        If the TOC tree is focused, Space navigates to the selected section.
-        Otherwise, scrolling is performed without animation for immediate
-        response.
-        """
-        # Check if TOC tree is focused - if so, navigate to section
-        tree = self.query_one("#toc-tree", Tree)
-        if tree.has_focus and tree.cursor_node is not None:
-            if tree.cursor_node.data:
-                node_key = tree.cursor_node.data
-                if node_key in self.toc_nodes:
-                    header_node = self.toc_nodes[node_key]
-                    self._scroll_to_line(
-                        header_node.line_number, position_at_top=True
-                    )
-                    return
-
-        # Normal page down behavior
-        self.query_one(ScrollableContainer).scroll_page_down(animate=False)
-
-    def action_page_up(self) -> None:
-        """Scroll up by one page (viewport height).
-
-        This action is bound to PageUp key.
-        Scrolling is performed without animation for immediate response.
-        """
-        self.query_one(ScrollableContainer).scroll_page_up(animate=False)
-
-    def action_scroll_home(self) -> None:
-        """Scroll to the top of the document.
-
-        This action is bound to the Home key.
-        Scrolling is performed without animation for immediate response.
-        """
-        self.query_one(ScrollableContainer).scroll_home(animate=False)
-
-    def action_scroll_end(self) -> None:
-        """Scroll to the bottom of the document.
-
-        This action is bound to the End key.
-        Scrolling is performed without animation for immediate response.
-        """
-        self.query_one(ScrollableContainer).scroll_end(animate=False)
-
-    def action_toggle_toc(self) -> None:
-        """Toggle the visibility of the Table of Contents tree.
-
-        This action is bound to the 't' key. It shows or hides the TOC
-        sidebar by adding/removing the 'visible' CSS class and shifts
-        the content to the right when TOC is visible.
-        """
-        toc_tree = self.query_one("#toc-tree", Tree)
-        content = self.query_one("#content", ScrollableContainer)
-        self.toc_visible = not self.toc_visible
-
-        if self.toc_visible:
-            toc_tree.add_class("visible")
-            content.add_class("toc-visible")
-            toc_tree.can_focus = True  # Allow focus when visible
-            toc_tree.focus()
-        else:
-            toc_tree.remove_class("visible")
-            content.remove_class("toc-visible")
-            toc_tree.can_focus = False  # Prevent focus when hidden
-            # Return focus to the scrollable container
-            content.focus()
-
-    async def on_tree_node_selected(self, event: Tree.NodeSelected) -> None:
-        """Handle tree node selection to navigate to headers.
-
-        When a user selects a TOC entry, this method scrolls the markdown
-        view to the corresponding header.
-
-        Args:
-            event: The tree node selection event containing the selected node
-        """
-        if event.node.data is None:
-            return
-
-        # Get the header node from our mapping
-        node_key = event.node.data
-        if node_key not in self.toc_nodes:
-            return
-
-        header_node = self.toc_nodes[node_key]
-        self._scroll_to_line(header_node.line_number)
-
-    async def on_key(self, event: events.Key) -> None:
-        """Handle key events for enhanced tree navigation.
-
-        Args:
-            event: The key event
-        """
-        # Check if the tree is focused
-        tree = self.query_one("#toc-tree", Tree)
-        if not tree.has_focus:
-            return
-
-        # Handle Enter key - toggle expansion
-        if event.key == "enter":
-            if tree.cursor_node is not None:
-                # Toggle expansion if the node has children
-                if tree.cursor_node.allow_expand:
-                    tree.cursor_node.toggle()
-                    event.prevent_default()
-                    event.stop()
-
-    def _scroll_to_line(
-        self, line_number: int, position_at_top: bool = False
-    ) -> None:
-        """Scroll the markdown view to a specific line number.
-
-        Args:
-            line_number: The line number to scroll to (1-indexed)
-            position_at_top: If True, position the line near the top of the
-                viewport (2 rows down). If False, use proportional scrolling.
-        """
-        lines = self.content.split("\n")
-        total_lines = len(lines)
-
-        if total_lines == 0 or line_number < 1:
-            return
-
-        # Get the scrollable container and markdown widget
-        container = self.query_one(ScrollableContainer)
-        markdown_widget = self.query_one(Markdown)
-
-        # Get the virtual (rendered) size of the markdown widget
-        virtual_size = markdown_widget.virtual_size
-
-        if virtual_size.height == 0:
-            return
-
-        # Calculate scroll position based on line proportion
-        # This is an approximation since markdown lines don't map 1:1
-        scroll_proportion = (line_number - 1) / max(total_lines - 1, 1)
-
-        # Calculate target Y position in the virtual space
-        target_y = int(virtual_size.height * scroll_proportion)
-
-        if position_at_top:
-            # Position ~2 rows below the top for visibility
-            # Subtract a small offset so the header is visible below top edge
-            target_y = max(0, target_y - 2)
-
-        # Scroll to the calculated position with faster animation
-        container.scroll_to(y=target_y, animate=True, speed=100)
-
-    async def on_mount(self) -> None:
-        """Handle app mount event.
-
-        This lifecycle method is called when the app is first mounted.
-        It sets the application title, populates the TOC, and sets
-        initial focus.
-        """
-        self.title = "Markdown Viewer"
-        self._populate_toc()
-        # Ensure content container has focus for scrolling
-        self.query_one("#content", ScrollableContainer).focus()
-
-    def _populate_toc(self) -> None:
-        """Parse markdown headers and populate the TOC tree widget."""
-        # Parse headers from content
-        headers = parse_markdown_headers(self.content)
-
-        if not headers:
-            # No headers found, nothing to populate
-            return
-
-        # Build hierarchical tree structure
-        root_nodes = build_toc_tree(headers)
-
-        # Get the tree widget
-        tree = self.query_one("#toc-tree", Tree)
-        tree.clear()
-
-        # Populate the tree widget
-        def add_nodes_to_tree(
-            parent: TreeNode,
-            nodes: list[HeaderNode],
-            node_map: Dict[str, HeaderNode],
-        ) -> None:
-            """Recursively add nodes to the tree widget."""
-            for node in nodes:
-                # Create a unique key for this node
-                node_key = f"{node.text}:{node.line_number}"
-                node_map[node_key] = node
-
-                # Add to tree
-                tree_node = parent.add(node.text, data=node_key)
-
-                # Add children recursively
-                if node.children:
-                    add_nodes_to_tree(tree_node, node.children, node_map)
-                else:
-                    # Leaf nodes should not show expand/collapse controls
-                    tree_node.allow_expand = False
-
-        # Add all root nodes
-        add_nodes_to_tree(tree.root, root_nodes, self.toc_nodes)
-
-
 def read_stdin() -> str:
     """Read content from stdin if available.
 
@@ -378,6 +56,88 @@ def read_stdin() -> str:
     return ""
 
 
+def open_stdin_stream() -> Optional[BinaryIO]:
+    """Detach piped stdin so it can be read while the TUI is running.
+
+    Unlike ``read_stdin()``, this does not wait for the producer to finish.
+    The pipe is duplicated onto a new file descriptor and returned as an
+    unbuffered binary stream, then stdin is reopened on /dev/tty so the
+    Textual TUI can receive keyboard input.
+
+    Returns:
+        Optional[BinaryIO]: The piped input stream, or None if stdin is a
+            TTY.
+    """
+    if sys.stdin.isatty():
+        return None
+
+    stream = os.fdopen(os.dup(sys.stdin.fileno()), "rb", buffering=0)
+    # Reopen stdin as terminal
+    try:
+        sys.stdin.close()
+        sys.__stdin__ = sys.stdin = open("/dev/tty")
+    except Exception:
+        # If we can't reopen the terminal, continue anyway
+        pass
+    return stream
+
+
+def _phase(profiler: Any, name: str) -> ContextManager[None]:
+    """Time a phase of the run with --profile, or do nothing without.
+
+    Args:
+        profiler (Optional[Profiler]): The profiler of the run, if any.
+        name (str): The name of the phase.
+    """
+    return nullcontext() if profiler is None else profiler.span(name)
+
+
+def _app_class(
+    app_class: type,
+    profiler: Any,
+    recorder: Any = None,
+    keys: Optional[List[str]] = None,
+    diagnostics: Any = None,
+) -> type:
+    """Return the app class, with the instrumentation asked for.
+
+    Args:
+        app_class (type): The viewer app class.
+        profiler (Optional[Profiler]): The profiler of the run, if any.
+        recorder (Optional[LatencyRecorder]): Where to record the latency
+            of keys, if anywhere.
+        keys (Optional[List[str]]): Where to record the keys pressed, for
+            --record-keys.
+        diagnostics (Optional[MemoryDiagnostics]): Where to record the
+            memory snapshots, if anywhere.
+    """
+    if profiler is not None:
+        from txmd.profile import profiled_app
+
+        app_class = profiled_app(app_class, profiler)
+    if diagnostics is not None:
+        from txmd.memory import diagnosed_app
+
+        app_class = diagnosed_app(app_class, diagnostics)
+    if recorder is not None or keys is not None:
+        from txmd.latency import instrumented_app
+
+        app_class = instrumented_app(app_class, recorder, keys)
+    return app_class
+
+
+def _run(app: Any, keys: Optional[List[str]]) -> None:
+    """Run the viewer, or press the keys of --replay in it headless."""
+    if keys is None:
+        app.run()
+        return
+    import asyncio
+
+    from txmd.latency import replay
+
+    asyncio.run(replay(app, keys))
+
+
 def version_callback(value: bool) -> None:
     """Display version information and exit.
 
@@ -388,27 +148,199 @@ def version_callback(value: bool) -> None:
         typer.Exit: Always exits after displaying version.
     """
     if value:
+        from txmd import __version__
+
         typer.echo(f"txmd version {__version__}")
         raise typer.Exit()
 
 
 @app.command()
 def main(
-    file: Optional[Path] = typer.Argument(
-        None,
-        help="Markdown file to display. If not provided, reads from stdin.",
-        exists=True,
-        dir_okay=False,
-        readable=True,
-    ),
-    version: Optional[bool] = typer.Option(
-        None,
-        "--version",
-        "-v",
-        help="Show version and exit.",
-        callback=version_callback,
-        is_eager=True,
-    ),
+    file: Annotated[
+        Optional[Path],
+        typer.Argument(
+            help="Markdown file to display. "
+            "If not provided, reads from stdin.",
+            exists=True,
+            dir_okay=False,
+            readable=True,
+        ),
+    ] = None,
+    version: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--version",
+            "-v",
+            help="Show version and exit.",
+            callback=version_callback,
+            is_eager=True,
+        ),
+    ] = None,
+    stream: Annotated[
+        bool,
+        typer.Option(
+            "--stream",
+            "-s",
+            help="Show piped input progressively as it arrives "
+            "instead of waiting for the end of the stream.",
+        ),
+    ] = False,
+    cache: Annotated[
+        bool,
+        typer.Option(
+            "--cache",
+            help="Keep the parsed document in $XDG_CACHE_HOME/txmd so "
+            "reopening the same content skips parsing.",
+        ),
+    ] = False,
+    follow: Annotated[
+        bool,
+        typer.Option(
+            "--follow",
+            "-f",
+            help="Keep watching the file and show content appended to it, "
+            "like tail -f.",
+        ),
+    ] = False,
+    watch: Annotated[
+        bool,
+        typer.Option(
+            "--watch",
+            "-w",
+            help="Reload the file whenever it is saved, keeping the scroll "
+            "position and the TOC state.",
+        ),
+    ] = False,
+    render: Annotated[
+        bool,
+        typer.Option(
+            "--render",
+            "-r",
+            help="Print the rendered document instead of opening the "
+            "viewer. This is the default when stdout is not a terminal.",
+        ),
+    ] = False,
+    width: Annotated[
+        Optional[int],
+        typer.Option(
+            "--width",
+            min=1,
+            help="Width of the rendered output in columns. Defaults to the "
+            "terminal width, or 80.",
+        ),
+    ] = None,
+    fast_size: Annotated[
+        Optional[int],
+        typer.Option(
+            "--fast-size",
+            min=0,
+            help="Show inputs larger than this many bytes in fast mode, as "
+            "lightly styled source lines, instead of rendering the "
+            "Markdown. Defaults to 64 MiB.",
+        ),
+    ] = None,
+    fast_lines: Annotated[
+        Optional[int],
+        typer.Option(
+            "--fast-lines",
+            min=0,
+            help="Also use fast mode for inputs with more than this many "
+            "lines.",
+        ),
+    ] = None,
+    server: Annotated[
+        bool,
+        typer.Option(
+            "--server",
+            help="Start a warm txmd in the background. Later txmd "
+            "commands hand their terminal over to it and start instantly.",
+        ),
+    ] = False,
+    idle_timeout: Annotated[
+        Optional[int],
+        typer.Option(
+            "--idle-timeout",
+            min=1,
+            help="Seconds without any command after which the server "
+            "exits. Defaults to 600.",
+        ),
+    ] = None,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            "--profile",
+            help="On exit, print the wall time, CPU time and peak memory "
+            "of every phase of the run (reading, parsing, mounting, first "
+            "paint, TOC) to stderr.",
+        ),
+    ] = False,
+    profile_dump: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--profile-dump",
+            dir_okay=False,
+            help="Also profile the run with cProfile and save the "
+            "statistics to this file, for pstats or snakeviz. Implies "
+            "--profile.",
+        ),
+    ] = None,
+    latency: Annotated[
+        bool,
+        typer.Option(
+            "--latency",
+            help="On exit, print the time from every keypress to the next "
+            "frame, as percentiles and a histogram per action, to stderr.",
+        ),
+    ] = False,
+    latency_report: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--latency-report",
+            dir_okay=False,
+            help="Also save the latency percentiles and histograms to "
+            "this file, as JSON. Implies --latency.",
+        ),
+    ] = None,
+    record_keys: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--record-keys",
+            dir_okay=False,
+            help="Save the keys pressed in the viewer to this file, as a "
+            "key script for --replay.",
+        ),
+    ] = None,
+    replay: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--replay",
+            exists=True,
+            dir_okay=False,
+            readable=True,
+            help="Press the keys of this key script in a headless viewer, "
+            "instead of starting it in the terminal, and print their "
+            "latency. Implies --latency.",
+        ),
+    ] = None,
+    memory: Annotated[
+        bool,
+        typer.Option(
+            "--memory",
+            help="Trace memory allocations, and on exit print the memory "
+            "used after loading, building the TOC and the first frame, per "
+            "byte of input, with the top allocation sites, to stderr. Slow.",
+        ),
+    ] = False,
+    max_memory: Annotated[
+        Optional[str],
+        typer.Option(
+            "--max-memory",
+            metavar="SIZE",
+            help="Memory budget, e.g. 512M or 2G. The viewer shows the "
+            "source of documents too large to lay out within it, and keeps "
+            "fewer rendered blocks when nearing it.",
+        ),
+    ] = None,
 ) -> None:
     """Display markdown content in the terminal.
 
@@ -419,6 +351,43 @@ def main(
     Args:
         file (Optional[Path]): Path to a markdown file to display.
             If None, the application will attempt to read from stdin.
+        stream (bool): Start the viewer immediately and append piped
+            content block by block as it arrives. Not allowed with a file.
+        cache (bool): Load the parsed document from the on-disk cache,
+            and store it there after parsing on a miss.
+        follow (bool): Watch the file and add appended content to the
+            viewer and the TOC as it is written.
+        watch (bool): Reload the file when it is edited, re-rendering only
+            the blocks that changed.
+        render (bool): Print the rendered document to stdout block by
+            block as it is read, instead of starting the viewer. Implied
+            when stdout is not a terminal.
+        width (Optional[int]): Width of the rendered output.
+        fast_size (Optional[int]): Size in bytes above which the viewer
+            shows the source lines instead of laying out the Markdown.
+            Defaults to ``FAST_MODE_SIZE``.
+        fast_lines (Optional[int]): Number of lines above which the viewer
+            does the same.
+        server (bool): Start a server that keeps txmd loaded, and return
+            once it accepts commands. See ``txmd.server``.
+        idle_timeout (Optional[int]): Seconds after the last command at
+            which the server exits. Defaults to ``SERVER_IDLE_TIMEOUT``.
+        profile (bool): Time the phases of the run and print them on exit.
+        profile_dump (Optional[Path]): Where to save the cProfile
+            statistics of the run, if anywhere.
+        latency (bool): Measure the time from every keypress to the next
+            frame, and print it by action on exit.
+        latency_report (Optional[Path]): Where to save the latency
+            summary as JSON, if anywhere.
+        record_keys (Optional[Path]): Where to save the keys pressed, as
+            a key script, if anywhere.
+        replay (Optional[Path]): A key script to press in a headless
+            viewer instead of running it in the terminal. See
+            ``txmd.latency``.
+        memory (bool): Snapshot the memory of the viewer with tracemalloc
+            and print the snapshots on exit.
+        max_memory (Optional[str]): The memory budget of the viewer, in
+            bytes, with an optional K, M or G suffix.
 
     Raises:
         SystemExit: Exits with code 1 if no input is provided or if
@@ -432,16 +401,156 @@ def main(
             $ echo "# Hello World" | txmd
             $ cat document.md | txmd
             $ curl https://example.com/doc.md | txmd
+
+        Follow a slow producer as it writes:
+            $ make report | txmd --stream
+
+        Reopen a large file without parsing it again:
+            $ txmd --cache runbook.md
+
+        Watch a log or report that is still being written:
+            $ txmd --follow build-notes.md
+
+        Preview a document while editing it in another pane:
+            $ txmd --watch README.md
+
+        Page through a huge generated document:
+            $ txmd --fast-lines 100000 dump.md
+
+        Find out why a document is slow to open:
+            $ txmd --profile --profile-dump txmd.prof big.md
+
+        Record a session, then measure how fast it replays:
+            $ txmd --record-keys session.keys big.md
+            $ txmd --replay session.keys --latency-report keys.json big.md
+
+        Keep a large document within 512 MiB on a shared host:
+            $ txmd --max-memory 512M big.md
+
+        Keep txmd warm for editor and shell hooks:
+            $ txmd --server --idle-timeout 3600
+
+        Render a document for a script or a file:
+            $ txmd --render --width 100 CHANGELOG.md > changelog.txt
+            $ make report | txmd | mail -s "Report" team@example.com
     """
+    profiler = None
+    if profile or profile_dump:
+        from txmd.profile import Profiler
+
+        profiler = Profiler(dump=profile_dump)
+    recorder = None
+    if latency or latency_report or replay:
+        from txmd.latency import LatencyRecorder
+
+        recorder = LatencyRecorder(dump=latency_report)
+    recorded: Optional[List[str]] = [] if record_keys else None
+    diagnostics = None
+    if memory:
+        from txmd.memory import MemoryDiagnostics
+
+        diagnostics = MemoryDiagnostics()
+
+    # Imported here rather than with the module: Typer already loaded Rich,
+    # and the viewer (Textual) is only imported once there is input for it
+    from rich.console import Console
+
     console = Console()
 
     try:
-        if file:
-            with open(file, "r", encoding="utf-8") as f:
-                content = f.read()
+        if server:
+            from txmd.server import SERVER_IDLE_TIMEOUT, serve
+
+            serve(
+                SERVER_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+            )
+            return
+        if follow and not file:
+            console.print("[red]Error:[/] --follow requires a file.")
+            sys.exit(1)
+        if watch and not file:
+            console.print("[red]Error:[/] --watch requires a file.")
+            sys.exit(1)
+        if follow and watch:
+            console.print(
+                "[red]Error:[/] --follow and --watch cannot be combined."
+            )
+            sys.exit(1)
+        if stream and file:
+            console.print(
+                "[red]Error:[/] --stream reads piped input and cannot be "
+                "combined with a file."
+            )
+            sys.exit(1)
+        budget = None
+        if max_memory is not None:
+            from txmd.budget import parse_size
+
+            budget = parse_size(max_memory)
+        replay_keys = None
+        if replay:
+            from txmd.latency import parse_key_script
+
+            replay_keys = parse_key_script(replay.read_text())
+
+        # A replay runs headless, so it needs no terminal
+        if render or (not sys.stdout.isatty() and replay_keys is None):
+            if follow or watch:
+                console.print(
+                    "[red]Error:[/] --follow and --watch need the viewer, "
+                    "which needs a terminal."
+                )
+                sys.exit(1)
+            from txmd.render import render_stream
+
+            output = Console(width=width)
+            if file:
+                with _phase(profiler, "render"), open(file, "rb") as source:
+                    render_stream(source, output)
+            elif sys.stdin.isatty():
+                console.print(
+                    "[red]Error:[/] No input provided. "
+                    "Please provide a file or pipe content to txmd."
+                )
+                sys.exit(1)
+            else:
+                with _phase(profiler, "render"):
+                    render_stream(sys.stdin.buffer, output)
+            return
+
+        from txmd.document import map_file
+
+        if file and watch:
+            # Editors may rewrite the file in place, which would change a
+            # mapping under the displayed document: read a private copy
+            with _phase(profiler, "read"):
+                content = file.read_bytes()
             filename = file.name
+        elif file:
+            # Mapped rather than read: only the parts that are drawn are
+            # ever decoded, so large files do not need proportional RAM
+            with _phase(profiler, "read"):
+                content = map_file(file)
+            filename = file.name
+        elif stream:
+            source = open_stdin_stream()
+            if source is None:
+                console.print(
+                    "[red]Error:[/] No input provided. "
+                    "Please provide a file or pipe content to txmd."
+                )
+                sys.exit(1)
+            with _phase(profiler, "import"):
+                from txmd.app import MarkdownViewerApp
+
+            app = _app_class(
+                MarkdownViewerApp, profiler, recorder, recorded, diagnostics
+            )("", None, stream=source, max_memory=budget)
+            _run(app, replay_keys)
+            return
         else:
-            stdin_content = read_stdin()
+            with _phase(profiler, "read"):
+                stdin_content = read_stdin()
             if not stdin_content:
                 console.print(
                     "[red]Error:[/] No input provided. "
@@ -451,12 +560,58 @@ def main(
             content = stdin_content
             filename = None
 
-        app = MarkdownViewerApp(content, filename)
-        app.run()
-
+        with _phase(profiler, "import"):
+            from txmd.app import FAST_MODE_SIZE, MarkdownViewerApp
+            from txmd.cache import DocumentCache
+
+        # Small documents are parsed when the app is created
+        with _phase(profiler, "init"):
+            app = _app_class(
+                MarkdownViewerApp, profiler, recorder, recorded, diagnostics
+            )(
+                content,
+                filename,
+                follow=file if follow else None,
+                watch=file if watch else None,
+                cache=DocumentCache() if cache else None,
+                fast_size=FAST_MODE_SIZE if fast_size is None else fast_size,
+                fast_lines=fast_lines,
+                max_memory=budget,
+            )
+        _run(app, replay_keys)
+
+    except BrokenPipeError:
+        # The reader of the rendered output went away (e.g. `| head`):
+        # point stdout at /dev/null so flushing it at exit does not fail
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
     except Exception as e:
         console.print(f"[red]Error:[/] {str(e)}")
         sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.finish()
+        if recorder is not None:
+            recorder.finish()
+        if diagnostics is not None:
+            diagnostics.finish()
+        if record_keys and recorded:
+            from txmd.latency import format_key_script
+
+            record_keys.write_text(format_key_script(recorded))
+
+
+def __getattr__(name: str) -> Any:
+    """Import the viewer on first use, for ``from txmd.cli import ...``.
+
+    The app used to be defined in this module; it now lives in
+    ``txmd.app`` so that importing the CLI does not load Textual.
+    """
+    if name == "MarkdownViewerApp":
+        from txmd.app import MarkdownViewerApp
+
+        return MarkdownViewerApp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,479 @@
+"""Parsed Markdown document model shared by the viewer and the TOC."""
+
+import codecs
+import mmap
+from array import array
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from txmd.blocks import Block, BlockSplitter, split_blocks
+from txmd.toc import HeaderIndex
+
+# Anything exposing the buffer protocol over UTF-8 encoded markdown
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+# Number of bytes decoded at a time when scanning a buffer
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+
+class DocumentIndex(NamedTuple):
+    """Everything a Document knows about its buffer, besides the buffer.
+
+    Attributes:
+        ends (array): Byte offset of the end of every block.
+        lines (array): Line number of the first non-blank line of every
+            block (1-indexed).
+        spans (array): Number of source lines of every block, not counting
+            trailing blank lines.
+        headings (List[Tuple[int, int, str]]): ``(block index, level,
+            text)`` of every heading block.
+        line_count (int): Number of newlines in the document.
+    """
+
+    ends: "array[int]"
+    lines: "array[int]"
+    spans: "array[int]"
+    headings: List[Tuple[int, int, str]]
+    line_count: int
+
+
+def match_blocks(
+    old: Sequence[int], new: Sequence[int]
+) -> List[Tuple[int, int, int]]:
+    """Find the blocks two versions of a document have in common.
+
+    An edit usually touches a few blocks in the middle of a document, so
+    the common prefix and suffix are skipped before the remaining blocks
+    are compared with ``difflib.SequenceMatcher``.
+
+    Args:
+        old (Sequence[int]): The block hashes of the old version, from
+            ``Document.block_hashes()``.
+        new (Sequence[int]): The block hashes of the new version.
+
+    Returns:
+        List[Tuple[int, int, int]]: ``(old index, new index, count)`` runs
+            of identical blocks, in increasing order.
+    """
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    old_end = len(old) - suffix
+    new_end = len(new) - suffix
+
+    runs = [(0, 0, prefix)] if prefix else []
+    # Without autojunk, frequent blocks (blank lines, rules) still match
+    matcher = SequenceMatcher(
+        None, old[prefix:old_end], new[prefix:new_end], autojunk=False
+    )
+    for old_index, new_index, count in matcher.get_matching_blocks():
+        if count:
+            runs.append((prefix + old_index, prefix + new_index, count))
+    if suffix:
+        runs.append((old_end, new_end, suffix))
+    return runs
+
+
+def map_file(path: Union[str, Path]) -> Buffer:
+    """Map a file into memory read-only.
+
+    Pages are only read from disk when they are accessed, and can be
+    dropped again by the operating system under memory pressure, so large
+    files do not need a proportional amount of RAM.
+
+    Args:
+        path (Union[str, Path]): The file to map.
+
+    Returns:
+        Buffer: The mapped file, or empty bytes for an empty file (which
+            cannot be mapped).
+    """
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return b""
+        # The mapping stays valid after the file object is closed
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Document:
+    """A Markdown document parsed once into top-level blocks.
+
+    The blocks are produced by a single pass of ``BlockSplitter``, which
+    also recognises headings. The same blocks are rendered by
+    ``DocumentView`` and provide the headers of the table of contents, so
+    every TOC entry points at the first line of a block that is drawn as a
+    heading.
+
+    The document keeps its source as UTF-8 encoded bytes, which can be a
+    memory-mapped file, plus compact arrays of offsets per block. The text
+    of a block is only decoded when it is requested, e.g. to render it.
+
+    Attributes:
+        headers (HeaderIndex): The headings, which index as
+            ``(level, text, line_number)`` tuples in the format returned
+            by ``parse_markdown_headers()``.
+        line_count (int): Number of newlines in the document.
+
+    Example:
+        >>> document = Document("# Title\\n\\nText\\n")
+        >>> list(document.headers)
+        [(1, 'Title', 1)]
+        >>> document[1].text
+        'Text\\n'
+    """
+
+    def __init__(self, content: Union[str, Buffer] = "", scan: bool = True):
+        """Initialize the Document.
+
+        Args:
+            content (Union[str, Buffer]): The markdown content to parse,
+                as text or as a buffer of UTF-8 encoded bytes (e.g. from
+                ``map_file()``), which is used without being copied.
+            scan (bool): Split the content into blocks right away. If
+                False, the document starts without blocks, and the blocks
+                from ``scan_buffer(document.data)`` must be added with
+                ``add_scanned_blocks()``, e.g. by a background worker.
+        """
+        self.headers = HeaderIndex()
+        self.line_count = 0
+        self._data: Buffer = bytearray()
+        self._ends = array("q")
+        self._lines = array("q")
+        self._spans = array("l")
+        # Index of the block of every entry of self.headers
+        self._header_blocks = array("q")
+
+        if isinstance(content, str) and scan:
+            self.append(content)
+        elif isinstance(content, str):
+            self._data = content.encode("utf-8", "surrogateescape")
+        elif len(content):
+            self._data = content
+            if scan:
+                self._scan(content)
+
+    @classmethod
+    def from_index(cls, data: Buffer, index: DocumentIndex) -> "Document":
+        """Rebuild a document from its buffer and index without parsing.
+
+        Args:
+            data (Buffer): The UTF-8 encoded markdown content.
+            index (DocumentIndex): The index returned by ``get_index()``
+                for the same content.
+
+        Returns:
+            Document: The document.
+        """
+        document = cls()
+        document._data = data
+        document._ends = index.ends
+        document._lines = index.lines
+        document._spans = index.spans
+        document.line_count = index.line_count
+        for block, level, title in index.headings:
+            document._header_blocks.append(block)
+            document.headers.append(level, title, index.lines[block])
+        return document
+
+    def get_index(self) -> DocumentIndex:
+        """Return the block index of the document.
+
+        Returns:
+            DocumentIndex: The offsets, line numbers and headings of the
+                blocks.
+        """
+        headings = [
+            (block, level, title)
+            for block, (level, title, _) in zip(
+                self._header_blocks, self.headers
+            )
+        ]
+        return DocumentIndex(
+            self._ends, self._lines, self._spans, headings, self.line_count
+        )
+
+    def __len__(self) -> int:
+        """Return the number of blocks in the document."""
+        return len(self._ends)
+
+    def __getitem__(self, index: int) -> Block:
+        """Return a block of the document, decoding its text.
+
+        Args:
+            index (int): The index of the block.
+
+        Returns:
+            Block: The block.
+        """
+        level, title, _ = self._heading(index) or (0, "", 0)
+        return Block(self.block_text(index), self._lines[index], level, title)
+
+    @property
+    def data(self) -> Buffer:
+        """Buffer: The UTF-8 encoded markdown source."""
+        return self._data
+
+    @property
+    def content(self) -> str:
+        """str: The markdown source of the whole document."""
+        return str(self._data, "utf-8", "replace")
+
+    def block_text(self, index: int) -> str:
+        """Decode the markdown source of a block.
+
+        Args:
+            index (int): The index of the block.
+
+        Returns:
+            str: The source text of the block.
+        """
+        start = self._ends[index - 1] if index else 0
+        end = self._ends[index]
+        return str(self._data[start:end], "utf-8", "replace")
+
+    def block_line(self, index: int) -> int:
+        """Return the line number of a block's first non-blank line.
+
+        Args:
+            index (int): The index of the block.
+
+        Returns:
+            int: The line number (1-indexed).
+        """
+        return self._lines[index]
+
+    def block_span(self, index: int) -> int:
+        """Return the number of source lines of a block.
+
+        Args:
+            index (int): The index of the block.
+
+        Returns:
+            int: The number of lines, not counting trailing blank lines.
+        """
+        return self._spans[index]
+
+    def block_level(self, index: int) -> int:
+        """Return the heading level of a block.
+
+        Args:
+            index (int): The index of the block.
+
+        Returns:
+            int: The level (1-6), or 0 if the block is not a heading.
+        """
+        heading = self._heading(index)
+        return heading[0] if heading else 0
+
+    def block_hashes(self) -> List[int]:
+        """Hash the source of every block.
+
+        Blocks with the same hash render identically, so comparing the
+        hashes of two versions of a document (see ``match_blocks()``)
+        tells which rendered blocks can be reused.
+
+        Returns:
+            List[int]: One hash per block, valid within this process.
+        """
+        hashes = []
+        start = 0
+        with memoryview(self._data) as view:
+            for end in self._ends:
+                hashes.append(hash(bytes(view[start:end])))
+                start = end
+        return hashes
+
+    def append(self, text: str) -> List[Block]:
+        """Parse markdown text and add it to the end of the document.
+
+        Args:
+            text (str): Markdown source made of complete blocks.
+
+        Returns:
+            List[Block]: The blocks that were added.
+        """
+        if not text:
+            return []
+        blocks = split_blocks(text, self.line_count + 1)
+        self.extend(blocks)
+        return blocks
+
+    def extend(self, blocks: Iterable[Block]) -> None:
+        """Add already parsed blocks to the end of the document.
+
+        Args:
+            blocks (Iterable[Block]): Blocks whose line numbers continue
+                the document, e.g. from a ``BlockSplitter`` fed with the
+                text following the current content.
+        """
+        blocks = list(blocks)
+        if not blocks:
+            return
+        if not isinstance(self._data, bytearray):
+            # Read-only buffers (e.g. a mapped file) are copied on append
+            self._data = bytearray(self._data)
+        self._data += "".join(block.text for block in blocks).encode(
+            "utf-8", "surrogateescape"
+        )
+        self._add_blocks(blocks)
+
+    def add_scanned_blocks(self, blocks: List[Block]) -> None:
+        """Add blocks scanned from the document's own buffer.
+
+        Args:
+            blocks (List[Block]): The next blocks yielded by
+                ``scan_buffer()`` for ``data``, for a document created with
+                ``scan=False``.
+        """
+        self._add_blocks(blocks)
+
+    def block_for_line(self, line_number: int) -> int:
+        """Find the block containing a source line.
+
+        Args:
+            line_number (int): Line number in the markdown source
+                (1-indexed).
+
+        Returns:
+            int: The index of the block the line belongs to.
+        """
+        index = bisect_right(self._lines, line_number) - 1
+        return max(0, min(index, len(self._ends) - 1))
+
+    def scan_tail(self, data: Buffer) -> Tuple[int, List[Block]]:
+        """Parse the end of a buffer that grew after the document's one.
+
+        The last block of the document may have been cut short (e.g. a
+        paragraph or a code fence still being written), so parsing resumes
+        at its start; everything before it is not read again. This does not
+        modify the document, so it can run in a background thread.
+
+        Args:
+            data (Buffer): The new buffer, starting with the document's
+                content up to its last block.
+
+        Returns:
+            Tuple[int, List[Block]]: The index of the first block to
+                replace and the blocks replacing it, to be passed to
+                ``replace_tail()``.
+        """
+        first = max(0, len(self._ends) - 1)
+        start = self._ends[first - 1] if first else 0
+        line_number = self._lines[first] if first else 1
+        blocks: List[Block] = []
+        with memoryview(data) as view:
+            for chunk in scan_buffer(view[start:], line_number):
+                blocks.extend(chunk)
+        return first, blocks
+
+    def replace_tail(
+        self, data: Buffer, first: int, blocks: List[Block]
+    ) -> List[Tuple[int, str, int]]:
+        """Replace the blocks from ``first`` on with newly parsed blocks.
+
+        Args:
+            data (Buffer): The new buffer holding all of the content.
+            first (int): The index of the first block to replace, as
+                returned by ``scan_tail()``.
+            blocks (List[Block]): The blocks replacing the old ones.
+
+        Returns:
+            List[Tuple[int, str, int]]: The headers of the removed blocks.
+        """
+        position = bisect_left(self._header_blocks, first)
+        removed = self.headers[position:]
+        self.headers.truncate(position)
+        del self._header_blocks[position:]
+        # Blocks after the first one never start with blank lines, so
+        # their first line is where they start
+        self.line_count = self._lines[first] - 1 if first else 0
+        del self._ends[first:]
+        del self._lines[first:]
+        del self._spans[first:]
+        self._data = data
+        self._add_blocks(blocks)
+        return removed
+
+    def _scan(self, data: Buffer) -> None:
+        """Split a buffer into blocks, decoding one chunk at a time."""
+        for blocks in scan_buffer(data, self.line_count + 1):
+            self._add_blocks(blocks)
+
+    def _add_blocks(self, blocks: List[Block]) -> None:
+        """Record the offsets, lines and headings of blocks in the buffer."""
+        end = self._ends[-1] if self._ends else 0
+        for block in blocks:
+            text = block.text
+            if text.isascii():
+                end += len(text)
+            else:
+                end += len(text.encode("utf-8", "surrogateescape"))
+            self._ends.append(end)
+            self._lines.append(block.line_number)
+            self.line_count += text.count("\n")
+            source = text.rstrip()
+            self._spans.append(source.count("\n") + 1 if source else 0)
+            if block.level:
+                self._header_blocks.append(len(self._ends) - 1)
+                self.headers.append(
+                    block.level, block.title, block.line_number
+                )
+
+    def _heading(self, index: int) -> Optional[Tuple[int, str, int]]:
+        """Return the header of a block, or None if it is no heading."""
+        position = bisect_left(self._header_blocks, index)
+        if (
+            position < len(self._header_blocks)
+            and self._header_blocks[position] == index
+        ):
+            return self.headers[position]
+        return None
+
+
+def scan_buffer(
+    data: Buffer,
+    line_number: int = 1,
+    first_chunk_size: Optional[int] = None,
+) -> Iterator[List[Block]]:
+    """Split UTF-8 encoded markdown into blocks, one chunk at a time.
+
+    Args:
+        data (Buffer): The encoded markdown.
+        line_number (int): Line number of the first line of ``data``.
+        first_chunk_size (Optional[int]): Size of the first chunk, doubled
+            for every following chunk up to ``SCAN_CHUNK_SIZE``. A small
+            first chunk gets the first blocks out quickly. Defaults to
+            ``SCAN_CHUNK_SIZE``.
+
+    Yields:
+        List[Block]: The blocks completed by each chunk, in order.
+    """
+    splitter = BlockSplitter(line_number)
+    # Invalid bytes are kept as surrogates, so re-encoding a block gives
+    # back its exact size in the buffer
+    decoder = codecs.getincrementaldecoder("utf-8")("surrogateescape")
+    chunk_size = first_chunk_size or SCAN_CHUNK_SIZE
+    with memoryview(data) as view:
+        start = 0
+        while start < len(view):
+            end = start + chunk_size
+            yield splitter.feed(decoder.decode(view[start:end]))
+            start = end
+            chunk_size = min(chunk_size * 2, SCAN_CHUNK_SIZE)
+    blocks = splitter.feed(decoder.decode(b"", final=True))
+    yield blocks + splitter.close()
@@ -0,0 +1,323 @@
+"""Keypress-to-frame latency of the viewer, and headless key replays.
+
+``instrumented_app()`` derives a subclass of the app that timestamps
+every key event and the first frame drawn after it, and files the
+latency under the action the key ran (``scroll_down``, ``page_down``,
+``toc_jump``...). Like ``txmd.profile``, nothing here is imported or run
+unless ``--latency``, ``--record-keys`` or ``--replay`` is given.
+
+Key scripts are plain text: Textual key names separated by blanks, with
+``key*N`` for N presses and ``#`` starting a comment line::
+
+    # read the first pages, then jump through the TOC
+    j*40 space*10 b*3
+    t down*4 space
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+# Seconds after its action ran within which a key must produce a frame;
+# keys that change nothing on screen (``k`` at the top) are counted as
+# having no frame rather than waiting for an unrelated one
+FRAME_TIMEOUT = 0.5
+
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKETS = (8, 16, 33, 50, 100, 200, 500)
+
+# Size of the headless screen used to replay key scripts
+REPLAY_SIZE = (100, 40)
+
+# The clock Textual stamps events with (see textual._time)
+_clock = time.perf_counter if sys.platform == "win32" else time.monotonic
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """Return a percentile of sorted values, by the nearest rank."""
+    rank = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class LatencyRecorder:
+    """Latency samples of the keys pressed, by action.
+
+    Attributes:
+        samples (Dict[str, List[float]]): Seconds from a key event to the
+            first frame drawn after it, by action.
+        missed (Dict[str, int]): The number of keys that drew no frame,
+            by action.
+        dump (Optional[Path]): Where to save the summary as JSON on
+            exit, if anywhere.
+    """
+
+    def __init__(self, dump: Optional[Path] = None) -> None:
+        self.samples: Dict[str, List[float]] = {}
+        self.missed: Dict[str, int] = {}
+        self.dump = dump
+
+    def record(self, action: str, seconds: float) -> None:
+        """Add the latency of a key that ran action."""
+        self.samples.setdefault(action, []).append(seconds)
+
+    def miss(self, action: str) -> None:
+        """Count a key that ran action without drawing a frame."""
+        self.missed[action] = self.missed.get(action, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Summarize the latency of every action, in milliseconds.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: For every action, the number of
+                samples and of keys without a frame, the median, 95th and
+                99th percentiles, the maximum, and the number of samples
+                in every bucket of ``BUCKETS`` (plus one above them).
+        """
+        summary = {}
+        for action in sorted(set(self.samples) | set(self.missed)):
+            ms = sorted(
+                sample * 1000 for sample in self.samples.get(action, [])
+            )
+            buckets = [0] * (len(BUCKETS) + 1)
+            for value in ms:
+                index = 0
+                while index < len(BUCKETS) and value >= BUCKETS[index]:
+                    index += 1
+                buckets[index] += 1
+            summary[action] = {
+                "count": len(ms),
+                "missed": self.missed.get(action, 0),
+                "p50": statistics.median(ms) if ms else None,
+                "p95": _percentile(ms, 0.95) if ms else None,
+                "p99": _percentile(ms, 0.99) if ms else None,
+                "max": ms[-1] if ms else None,
+                "buckets": buckets,
+            }
+        return summary
+
+    def report(self) -> str:
+        """Return the summary as a table, with a histogram per action."""
+        labels = [f"<{bound}" for bound in BUCKETS] + [f">={BUCKETS[-1]}"]
+        lines = [
+            f"{'action':<18} {'keys':>5} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'max ms':>8}  " + " ".join(
+                f"{label:>5}" for label in labels
+            )
+        ]
+        for action, stats in self.summary().items():
+            values = [
+                "-" if stats[key] is None else f"{stats[key]:.1f}"
+                for key in ("p50", "p95", "p99", "max")
+            ]
+            keys = str(stats["count"])
+            if stats["missed"]:
+                keys += f"+{stats['missed']}"
+            lines.append(
+                f"{action:<18} {keys:>5} "
+                + " ".join(f"{value:>8}" for value in values)
+                + "  "
+                + " ".join(f"{count:>5}" for count in stats["buckets"])
+            )
+        lines.append("keys: with a frame (+ without); buckets in ms")
+        return "\n".join(lines)
+
+    def finish(self, file: Optional[IO[str]] = None) -> None:
+        """Print the report, and save the summary if asked to.
+
+        Args:
+            file (Optional[IO[str]]): Where to print the report; stderr
+                by default.
+        """
+        file = file or sys.stderr
+        print("txmd latency, from keypress to frame:", file=file)
+        print(self.report(), file=file)
+        if self.dump is not None:
+            with open(self.dump, "w") as dump:
+                json.dump(self.summary(), dump, indent=2)
+                dump.write("\n")
+            print(f"Latency summary saved to {self.dump}", file=file)
+
+
+class _Pending:
+    """A key waiting for its frame, named after the action it ran."""
+
+    __slots__ = ("time", "action")
+
+    def __init__(self, time: float, action: str) -> None:
+        self.time = time
+        self.action = action
+
+
+def instrumented_app(
+    app_class: type,
+    recorder: Optional[LatencyRecorder] = None,
+    keys: Optional[List[str]] = None,
+) -> type:
+    """Derive a subclass of the viewer app that measures key latency.
+
+    Every key event is timestamped when Textual creates it, so time spent
+    queued behind earlier keys counts. The key is filed under the last
+    action it ran, or ``toc_jump`` if it made the viewer jump to a header
+    (as Space does in the TOC), or ``key:<name>`` if it ran none (e.g.
+    typing in the search bar). The latency ends at the first frame drawn
+    after the key was handled.
+
+    Args:
+        app_class (type): ``MarkdownViewerApp``, or a subclass.
+        recorder (Optional[LatencyRecorder]): Where to record latencies.
+        keys (Optional[List[str]]): A list to append the name of every
+            key pressed to, to save the session as a key script.
+
+    Returns:
+        type: The subclass, with the same name as app_class.
+    """
+    from textual import events
+
+    class InstrumentedApp(app_class):  # type: ignore[misc, valid-type]
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            self.latency_recorder = recorder
+            self._latency_pending: List[_Pending] = []
+
+        async def on_event(self, event: Any) -> None:
+            if isinstance(event, events.Key) and not event.is_forwarded:
+                if keys is not None:
+                    keys.append(event.key)
+                if recorder is not None:
+                    pending = _Pending(event.time, f"key:{event.key}")
+                    self._latency_pending.append(pending)
+                    self.set_timer(
+                        FRAME_TIMEOUT, lambda: self._latency_expire(pending)
+                    )
+            await super().on_event(event)
+
+        async def run_action(
+            self, action: Any, default_namespace: Any = None
+        ) -> bool:
+            handled = await super().run_action(action, default_namespace)
+            if handled and self._latency_pending:
+                pending = self._latency_pending[-1]
+                if pending.action.startswith("key:"):
+                    name = action if isinstance(action, str) else action[1]
+                    pending.action = name.split("(")[0].rsplit(".")[-1]
+                # Give the frame the full timeout from now on
+                self.set_timer(
+                    FRAME_TIMEOUT, lambda: self._latency_expire(pending)
+                )
+            return handled
+
+        def _jump_to_header(self, header_id: int) -> None:
+            if self._latency_pending:
+                self._latency_pending[-1].action = "toc_jump"
+            super()._jump_to_header(header_id)
+
+        def _display(self, screen: Any, renderable: Any) -> None:
+            super()._display(screen, renderable)
+            if renderable is None or not self._latency_pending:
+                return
+            now = _clock()
+            for pending in self._latency_pending:
+                recorder.record(pending.action, now - pending.time)
+            self._latency_pending.clear()
+
+        def _latency_expire(self, pending: _Pending) -> None:
+            # Only expire a key once, by its last timer
+            if pending not in self._latency_pending:
+                return
+            if _clock() - pending.time < FRAME_TIMEOUT:
+                return
+            self._latency_pending.remove(pending)
+            recorder.miss(pending.action)
+
+    InstrumentedApp.__name__ = InstrumentedApp.__qualname__ = (
+        app_class.__name__
+    )
+    return InstrumentedApp
+
+
+def parse_key_script(text: str) -> List[str]:
+    """Return the keys of a key script, in order.
+
+    Args:
+        text (str): The script.
+
+    Returns:
+        List[str]: The key names, with ``key*N`` expanded.
+
+    Raises:
+        ValueError: If a repeat count is not a positive integer.
+
+    Example:
+        >>> parse_key_script("# scroll\\nj*3 space")
+        ['j', 'j', 'j', 'space']
+    """
+    keys: List[str] = []
+    for line in text.splitlines():
+        if line.lstrip().startswith("#"):
+            continue
+        for token in line.split():
+            key, _, count = token.partition("*")
+            repeat = int(count) if count else 1
+            if not key or repeat < 1:
+                raise ValueError(f"invalid key in script: {token!r}")
+            keys.extend([key] * repeat)
+    return keys
+
+
+def format_key_script(keys: List[str], per_line: int = 8) -> str:
+    """Return a key script pressing keys, runs of a key as ``key*N``.
+
+    Args:
+        keys (List[str]): The key names, in order.
+        per_line (int): The number of tokens per line.
+
+    Returns:
+        str: The script, which ``parse_key_script()`` reads back.
+    """
+    tokens: List[str] = []
+    index = 0
+    while index < len(keys):
+        run = index
+        while run < len(keys) and keys[run] == keys[index]:
+            run += 1
+        count = run - index
+        key = keys[index]
+        tokens.append(key if count == 1 else f"{key}*{count}")
+        index = run
+    lines = [
+        " ".join(tokens[start : start + per_line])
+        for start in range(0, len(tokens), per_line)
+    ]
+    return "\n".join(lines) + "\n"
+
+
+async def replay(
+    app: Any, keys: List[str], size: Tuple[int, int] = REPLAY_SIZE
+) -> None:
+    """Press keys in an instrumented app running headless.
+
+    The document is fully loaded first. Each key is pressed once the
+    previous one drew its frame (or timed out) and the app went idle, so
+    every sample measures one key, without queueing.
+
+    Args:
+        app: An instance of a class made by ``instrumented_app()``.
+        keys (List[str]): The key names to press.
+        size (Tuple[int, int]): The size of the screen.
+    """
+    async with app.run_test(size=size) as pilot:
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+        for key in keys:
+            if app.return_code is not None:
+                break
+            await pilot.press(key)
+            while app._latency_pending and app.return_code is None:
+                await asyncio.sleep(0.005)
+            if app.return_code is None:
+                await pilot.pause()
+
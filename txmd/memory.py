@@ -0,0 +1,209 @@
+"""Memory diagnostics of txmd, for ``txmd --memory``.
+
+``diagnosed_app()`` derives a subclass of the app that takes
+``tracemalloc`` snapshots after the document is loaded, after the TOC is
+built and after the first frame. Like ``txmd.profile``, this module is
+only imported when asked for, as tracing allocations slows Python down
+severalfold. The memory budget of ``--max-memory`` is in ``txmd.budget``.
+"""
+
+import os
+import sys
+from typing import IO, Any, List, NamedTuple, Optional
+
+from txmd.budget import current_rss
+
+# Number of allocation sites listed per snapshot
+TOP_SITES = 5
+
+
+class Snapshot(NamedTuple):
+    """The memory of the process at a point of the run.
+
+    Attributes:
+        name (str): The name of the point.
+        traced (int): Bytes allocated by Python since diagnostics started,
+            and still alive.
+        peak (int): Highest value of traced so far.
+        rss (Optional[int]): Resident set size of the process, if known.
+        sites (List[Any]): The ``tracemalloc.StatisticDiff`` of the sites
+            that allocated the most since the previous point.
+    """
+
+    name: str
+    traced: int
+    peak: int
+    rss: Optional[int]
+    sites: List[Any]
+
+
+class MemoryDiagnostics:
+    """Trace the allocations of a run and report them on exit.
+
+    Attributes:
+        input_size (int): Size of the input, in bytes, the allocations are
+            compared with.
+        snapshots (List[Snapshot]): The points of the run, in order.
+    """
+
+    def __init__(self) -> None:
+        self.input_size = 0
+        self.snapshots: List[Snapshot] = []
+        self._previous: Any = None
+
+    def start(self) -> None:
+        """Start tracing allocations, unless already started."""
+        import tracemalloc
+
+        if tracemalloc.is_tracing():
+            return
+        tracemalloc.start()
+        self._previous = self._take()
+
+    def snapshot(self, name: str) -> None:
+        """Record the memory of the process, once per name.
+
+        Args:
+            name (str): The name of the point of the run.
+        """
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            return
+        if any(snapshot.name == name for snapshot in self.snapshots):
+            return
+        traced, peak = tracemalloc.get_traced_memory()
+        current = self._take()
+        sites = current.compare_to(self._previous, "lineno")[:TOP_SITES]
+        self._previous = current
+        self.snapshots.append(
+            Snapshot(name, traced, peak, current_rss(), sites)
+        )
+
+    def report(self) -> str:
+        """Return the table of the snapshots and their top sites."""
+        size = max(1, self.input_size)
+        lines = [
+            f"{'snapshot':<14} {'traced MB':>10} {'per byte':>9} "
+            f"{'peak MB':>9} {'RSS MB':>9}"
+        ]
+        for snapshot in self.snapshots:
+            rss = (
+                "-" if snapshot.rss is None else f"{snapshot.rss / 2**20:.1f}"
+            )
+            lines.append(
+                f"{snapshot.name:<14} {snapshot.traced / 2**20:10.1f} "
+                f"{snapshot.traced / size:9.2f} "
+                f"{snapshot.peak / 2**20:9.1f} {rss:>9}"
+            )
+        for snapshot in self.snapshots:
+            lines.append(f"Top allocations until {snapshot.name}:")
+            for site in snapshot.sites:
+                frame = site.traceback[0]
+                lines.append(
+                    f"  {site.size_diff / 2**20:+8.2f} MB "
+                    f"{site.count_diff:+9d} blocks  "
+                    f"{_short_path(frame.filename)}:{frame.lineno}"
+                )
+        return "\n".join(lines)
+
+    def finish(self, file: Optional[IO[str]] = None) -> None:
+        """Stop tracing and print the report.
+
+        Args:
+            file (Optional[IO[str]]): Where to print the report; stderr
+                by default.
+        """
+        import tracemalloc
+
+        file = file or sys.stderr
+        self.snapshot("exit")
+        tracemalloc.stop()
+        print(
+            f"txmd memory ({self.input_size / 2**20:.1f} MB of input, "
+            "per byte: traced bytes per input byte):",
+            file=file,
+        )
+        print(self.report(), file=file)
+
+    def _take(self) -> Any:
+        """Take a snapshot of the allocations made by the document."""
+        import tracemalloc
+
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+
+
+def _short_path(filename: str) -> str:
+    """Return filename relative to the closest directory on sys.path."""
+    best = filename
+    for entry in sys.path:
+        if entry and filename.startswith(entry.rstrip(os.sep) + os.sep):
+            relative = filename[len(entry.rstrip(os.sep)) + 1 :]
+            if len(relative) < len(best):
+                best = relative
+    return best
+
+
+def diagnosed_app(app_class: type, diagnostics: MemoryDiagnostics) -> type:
+    """Derive a subclass of the viewer app that snapshots its memory.
+
+    Tracing starts when the app is created, after Textual is imported, so
+    the snapshots hold what the document costs rather than what importing
+    the viewer does. The subclass snapshots:
+
+    - ``load``: once the document is parsed (or indexed in fast mode);
+    - ``first_render``: at the first frame;
+    - ``toc``: once the TOC is built, which it does as soon as the
+      document is loaded and shown, rather than when the TOC is opened.
+
+    Args:
+        app_class (type): ``MarkdownViewerApp``, or a subclass.
+        diagnostics (MemoryDiagnostics): Where to record the snapshots.
+
+    Returns:
+        type: The subclass, with the same name as app_class.
+    """
+
+    class DiagnosedApp(app_class):  # type: ignore[misc, valid-type]
+        _memory_painted = False
+
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            diagnostics.start()
+            super().__init__(*args, **kwargs)
+            diagnostics.input_size = len(self.document.data)
+            if not self._loading:
+                diagnostics.snapshot("load")
+
+        def _display(self, screen: Any, renderable: Any) -> None:
+            super()._display(screen, renderable)
+            if not self._memory_painted and renderable is not None:
+                self._memory_painted = True
+                diagnostics.snapshot("first_render")
+                self.call_later(self._build_diagnosed_toc)
+
+        def _finish_loading(self) -> None:
+            super()._finish_loading()
+            diagnostics.input_size = len(self.document.data)
+            diagnostics.snapshot("load")
+            self._build_diagnosed_toc()
+
+        def _populate_toc(self) -> None:
+            super()._populate_toc()
+            diagnostics.snapshot("toc")
+
+        def _build_diagnosed_toc(self) -> None:
+            if (
+                self._memory_painted
+                and not self._loading
+                and not self._toc_built
+            ):
+                self._populate_toc()
+
+    DiagnosedApp.__name__ = DiagnosedApp.__qualname__ = app_class.__name__
+    return DiagnosedApp
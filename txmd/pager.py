@@ -0,0 +1,600 @@
+"""Line-oriented fast mode for documents too large to lay out as blocks."""
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import (
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
+
+from rich.segment import Segment
+from rich.text import Text
+from textual.geometry import Region, Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from txmd.blocks import (
+    CLOSING_FENCE_PATTERNS,
+    FENCE_PATTERN,
+    HEADING_PATTERN,
+    HTML_BLOCK_ENDS,
+    HTML_BLOCK_PATTERN,
+    SETEXT_UNDERLINE_PATTERN,
+    after_indent,
+    heading_title,
+    setext_title,
+)
+from txmd.document import SCAN_CHUNK_SIZE, Buffer, Document
+
+# Lines the outline scanner cares about, with the line patterns of
+# txmd.blocks compiled for bytes: ATX headers, opening code fences, setext
+# underlines and the first lines of HTML blocks. Lines are matched after
+# their preceding newline rather than with ^ and re.MULTILINE, which lets
+# the regex engine skip other text much faster, and the indentation is
+# only matched once.
+_OUTLINE_LINE = re.compile(
+    rb"\n {0,3}(?:"
+    + after_indent(HEADING_PATTERN).encode()
+    + rb"(?P<text>[^\n]*)|"
+    + after_indent(FENCE_PATTERN).encode()
+    + b"|"
+    + after_indent(SETEXT_UNDERLINE_PATTERN).encode()
+    + b"|"
+    + after_indent(HTML_BLOCK_PATTERN).encode()
+    + b")"
+)
+
+# Closing fences of fenced code blocks, by fence character
+_CLOSING_FENCES = {
+    char.encode(): re.compile(rb"\n" + pattern.pattern.encode())
+    for char, pattern in CLOSING_FENCE_PATTERNS.items()
+}
+
+# Ends of HTML blocks: their end markers by kind, and a blank line
+_HTML_BLOCK_ENDS = {
+    kind: re.compile(pattern.pattern.encode())
+    for kind, pattern in HTML_BLOCK_ENDS.items()
+}
+_BLANK_LINE = re.compile(rb"\n[ \t\r]*\n")
+
+# Inline markup styled by the pager, applied in this order so that code
+# spans override the emphasis markers they contain
+_INLINE_STYLES = (
+    (re.compile(r"(\*\*|__)(?=\S)(?:(?!\1).)+?(?<=\S)\1"), "markdown.strong"),
+    (
+        re.compile(r"(?<![\w*])\*(?=[^\s*])[^*]*?(?<=[^\s*])\*(?!\*)"),
+        "markdown.em",
+    ),
+    (
+        re.compile(r"(?<![\w_])_(?=[^\s_])[^_]*?(?<=[^\s_])_(?![\w_])"),
+        "markdown.em",
+    ),
+    (re.compile(r"(`+)(?!`).+?(?<!`)\1(?!`)"), "markdown.code"),
+)
+
+
+class LineChunk(NamedTuple):
+    """What ``scan_lines()`` found in a chunk of the buffer.
+
+    Attributes:
+        end (int): Byte offset of the end of the chunk, just after a
+            newline unless it is the end of the buffer.
+        line_count (int): Number of lines from the start of the buffer to
+            the end of the chunk.
+        headers (List[Tuple[int, str, int]]): ``(level, text,
+            line_number)`` of the headers in the chunk.
+        fences (List[Tuple[int, int]]): First and last line of the fenced
+            code blocks closed in the chunk, or left open at the end of
+            the buffer.
+    """
+
+    end: int
+    line_count: int
+    headers: List[Tuple[int, str, int]]
+    fences: List[Tuple[int, int]]
+
+
+def exceeds_threshold(
+    content: Union[str, Buffer],
+    size: Optional[int] = None,
+    lines: Optional[int] = None,
+) -> bool:
+    """Tell if content is above a size or a line count threshold.
+
+    Lines are counted chunk by chunk, and counting stops as soon as the
+    threshold is reached, so the check never reads more than ``lines``
+    lines; nothing is decoded or parsed.
+
+    Args:
+        content (Union[str, Buffer]): The markdown content.
+        size (Optional[int]): Maximum size in bytes (characters for
+            text), or None for no limit.
+        lines (Optional[int]): Maximum number of lines, or None for no
+            limit.
+
+    Returns:
+        bool: True if the content is larger than either limit.
+    """
+    if size is not None and len(content) > size:
+        return True
+    if lines is None or len(content) <= lines:
+        # Every line but the last takes at least one byte
+        return False
+    count = 0
+    for start in range(0, len(content), SCAN_CHUNK_SIZE):
+        chunk = content[start : start + SCAN_CHUNK_SIZE]
+        if isinstance(chunk, str):
+            count += chunk.count("\n")
+        else:
+            count += bytes(chunk).count(b"\n")
+        if count >= lines:
+            return True
+    return False
+
+
+def scan_lines(
+    data: Buffer, first_chunk_size: Optional[int] = None
+) -> Iterator[LineChunk]:
+    """Count the lines of a buffer and find its headers and code fences.
+
+    This is all the pager needs to know about a document, and much less
+    than ``scan_buffer()`` works out: the bytes are matched by a single
+    regular expression that only stops on header, fence, underline and
+    HTML block lines, and are never decoded, except for the header texts.
+    The lines are recognised by the patterns of ``txmd.blocks``, and
+    setext headers by its ``setext_title()``, so the headers are those
+    of the viewer's table of contents, except inside list items, which
+    the scanner does not track.
+
+    Args:
+        data (Buffer): The UTF-8 encoded markdown.
+        first_chunk_size (Optional[int]): Size of the first chunk, doubled
+            for every following chunk up to ``SCAN_CHUNK_SIZE``. Defaults
+            to ``SCAN_CHUNK_SIZE``.
+
+    Yields:
+        LineChunk: What was found in each chunk, in order.
+    """
+    chunk_size = first_chunk_size or SCAN_CHUNK_SIZE
+    line_count = 0
+    offset = 0
+    # The line cut at the end of the last chunk, and the lines before the
+    # chunk after the last blank line, preceded by a newline (at most a
+    # chunk of them)
+    pending = b""
+    tail = b""
+    # Character, length and first line of the open code fence
+    fence: Optional[Tuple[bytes, int, int]] = None
+    # End of the open HTML block: its end marker, or a blank line
+    html: Optional[Pattern[bytes]] = None
+    # Last header, fence, underline or HTML line: not a setext header's
+    # text
+    last_markup = 0
+    with memoryview(data) as view:
+        start = 0
+        while start < len(view):
+            buffer = pending + bytes(view[start : start + chunk_size])
+            start += chunk_size
+            chunk_size = min(chunk_size * 2, SCAN_CHUNK_SIZE)
+            final = start >= len(view)
+            if not final:
+                cut = buffer.rfind(b"\n") + 1
+                pending = buffer[cut:]
+                buffer = buffer[:cut]
+                if not buffer:
+                    continue
+
+            headers: List[Tuple[int, str, int]] = []
+            fences: List[Tuple[int, int]] = []
+            # Every line, the first one included, follows a newline
+            text = b"\n" + buffer
+            line_number = line_count
+            counted = 0
+            position = 0
+            while True:
+                if fence is not None:
+                    char, length, first = fence
+                    match = _CLOSING_FENCES[char].search(text, position)
+                    if match is None:
+                        break
+                    position = match.end()
+                    if len(match.group(1)) < length:
+                        continue
+                    line_number += text.count(b"\n", counted, position)
+                    counted = position
+                    fences.append((first, line_number))
+                    fence = None
+                    last_markup = line_number
+                    continue
+
+                if html is not None:
+                    match = html.search(text, position)
+                    if match is None:
+                        break
+                    if html is _BLANK_LINE:
+                        # Stop on the blank line, which the next line
+                        # follows
+                        line_start = match.start() + 1
+                        position = match.end() - 1
+                    else:
+                        line_start = text.rfind(b"\n", 0, match.start()) + 1
+                        position = text.find(b"\n", match.end())
+                        if position == -1:
+                            position = len(text)
+                    line_number += text.count(b"\n", counted, line_start)
+                    counted = line_start
+                    html = None
+                    last_markup = line_number
+                    continue
+
+                match = _OUTLINE_LINE.search(text, position)
+                if match is None:
+                    break
+                position = match.end()
+                line_start = match.start() + 1
+                line_number += text.count(b"\n", counted, line_start)
+                counted = line_start
+                hashes, marker, underline = match.group(
+                    "hashes", "fence", "underline"
+                )
+                if marker is not None:
+                    fence = (marker[:1], len(marker), line_number)
+                elif hashes is not None:
+                    title = heading_title(
+                        match.group("text").decode("utf-8", "replace")
+                    )
+                    if title:
+                        headers.append((len(hashes), title, line_number))
+                elif underline is not None:
+                    lines = _paragraph_above(
+                        text, line_start - 1, tail, line_number - last_markup
+                    )
+                    title = setext_title(lines)
+                    if title is not None:
+                        level = 1 if underline[:1] == b"=" else 2
+                        first = line_number - len(lines)
+                        headers.append((level, title, first))
+                else:
+                    kind = match.lastgroup or ""
+                    limit = min(2, line_number - last_markup)
+                    if kind == "tag" and _paragraph_above(
+                        text, line_start - 1, tail, limit
+                    ):
+                        # A lone tag cannot interrupt a paragraph
+                        continue
+                    html = _HTML_BLOCK_ENDS.get(kind, _BLANK_LINE)
+                last_markup = line_number
+
+            offset += len(buffer)
+            line_count += buffer.count(b"\n")
+            if final and not buffer.endswith(b"\n"):
+                line_count += 1
+            # The lines after the last blank line, which may be the text of
+            # a setext header underlined in the next chunk
+            blank = buffer.rfind(b"\n\n")
+            if blank >= 0:
+                tail = buffer[blank + 1 : -1]
+            else:
+                tail = (tail + text[:-1])[-SCAN_CHUNK_SIZE:]
+            if final and fence is not None:
+                fences.append((fence[2], line_count))
+            yield LineChunk(offset, line_count, headers, fences)
+
+
+def _paragraph_above(
+    text: bytes, end: int, tail: bytes, limit: int
+) -> List[str]:
+    """Collect the lines of paragraph text just above a line.
+
+    Args:
+        text (bytes): The chunk of the line, preceded by a newline.
+        end (int): Position of the newline before the line.
+        tail (bytes): The lines of the previous chunk after its last blank
+            line, preceded by a newline, where the walk continues once it
+            reaches the top of text.
+        limit (int): The line number of the line minus that of the last
+            header, fence, underline or HTML line above it: the lines in
+            between are the only ones that can be paragraph text.
+
+    Returns:
+        List[str]: Up to limit decoded lines, up to the first blank line
+            above, in order.
+    """
+    lines: List[bytes] = []
+    while len(lines) < limit - 1:
+        if end <= 0:
+            if not tail:
+                break
+            text, end, tail = tail, len(tail), b""
+            continue
+        start = text.rfind(b"\n", 0, end)
+        line = text[start + 1 : end].rstrip(b"\r")
+        if not line.strip():
+            break
+        lines.append(line)
+        end = start
+    return [line.decode("utf-8", "replace") for line in reversed(lines)]
+
+
+def highlight_line(text: str, code: bool = False) -> Text:
+    """Style a source line with the theme of Rich's Markdown renderer.
+
+    Headers and the lines of fenced code blocks are styled whole; in other
+    lines, strong and emphasized text and code spans are. The markup is
+    kept, since the pager shows the source.
+
+    Args:
+        text (str): The line, without its newline.
+        code (bool): True if the line belongs to a fenced code block.
+
+    Returns:
+        Text: The styled line.
+    """
+    if code:
+        return Text(text, style="markdown.code_block")
+    heading = HEADING_PATTERN.match(text)
+    if heading:
+        return Text(text, style=f"markdown.h{len(heading.group(1))}")
+    line = Text(text)
+    for pattern, style in _INLINE_STYLES:
+        line.highlight_regex(pattern, style)
+    return line
+
+
+class LineIndex:
+    """Maps line numbers to the lines of a buffer, chunk by chunk.
+
+    Only the end offset and the line count of every chunk from
+    ``scan_lines()`` is kept. A line is found by bisecting the line
+    counts, and its chunk is split into lines when it is first needed;
+    the last few chunks split are kept.
+
+    Attributes:
+        data (Buffer): The UTF-8 encoded markdown.
+        cache_size (int): Maximum number of split chunks to keep.
+    """
+
+    def __init__(self, data: Buffer, cache_size: int = 4):
+        """Initialize the LineIndex.
+
+        Args:
+            data (Buffer): The buffer the chunks are added from.
+            cache_size (int): Maximum number of split chunks to keep.
+        """
+        self.data = data
+        self.cache_size = cache_size
+        self._ends = array("q")
+        self._counts = array("q")
+        self._fence_starts = array("q")
+        self._fence_ends = array("q")
+        self._chunks: "OrderedDict[int, List[bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of lines indexed so far."""
+        return self._counts[-1] if self._counts else 0
+
+    def add_chunk(self, chunk: LineChunk) -> None:
+        """Index the lines of the next chunk of the buffer.
+
+        Args:
+            chunk (LineChunk): The next chunk from ``scan_lines()``.
+        """
+        self._ends.append(chunk.end)
+        self._counts.append(chunk.line_count)
+        for first, last in chunk.fences:
+            self._fence_starts.append(first)
+            self._fence_ends.append(last)
+
+    def line(self, line_number: int) -> str:
+        """Decode a line of the buffer.
+
+        Args:
+            line_number (int): An indexed line (1-indexed).
+
+        Returns:
+            str: The line, without its line ending.
+        """
+        index = bisect_left(self._counts, line_number)
+        first = self._counts[index - 1] if index else 0
+        line = self._lines(index)[line_number - first - 1]
+        return str(line, "utf-8", "replace").rstrip("\r")
+
+    def in_code(self, line_number: int) -> bool:
+        """Tell if a line belongs to a fenced code block, fences included.
+
+        Args:
+            line_number (int): A line of the buffer (1-indexed).
+
+        Returns:
+            bool: True if the line is in a code block found so far.
+        """
+        index = bisect_right(self._fence_starts, line_number) - 1
+        return index >= 0 and line_number <= self._fence_ends[index]
+
+    def _lines(self, index: int) -> List[bytes]:
+        """Return the lines of a chunk, splitting it if needed."""
+        lines = self._chunks.get(index)
+        if lines is not None:
+            self._chunks.move_to_end(index)
+            return lines
+
+        start = self._ends[index - 1] if index else 0
+        with memoryview(self.data) as view:
+            text = bytes(view[start : self._ends[index]])
+        lines = text.split(b"\n")
+        if text.endswith(b"\n"):
+            lines.pop()
+        self._chunks[index] = lines
+        if len(self._chunks) > self.cache_size:
+            self._chunks.popitem(last=False)
+        return lines
+
+
+class PagerView(ScrollView, can_focus=True, inherit_bindings=False):
+    """A scrollable view of the markdown source, one row per line.
+
+    This is the fast mode of the viewer: nothing is laid out as Markdown,
+    lines are neither wrapped nor parsed, and only the visible ones are
+    decoded and styled (see ``highlight_line()``), so a document of any
+    size opens as fast as a short note. Lines are added by chunks from
+    ``scan_lines()``, usually run by a background worker.
+
+    The view maps lines to rows like ``DocumentView`` does, so searching
+    and the TOC work the same in both modes.
+
+    Attributes:
+        document (Document): The document being displayed, whose blocks
+            are never scanned.
+        lines (LineIndex): The lines indexed so far.
+        cache_size (int): Maximum number of rendered lines kept in memory.
+    """
+
+    DEFAULT_CSS = """
+    PagerView {
+        background: $surface;
+        color: $text;
+    }
+    """
+
+    def __init__(
+        self,
+        document: Document,
+        *,
+        cache_size: int = 256,
+        name: Optional[str] = None,
+        id: Optional[str] = None,
+        classes: Optional[str] = None,
+    ):
+        """Initialize the PagerView.
+
+        Args:
+            document (Document): The document to display.
+            cache_size (int): Maximum number of rendered lines to keep.
+            name (Optional[str]): The name of the widget.
+            id (Optional[str]): The ID of the widget in the DOM.
+            classes (Optional[str]): The CSS classes of the widget.
+        """
+        super().__init__(name=name, id=id, classes=classes)
+        self.document = document
+        self.lines = LineIndex(document.data)
+        self.cache_size = cache_size
+        self._rendered: "OrderedDict[int, Strip]" = OrderedDict()
+        self._width = 0
+
+    @property
+    def block_count(self) -> int:
+        """int: Number of lines indexed, the blocks of the pager."""
+        return len(self.lines)
+
+    def add_lines(self, chunk: LineChunk) -> None:
+        """Show the lines of the next chunk of the document.
+
+        Args:
+            chunk (LineChunk): The next chunk from ``scan_lines()``.
+        """
+        self.lines.add_chunk(chunk)
+        if chunk.fences:
+            # Lines of the new code blocks may be drawn unstyled
+            self._rendered.clear()
+        self._update_virtual_size()
+        self.refresh()
+
+    def offset_for_line(self, line_number: int) -> int:
+        """Map a source line to its row in the virtual space.
+
+        Args:
+            line_number (int): Line number in the markdown source
+                (1-indexed).
+
+        Returns:
+            int: The row where the line is drawn.
+        """
+        return max(0, line_number - 1)
+
+    def line_at(self, y: int) -> int:
+        """Map a row of the virtual space back to a source line.
+
+        Args:
+            y (int): A row in the virtual space.
+
+        Returns:
+            int: The line number (1-indexed) drawn at that row.
+        """
+        return max(1, min(y + 1, len(self.lines)))
+
+    def render_lines(self, crop: Region) -> List[Strip]:
+        """Render the visible lines, widening the view for long ones.
+
+        Args:
+            crop: Region within the visible area to render.
+
+        Returns:
+            List[Strip]: The rendered lines.
+        """
+        scroll_y = self.scroll_offset.y
+        last = min(len(self.lines), scroll_y + self.size.height)
+        width = self._width
+        for line_number in range(scroll_y + 1, last + 1):
+            width = max(width, self._get_rendered(line_number).cell_length)
+        if width > self._width:
+            self._width = width
+            self._update_virtual_size()
+        return super().render_lines(crop)
+
+    def render_line(self, y: int) -> Strip:
+        """Render a single line of the viewport.
+
+        Args:
+            y (int): Row of the line relative to the top of the viewport.
+
+        Returns:
+            Strip: The rendered line.
+        """
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.scrollable_content_region.width
+        line_number = scroll_y + y + 1
+        if line_number > len(self.lines):
+            return Strip.blank(width, self.rich_style)
+        return self._get_rendered(line_number).crop_extend(
+            scroll_x, scroll_x + width, self.rich_style
+        )
+
+    def _update_virtual_size(self) -> None:
+        """Resize the scrollable area to the lines indexed so far."""
+        self.virtual_size = Size(self._width, len(self.lines))
+
+    def _get_rendered(self, line_number: int) -> Strip:
+        """Get a rendered line, rendering it if needed.
+
+        Args:
+            line_number (int): The line (1-indexed).
+
+        Returns:
+            Strip: The whole line, not cropped to the viewport.
+        """
+        strip = self._rendered.get(line_number)
+        if strip is not None:
+            self._rendered.move_to_end(line_number)
+            return strip
+
+        lines = self.lines
+        text = highlight_line(
+            lines.line(line_number).expandtabs(4),
+            lines.in_code(line_number),
+        )
+        segments = Segment.apply_style(
+            text.render(self.app.console), self.rich_style
+        )
+        strip = Strip(segments).simplify()
+
+        self._rendered[line_number] = strip
+        if len(self._rendered) > self.cache_size:
+            self._rendered.popitem(last=False)
+        return strip
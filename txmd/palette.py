@@ -0,0 +1,371 @@
+"""Fuzzy "jump to section" palette for txmd."""
+
+import re
+from array import array
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from rich.text import Text
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import Vertical
+from textual.message import Message
+from textual.widget import Widget
+from textual.widgets import Input, OptionList
+
+from txmd.toc import HeaderIndex
+
+# Maximum number of sections listed by the palette
+PALETTE_LIMIT = 50
+
+# Characters separating the words of a title, matched as spaces
+_SEPARATORS = str.maketrans(dict.fromkeys("\t\r\f\v-_/.,:;()[]{}<>\"'`*", " "))
+
+_SPACES = re.compile("  +")
+_LINE_SPACES = re.compile(" ?\n ?")
+
+
+class HeaderMatcher:
+    """Rank the headers of a document against a fuzzy query.
+
+    The lowercased titles, with punctuation replaced by spaces, are joined
+    into one string, one title per line, and every query is answered by a
+    few regular expression scans over it, which run in C instead of a
+    Python loop per header. Results come in tiers, each in document order:
+
+    1. titles starting with the query,
+    2. titles with a word starting with the query,
+    3. titles containing the query,
+    4. titles containing the characters of the query in order.
+
+    Scans stop as soon as ``limit`` results are found, so common queries
+    are answered from the first few matching titles. When a query matches
+    fewer titles than that, the titles it matched are kept, and a query
+    extending it (the user typing one more character) only scans them: a
+    title matching the longer query also matches the shorter one.
+
+    Attributes:
+        limit (int): Maximum number of results returned by ``match()``.
+
+    Example:
+        >>> matcher = HeaderMatcher(document.headers)
+        >>> matcher.match("instal")
+        [12, 40, 41]
+    """
+
+    def __init__(self, headers: HeaderIndex, limit: int = PALETTE_LIMIT):
+        """Initialize the HeaderMatcher.
+
+        Args:
+            headers (HeaderIndex): The headers to match, e.g.
+                ``document.headers``.
+            limit (int): Maximum number of results per query.
+        """
+        self.limit = limit
+        titles = "".join(
+            f"\n{headers.text(index)}" for index in range(len(headers))
+        )
+        titles = _SPACES.sub(" ", titles.lower().translate(_SEPARATORS))
+        self._titles = _LINE_SPACES.sub("\n", titles).rstrip(" ")
+        self._starts = array(
+            "q", (line.start() for line in re.finditer("\n", self._titles))
+        )
+        # The titles matching the last query with few matches, if any
+        self._narrowed: Optional[Tuple[str, str, "array[int]", List[int]]]
+        self._narrowed = None
+
+    def match(self, query: str) -> List[int]:
+        """Find the headers best matching a query.
+
+        Args:
+            query (str): The text typed by the user. Case, punctuation and
+                surrounding whitespace are ignored.
+
+        Returns:
+            List[int]: The ids of at most ``limit`` matching headers, best
+                first.
+        """
+        query = _normalize(query)
+        if not query:
+            return list(range(min(self.limit, len(self._starts))))
+
+        titles, starts, ids = self._titles, self._starts, None
+        narrowed = self._narrowed
+        if narrowed is not None and query.startswith(narrowed[0]):
+            _, titles, starts, ids = narrowed
+        elif narrowed is not None:
+            self._narrowed = None
+
+        lines, complete = _rank(titles, starts, query, self.limit)
+        if complete:
+            # Every title matching the query was found
+            self._narrowed = _narrow(query, titles, starts, ids, lines)
+        return [line if ids is None else ids[line] for line in lines]
+
+
+class SectionPalette(Vertical):
+    """An overlay to jump to a section by typing part of its title.
+
+    The palette lists the headers ranked by ``HeaderMatcher`` as the
+    query is typed. Up and down move the highlight, Enter (or a click)
+    selects a section, and Escape closes the palette. Selecting a
+    section posts ``SectionPalette.Selected``, which the app handles by
+    jumping to the header.
+    """
+
+    DEFAULT_CSS = """
+    SectionPalette {
+        display: none;
+        layer: overlay;
+        dock: top;
+        width: 100%;
+        height: auto;
+        max-height: 80%;
+        padding: 0 1;
+        background: $panel;
+        border-bottom: solid $primary;
+    }
+
+    SectionPalette.visible {
+        display: block;
+    }
+
+    SectionPalette OptionList {
+        height: auto;
+        max-height: 20;
+        border: none;
+    }
+    """
+
+    BINDINGS = [
+        Binding("escape", "close", "Close", show=False),
+        Binding("down", "cursor_down", "Next", show=False),
+        Binding("up", "cursor_up", "Previous", show=False),
+    ]
+
+    class Selected(Message):
+        """Posted when a section is chosen in the palette.
+
+        Attributes:
+            header_id (int): The index of the header in the document's
+                ``HeaderIndex``.
+        """
+
+        def __init__(self, header_id: int):
+            super().__init__()
+            self.header_id = header_id
+
+    def __init__(self, *, id: Optional[str] = None):
+        """Initialize the SectionPalette.
+
+        Args:
+            id (Optional[str]): The ID of the widget in the DOM.
+        """
+        super().__init__(id=id)
+        self._headers = HeaderIndex()
+        self._matcher = HeaderMatcher(self._headers)
+        self._results: List[int] = []
+        self._previous_focus: Optional[Widget] = None
+
+    def compose(self) -> ComposeResult:
+        """Create the query input and the list of sections."""
+        yield Input(placeholder="Jump to section", id="palette-query")
+        results = OptionList(id="palette-results")
+        results.can_focus = False  # Keep typing in the input
+        yield results
+
+    @property
+    def results(self) -> List[int]:
+        """List[int]: The ids of the headers currently listed."""
+        return self._results
+
+    def open(self, headers: HeaderIndex) -> None:
+        """Show the palette for the headers of a document.
+
+        Args:
+            headers (HeaderIndex): The headers to choose from.
+        """
+        self._headers = headers
+        self._matcher = HeaderMatcher(headers)
+        query = self.query_one("#palette-query", Input)
+        query.value = ""
+        self._show(self._matcher.match(""))
+        if not self.has_class("visible"):
+            self._previous_focus = self.screen.focused
+        self.add_class("visible")
+        query.focus()
+
+    def action_close(self) -> None:
+        """Hide the palette, giving the focus back."""
+        self.remove_class("visible")
+        if self._previous_focus is not None:
+            self._previous_focus.focus()
+            self._previous_focus = None
+
+    def action_cursor_down(self) -> None:
+        """Highlight the next section."""
+        self.query_one("#palette-results", OptionList).action_cursor_down()
+
+    def action_cursor_up(self) -> None:
+        """Highlight the previous section."""
+        self.query_one("#palette-results", OptionList).action_cursor_up()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        """Rank the sections again for the new query."""
+        event.stop()
+        self._show(self._matcher.match(event.value))
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """Select the highlighted section."""
+        event.stop()
+        highlighted = self.query_one(
+            "#palette-results", OptionList
+        ).highlighted
+        if highlighted is not None:
+            self._select(highlighted)
+
+    def on_option_list_option_selected(
+        self, event: OptionList.OptionSelected
+    ) -> None:
+        """Select a clicked section."""
+        event.stop()
+        self._select(event.option_index)
+
+    def _show(self, results: List[int]) -> None:
+        """List the given headers, highlighting the first one."""
+        self._results = results
+        headers = self._headers
+        options = self.query_one("#palette-results", OptionList)
+        options.clear_options()
+        options.add_options(
+            Text.assemble(
+                headers.text(header_id),
+                (f"  line {headers.line_number(header_id)}", "dim"),
+            )
+            for header_id in results
+        )
+        if results:
+            options.highlighted = 0
+
+    def _select(self, index: int) -> None:
+        """Close the palette and report the chosen header."""
+        header_id = self._results[index]
+        self.action_close()
+        self.post_message(self.Selected(header_id))
+
+
+def _normalize(text: str) -> str:
+    """Lowercase a title or query, with single spaces between words."""
+    return " ".join(text.lower().translate(_SEPARATORS).split())
+
+
+def _rank(
+    titles: str, starts: "array[int]", query: str, limit: int
+) -> Tuple[List[int], bool]:
+    """Rank the lines of ``titles`` matching a normalized query.
+
+    Returns:
+        Tuple[List[int], bool]: At most ``limit`` matching lines, best
+            first, and whether they are all the lines matching the query.
+    """
+    # Enough lines containing the query to fill the results, whatever the
+    # lines starting with it or with a word starting with it
+    contiguous = _find_lines(titles, starts, query, 2 * limit)
+    if len(contiguous) == 2 * limit:
+        found = _find_lines(titles, starts, "\n" + query, limit)
+        for tier in (
+            _find_lines(titles, starts, " " + query, limit),
+            contiguous,
+        ):
+            seen = set(found)
+            found.extend(line for line in tier if line not in seen)
+        return found[:limit], False
+
+    # Few titles contain the query: sort them into tiers directly
+    tiers: Tuple[List[int], List[int], List[int]] = ([], [], [])
+    for line in contiguous:
+        title = _line(titles, starts, line)
+        if title.startswith(query, 1):
+            tiers[0].append(line)
+        elif " " + query in title:
+            tiers[1].append(line)
+        else:
+            tiers[2].append(line)
+    found = tiers[0] + tiers[1] + tiers[2]
+    chars = query.replace(" ", "")
+    if (
+        len(found) >= limit
+        or len(chars) < 2
+        or not all(char in titles for char in chars)
+    ):
+        return found[:limit], len(found) < limit
+
+    # Starting at the first character rather than at each line lets the
+    # regular expression engine skip ahead with a fast substring search
+    escaped = [re.escape(char) for char in chars]
+    pattern = re.compile(
+        escaped[0] + "".join(f"[^\n{char}]*{char}" for char in escaped[1:])
+    )
+    seen = set(found)
+    match = pattern.search(titles)
+    while match is not None:
+        line = bisect_right(starts, match.start()) - 1
+        if line not in seen:
+            seen.add(line)
+            found.append(line)
+            if len(found) == limit:
+                return found, False
+        match = pattern.search(titles, _line_end(titles, starts, line))
+    return found, True
+
+
+def _find_lines(
+    titles: str, starts: "array[int]", needle: str, limit: int
+) -> List[int]:
+    """Find the first ``limit`` lines of ``titles`` containing ``needle``."""
+    lines: List[int] = []
+    position = titles.find(needle)
+    while position >= 0 and len(lines) < limit:
+        line = bisect_right(starts, position) - 1
+        lines.append(line)
+        position = titles.find(needle, _line_end(titles, starts, line))
+    return lines
+
+
+def _line(titles: str, starts: "array[int]", line: int) -> str:
+    """Return a line of ``titles``, with its leading newline."""
+    start = starts[line]
+    end = _line_end(titles, starts, line)
+    return titles[start:end]
+
+
+def _line_end(titles: str, starts: "array[int]", line: int) -> int:
+    """Return the offset of the end of a line of ``titles``."""
+    return starts[line + 1] if line + 1 < len(starts) else len(titles)
+
+
+def _narrow(
+    query: str,
+    titles: str,
+    starts: "array[int]",
+    ids: Optional[List[int]],
+    lines: List[int],
+) -> Tuple[str, str, "array[int]", List[int]]:
+    """Keep the titles of some lines, for queries extending ``query``.
+
+    Returns:
+        Tuple[str, str, array, List[int]]: The query, the joined titles of
+            the lines, in document order, their start offsets and the ids
+            of their headers.
+    """
+    lines = sorted(lines)
+    parts = []
+    narrowed_starts = array("q")
+    position = 0
+    for line in lines:
+        title = _line(titles, starts, line)
+        narrowed_starts.append(position)
+        parts.append(title)
+        position += len(title)
+    narrowed_ids = [line if ids is None else ids[line] for line in lines]
+    return query, "".join(parts), narrowed_starts, narrowed_ids
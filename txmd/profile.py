@@ -0,0 +1,227 @@
+"""Per-phase timing of a txmd run, for ``txmd --profile``.
+
+Nothing in this module is imported, and no code of the viewer is changed,
+unless profiling is asked for: ``profiled_app()`` derives a subclass of
+the app that records its phases, and the command line uses it instead of
+the app only when ``--profile`` is given.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from txmd.budget import peak_rss
+
+
+class Span(NamedTuple):
+    """The measures of a finished phase.
+
+    Attributes:
+        name (str): The name of the phase.
+        start (float): Seconds from the start of the run to the phase.
+        wall (float): Elapsed seconds.
+        cpu (float): CPU seconds used by the process, all threads
+            included, during the phase.
+        peak_rss (Optional[int]): Highest resident set size of the
+            process so far at the end of the phase, in bytes, if known.
+        rss_growth (Optional[int]): How much the phase raised that peak.
+    """
+
+    name: str
+    start: float
+    wall: float
+    cpu: float
+    peak_rss: Optional[int]
+    rss_growth: Optional[int]
+
+
+class Profiler:
+    """Record the phases of a run and report them on exit.
+
+    A phase is either timed around a block, with ``span()``, or between
+    two callbacks of the app, with ``start()`` and ``stop()``. Phases
+    that never stop (e.g. the first paint when rendering to a pipe) are
+    left out of the report.
+
+    Attributes:
+        origin (float): ``time.perf_counter()`` at the start of the run.
+        spans (List[Span]): The finished phases, in the order they ended.
+        dump (Optional[Path]): Where to save the cProfile statistics of
+            the run, if anywhere.
+    """
+
+    def __init__(self, dump: Optional[Path] = None):
+        self.origin = time.perf_counter()
+        self._origin_state = (self.origin, time.process_time(), peak_rss())
+        self.spans: List[Span] = []
+        self.dump = dump
+        self._open: Dict[str, Tuple[float, float, Optional[int]]] = {}
+        self._cprofile: Any = None
+        if dump is not None:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def start(self, name: str, from_origin: bool = False) -> None:
+        """Start timing a phase.
+
+        Args:
+            name (str): The name of the phase.
+            from_origin (bool): Time the phase from the start of the run,
+                rather than from now.
+        """
+        if from_origin:
+            self._open[name] = self._origin_state
+        else:
+            self._open[name] = (
+                time.perf_counter(),
+                time.process_time(),
+                peak_rss(),
+            )
+
+    def stop(self, name: str) -> None:
+        """Stop timing a phase, unless it was not started.
+
+        Args:
+            name (str): The name of the phase.
+        """
+        started = self._open.pop(name, None)
+        if started is None:
+            return
+        wall, cpu, rss = started
+        end_rss = peak_rss()
+        self.spans.append(
+            Span(
+                name,
+                wall - self.origin,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+                end_rss,
+                None if rss is None or end_rss is None else end_rss - rss,
+            )
+        )
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the phase run by the body of a ``with`` statement.
+
+        Args:
+            name (str): The name of the phase.
+        """
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def report(self) -> str:
+        """Return the table of the finished phases, in starting order."""
+        lines = [
+            f"{'phase':<14} {'start ms':>10} {'wall ms':>10} "
+            f"{'cpu ms':>10} {'peak RSS MB':>12} {'growth MB':>10}"
+        ]
+        for span in sorted(self.spans, key=lambda span: span.start):
+            peak = (
+                "-"
+                if span.peak_rss is None
+                else f"{span.peak_rss / 2**20:.1f}"
+            )
+            growth = (
+                "-"
+                if span.rss_growth is None
+                else f"{span.rss_growth / 2**20:+.1f}"
+            )
+            lines.append(
+                f"{span.name:<14} {span.start * 1000:10.1f} "
+                f"{span.wall * 1000:10.1f} {span.cpu * 1000:10.1f} "
+                f"{peak:>12} {growth:>10}"
+            )
+        return "\n".join(lines)
+
+    def finish(self, file: Optional[IO[str]] = None) -> None:
+        """Stop cProfile, save its statistics and print the report.
+
+        Args:
+            file (Optional[IO[str]]): Where to print the report; stderr
+                by default.
+        """
+        file = file or sys.stderr
+        total = (time.perf_counter() - self.origin) * 1000
+        print(f"txmd profile ({total:.1f} ms in total):", file=file)
+        print(self.report(), file=file)
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(str(self.dump))
+            self._cprofile = None
+            print(f"cProfile statistics saved to {self.dump}", file=file)
+
+
+def profiled_app(app_class: type, profiler: Profiler) -> type:
+    """Derive a subclass of the viewer app that records its phases.
+
+    The subclass records, next to the phases timed by the command line:
+
+    - ``compose``: building the widgets;
+    - ``on_mount``: the mount handlers;
+    - ``first_paint``: from the start of the run to the first frame;
+    - ``load``: parsing or indexing a large document in the background;
+    - ``populate_toc``: filling the TOC, when it is first shown.
+
+    Args:
+        app_class (type): ``MarkdownViewerApp``, or a subclass.
+        profiler (Profiler): Where to record the phases.
+
+    Returns:
+        type: The subclass, with the same name as app_class.
+    """
+
+    class ProfiledApp(app_class):  # type: ignore[misc, valid-type]
+        _profile_painted = False
+
+        def compose(self) -> Iterator[Any]:
+            with profiler.span("compose"):
+                yield from super().compose()
+
+        def on_mount(self) -> None:
+            # Textual calls the handlers of every class, subclasses first:
+            # the phase ends once the app's own handler has run too
+            profiler.start("on_mount")
+            self.call_next(profiler.stop, "on_mount")
+
+        def _display(self, screen: Any, renderable: Any) -> None:
+            super()._display(screen, renderable)
+            if not self._profile_painted and renderable is not None:
+                self._profile_painted = True
+                profiler.stop("first_paint")
+
+        def _load_document(self) -> Any:
+            profiler.start("load")
+            return super()._load_document()
+
+        def _load_lines(self) -> Any:
+            profiler.start("load")
+            return super()._load_lines()
+
+        def _finish_loading(self) -> None:
+            super()._finish_loading()
+            profiler.stop("load")
+
+        def _populate_toc(self) -> None:
+            with profiler.span("populate_toc"):
+                super()._populate_toc()
+
+    ProfiledApp.__name__ = ProfiledApp.__qualname__ = app_class.__name__
+    profiler.start("first_paint", from_origin=True)
+    return ProfiledApp
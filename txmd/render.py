@@ -0,0 +1,111 @@
+"""Non-interactive rendering of Markdown to a terminal or a pipe for txmd."""
+
+import codecs
+import re
+from typing import BinaryIO, Iterable, List, Optional
+
+from rich.console import Console, Group, RenderableType
+from rich.markdown import Markdown as RichMarkdown
+from rich.text import Text
+
+from txmd.blocks import Block, BlockSplitter
+
+# Maximum number of bytes read from the input at a time
+RENDER_CHUNK_SIZE = 256 * 1024
+
+# A paragraph Rich would render as plain wrapped text: every line starts
+# with a letter and holds only characters without Markdown meaning, with
+# single spaces between words and no trailing spaces (a hard break)
+_PLAIN_PARAGRAPH = re.compile(
+    r"(?:[A-Za-z](?:[ ]?[A-Za-z0-9,.;:?'\"()/%+=#@$^-])*\n)+\n*"
+)
+
+
+def render_stream(
+    source: BinaryIO,
+    console: Console,
+    chunk_size: int = RENDER_CHUNK_SIZE,
+) -> None:
+    """Render UTF-8 encoded markdown from a stream as it arrives.
+
+    The input is split into blocks as it is read, and every complete block
+    is rendered and written straight away, so memory use does not depend
+    on the size of the input (only on the size of its largest block), and
+    the output of a slow producer shows up as it is written.
+
+    Args:
+        source (BinaryIO): The stream to read, e.g. piped stdin or a file.
+        console (Console): The console to render to. Its width is the
+            width of the output.
+        chunk_size (int): Maximum number of bytes read at a time.
+    """
+    splitter = BlockSplitter()
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    # Return what is available rather than waiting for a full chunk
+    read = getattr(source, "read1", source.read)
+    while True:
+        data = read(chunk_size)
+        if not data:
+            break
+        render_blocks(splitter.feed(decoder.decode(data)), console)
+        console.file.flush()
+    blocks = splitter.feed(decoder.decode(b"", final=True))
+    render_blocks(blocks + splitter.close(), console)
+    console.file.flush()
+
+
+def render_blocks(blocks: Iterable[Block], console: Console) -> None:
+    """Render markdown blocks to a console, as the viewer draws them.
+
+    Each block is rendered on its own and followed by a blank line, like
+    in ``DocumentView``. Plain paragraphs, which make up most of large
+    documents, are wrapped directly instead of going through the Markdown
+    parser; the output is the same. Other blocks are rendered by Rich,
+    in one call per batch rather than one per block.
+
+    Args:
+        blocks (Iterable[Block]): The blocks to render, in order.
+        console (Console): The console to render to.
+    """
+    width = console.width
+    # As many words as fit in a line, then a space or the end of the text
+    line_pattern = re.compile(f"(.{{1,{width}}})(?: |$)")
+    pending: List[RenderableType] = []
+    for block in blocks:
+        text = _wrap_plain_paragraph(block, width, line_pattern)
+        if text is None:
+            pending.append(RichMarkdown(block.text))
+            pending.append(Text())
+            continue
+        if pending:
+            console.print(Group(*pending))
+            pending = []
+        console.file.write(text)
+    if pending:
+        console.print(Group(*pending))
+
+
+def _wrap_plain_paragraph(
+    block: Block, width: int, line_pattern: "re.Pattern[str]"
+) -> Optional[str]:
+    """Wrap a paragraph without any markup like Rich would.
+
+    Args:
+        block (Block): The block to render.
+        width (int): The width of the output.
+        line_pattern (re.Pattern[str]): The pattern matching a line of
+            text wrapped to ``width``.
+
+    Returns:
+        Optional[str]: The lines of the paragraph padded to ``width``,
+            followed by a blank line, or None if the block is not a plain
+            paragraph.
+    """
+    if block.level or not _PLAIN_PARAGRAPH.fullmatch(block.text):
+        return None
+    text = " ".join(block.text.split())
+    lines = line_pattern.findall(text)
+    if sum(map(len, lines)) + len(lines) - 1 != len(text):
+        # A word longer than the width would be folded across lines
+        return None
+    return "".join(f"{line:<{width}}\n" for line in lines) + "\n"
@@ -0,0 +1,455 @@
+"""In-document search for txmd."""
+
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from txmd.document import Buffer
+
+# Number of bytes searched between two checks for cancellation
+SEARCH_CHUNK_SIZE = 1024 * 1024
+
+# Approximate size of the segments of a document that the trigram index
+# points to; segments end at a newline, so no match spans two of them
+INDEX_SEGMENT_SIZE = 64 * 1024
+
+# Identifies the serialized trigram index; bumped when its layout changes
+INDEX_MAGIC = b"txmdtri1"
+
+# Runs of word bytes (any non-ASCII byte counts, so UTF-8 text is indexed)
+# long enough to contain a trigram
+_WORD = re.compile(rb"[0-9a-z_\x80-\xff]{3,}")
+
+# Every (overlapping) trigram of newline-separated words
+_TRIGRAM = re.compile(rb"(?=([^\n]{3}))")
+
+# Header of a serialized index: magic, indexed size, line number at that
+# size, number of segments, number of trigrams and build time
+_INDEX_HEADER = struct.Struct("<8sqqqqd")
+
+
+def search_buffer(
+    data: Buffer,
+    query: str,
+    chunk_size: int = SEARCH_CHUNK_SIZE,
+    start: int = 0,
+    line_number: int = 1,
+) -> Iterator[List[int]]:
+    """Find the lines of a buffer that contain a query.
+
+    The query is a literal string. Like vim's ``smartcase``, a query
+    without uppercase letters matches case-insensitively (ASCII letters
+    only, as the search runs on the UTF-8 encoded bytes).
+
+    The buffer is searched one chunk at a time, so callers can stop
+    between chunks (e.g. when the query changes) and show the lines found
+    so far. Each chunk is copied before it is searched, so a buffer that
+    grows meanwhile (e.g. a followed file) is never locked.
+
+    Line numbers are counted while scanning: the newlines between two
+    consecutive hits are counted once, so mapping all the hits to lines
+    costs a single pass over the buffer.
+
+    Args:
+        data (Buffer): The UTF-8 encoded markdown source.
+        query (str): The text to look for, on a single line.
+        chunk_size (int): Number of bytes searched per iteration.
+        start (int): Offset to start searching at, at the start of a line.
+        line_number (int): The line number at ``start``.
+
+    Yields:
+        List[int]: The line numbers (1-indexed) of the lines containing a
+            match in the next chunk, in increasing order and each line
+            only once. Chunks without matches yield an empty list.
+    """
+    needle, fold_case = _prepare_query(query)
+    if not needle:
+        return
+
+    # Matches may start near the end of a chunk and end in the next one
+    overlap = len(needle) - 1
+    last_line = 0
+    size = len(data)
+    while start < size:
+        end = min(size, start + chunk_size)
+        chunk_end = min(size, end + overlap)
+        chunk = bytes(data[start:chunk_end])
+        if fold_case:
+            chunk = chunk.lower()
+        lines, next_line = _find_lines(chunk, needle, end - start, line_number)
+        if lines and lines[0] == last_line:
+            # The line already matched at the end of the previous chunk
+            del lines[0]
+        if lines:
+            last_line = lines[-1]
+        line_number = next_line
+        yield lines
+        start = end
+
+
+class TrigramIndex:
+    """Index of the trigrams found in each segment of a document.
+
+    The document is cut into segments of about ``INDEX_SEGMENT_SIZE``
+    bytes, ending at newlines, and every trigram (three bytes, lowercased)
+    of every word of a segment is recorded with the segment's number. A
+    query then only has to be verified in the segments that contain all
+    of its trigrams, instead of scanning the whole document for every
+    keystroke. Only trigrams inside words are indexed, which keeps the
+    index small and makes it fast to build, while every occurrence of a
+    query still lies in a segment holding all the trigrams of the query's
+    words.
+
+    The index is built once per document (``index_buffer()`` can run in a
+    thread, segment by segment) and can be saved with ``to_bytes()`` and
+    restored with ``from_bytes()``, e.g. by the parse cache. Content
+    added after the indexed bytes (e.g. by a followed file) is searched
+    linearly.
+
+    Attributes:
+        size (int): Number of bytes of the document that are indexed.
+        build_time (float): Seconds spent indexing.
+
+    Example:
+        >>> index = TrigramIndex()
+        >>> for _ in index.index_buffer(data):
+        ...     pass
+        >>> results = list(index.search(data, "needle"))
+    """
+
+    def __init__(self):
+        """Initialize an empty TrigramIndex."""
+        self.size = 0
+        self.build_time = 0.0
+        # End offset and first line number of every segment
+        self._ends = array("q")
+        self._lines = array("q")
+        self._line_number = 1
+        # Segments containing every trigram, in increasing order
+        self._postings: Dict[bytes, "array[int]"] = {}
+
+    def __len__(self) -> int:
+        """Return the number of distinct trigrams."""
+        return len(self._postings)
+
+    @property
+    def segment_count(self) -> int:
+        """int: Number of segments of the indexed bytes."""
+        return len(self._ends)
+
+    @property
+    def memory(self) -> int:
+        """int: Approximate memory used by the index, in bytes."""
+        return (
+            sys.getsizeof(self._postings)
+            + sum(
+                sys.getsizeof(trigram) + sys.getsizeof(segments)
+                for trigram, segments in self._postings.items()
+            )
+            + sys.getsizeof(self._ends)
+            + sys.getsizeof(self._lines)
+        )
+
+    def index_buffer(
+        self, data: Buffer, segment_size: int = INDEX_SEGMENT_SIZE
+    ) -> Iterator[int]:
+        """Index the bytes of a buffer that are not indexed yet.
+
+        Only complete lines are indexed; a trailing partial line is left
+        for a later call, once the buffer has grown.
+
+        Args:
+            data (Buffer): The UTF-8 encoded markdown source, which must
+                start with the bytes already indexed.
+            segment_size (int): Approximate size of a segment.
+
+        Yields:
+            int: The number of bytes indexed so far, after each segment,
+                so callers can report progress or stop.
+        """
+        started = time.perf_counter()
+        size = len(data)
+        while self.size < size:
+            start = self.size
+            end = data.find(b"\n", min(size, start + segment_size))
+            if end < 0:
+                # Index the complete lines left, if any
+                end = data.rfind(b"\n", start)
+                if end < 0:
+                    break
+            end += 1
+            segment = bytes(data[start:end]).lower()
+            number = len(self._ends)
+            words = b"\n".join(set(_WORD.findall(segment)))
+            for trigram in set(_TRIGRAM.findall(words)):
+                segments = self._postings.get(trigram)
+                if segments is None:
+                    segments = self._postings[trigram] = array("I")
+                segments.append(number)
+            self._ends.append(end)
+            self._lines.append(self._line_number)
+            self._line_number += segment.count(b"\n")
+            self.size = end
+            self.build_time += time.perf_counter() - started
+            yield end
+            started = time.perf_counter()
+
+    def candidates(self, query: str) -> List[int]:
+        """Find the segments that may contain a query.
+
+        Args:
+            query (str): The text to look for.
+
+        Returns:
+            List[int]: The numbers of the segments holding every trigram
+                of the query, in increasing order (all the segments if
+                the query has no trigram).
+        """
+        trigrams = set()
+        needle = query.encode("utf-8", "surrogateescape").lower()
+        for word in _WORD.findall(needle):
+            trigrams.update(_TRIGRAM.findall(word))
+        if not trigrams:
+            return list(range(len(self._ends)))
+
+        postings = []
+        for trigram in trigrams:
+            segments = self._postings.get(trigram)
+            if segments is None:
+                return []
+            postings.append(segments)
+        postings.sort(key=len)
+        found = set(postings[0])
+        for segments in postings[1:]:
+            found.intersection_update(segments)
+            if not found:
+                break
+        return sorted(found)
+
+    def search(self, data: Buffer, query: str) -> Iterator[List[int]]:
+        """Find the lines of a buffer that contain a query.
+
+        This gives the same lines as ``search_buffer()``, but only the
+        candidate segments are searched, plus whatever follows the
+        indexed bytes.
+
+        Args:
+            data (Buffer): The UTF-8 encoded markdown source the index was
+                built from (possibly grown since).
+            query (str): The text to look for, on a single line.
+
+        Yields:
+            List[int]: The line numbers (1-indexed) of the matching lines
+                of the next searched segment, in increasing order.
+        """
+        needle, fold_case = _prepare_query(query)
+        if not needle:
+            return
+
+        for number in self.candidates(query):
+            start = self._ends[number - 1] if number else 0
+            end = self._ends[number]
+            segment = bytes(data[start:end])
+            if fold_case:
+                segment = segment.lower()
+            lines, _ = _find_lines(
+                segment, needle, len(segment), self._lines[number]
+            )
+            yield lines
+        yield from search_buffer(
+            data, query, start=self.size, line_number=self._line_number
+        )
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index.
+
+        Returns:
+            bytes: The index, to be restored with ``from_bytes()``.
+        """
+        trigrams = b"".join(self._postings)
+        counts = array("I", map(len, self._postings.values()))
+        segments = array("I")
+        for postings in self._postings.values():
+            segments.extend(postings)
+        header = _INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            self.size,
+            self._line_number,
+            len(self._ends),
+            len(self._postings),
+            self.build_time,
+        )
+        return b"".join(
+            (
+                header,
+                self._ends.tobytes(),
+                self._lines.tobytes(),
+                trigrams,
+                counts.tobytes(),
+                segments.tobytes(),
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TrigramIndex":
+        """Restore an index serialized by ``to_bytes()``.
+
+        Args:
+            data (bytes): The serialized index.
+
+        Returns:
+            TrigramIndex: The index.
+
+        Raises:
+            ValueError: If the data is not a serialized index of this
+                version of txmd.
+        """
+        if len(data) < _INDEX_HEADER.size:
+            raise ValueError("Truncated search index")
+        magic, size, line_number, segment_count, trigram_count, build_time = (
+            _INDEX_HEADER.unpack_from(data)
+        )
+        if magic != INDEX_MAGIC:
+            raise ValueError("Not a search index of this version")
+
+        parts = []
+        position = _INDEX_HEADER.size
+        for part_size in (
+            8 * segment_count,
+            8 * segment_count,
+            3 * trigram_count,
+            4 * trigram_count,
+        ):
+            end = position + part_size
+            parts.append(data[position:end])
+            position = end
+        ends, lines, trigrams, counts = parts
+        index = cls()
+        index.size = size
+        index.build_time = build_time
+        index._line_number = line_number
+        index._ends.frombytes(ends)
+        index._lines.frombytes(lines)
+        segment_counts = array("I")
+        segment_counts.frombytes(counts)
+        segments = array("I")
+        segments.frombytes(data[position:])
+        if (
+            len(index._lines) != segment_count
+            or len(segment_counts) != trigram_count
+            or sum(segment_counts) != len(segments)
+        ):
+            raise ValueError("Truncated search index")
+
+        start = 0
+        for number, count in enumerate(segment_counts):
+            key = 3 * number
+            key_end = key + 3
+            end = start + count
+            index._postings[trigrams[key:key_end]] = segments[start:end]
+            start = end
+        return index
+
+
+class SearchResults:
+    """The lines matching a search query, in document order.
+
+    Lines are added while the search runs in the background, and stored
+    in a sorted array so the next or previous match of any line is found
+    by bisection.
+
+    Attributes:
+        query (str): The text searched for.
+        lines (array): The line numbers of the matching lines.
+        complete (bool): True once the whole document has been searched.
+    """
+
+    def __init__(self, query: str):
+        """Initialize the SearchResults.
+
+        Args:
+            query (str): The text searched for.
+        """
+        self.query = query
+        self.lines = array("q")
+        self.complete = False
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def extend(self, lines: List[int]) -> None:
+        """Add lines found further down the document."""
+        self.lines.extend(lines)
+
+    def next_match(self, line_number: int) -> Optional[int]:
+        """Find the first match after a line.
+
+        Args:
+            line_number (int): A line of the document.
+
+        Returns:
+            Optional[int]: The index of the match in ``lines``, or None if
+                no match comes after the line.
+        """
+        index = bisect_right(self.lines, line_number)
+        return index if index < len(self.lines) else None
+
+    def previous_match(self, line_number: int) -> Optional[int]:
+        """Find the last match before a line.
+
+        Args:
+            line_number (int): A line of the document.
+
+        Returns:
+            Optional[int]: The index of the match in ``lines``, or None if
+                no match comes before the line.
+        """
+        index = bisect_left(self.lines, line_number) - 1
+        return index if index >= 0 else None
+
+
+def _prepare_query(query: str) -> Tuple[bytes, bool]:
+    """Encode a query, lowercased unless it contains uppercase letters.
+
+    Returns:
+        Tuple[bytes, bool]: The bytes to look for, and whether the text
+            must be lowercased before searching for them.
+    """
+    needle = query.encode("utf-8", "surrogateescape")
+    fold_case = not any(char.isupper() for char in query)
+    return (needle.lower() if fold_case else needle), fold_case
+
+
+def _find_lines(
+    chunk: bytes, needle: bytes, limit: int, line_number: int
+) -> Tuple[List[int], int]:
+    """Find the lines of a chunk on which a match starts.
+
+    Args:
+        chunk (bytes): The bytes to search, starting at a line start or
+            in the middle of line ``line_number``.
+        needle (bytes): The bytes to look for.
+        limit (int): Only matches starting before this offset count.
+        line_number (int): The line number at the start of the chunk.
+
+    Returns:
+        Tuple[List[int], int]: The matching lines, each only once, and
+            the line number at ``limit``.
+    """
+    lines: List[int] = []
+    counted = 0
+    position = chunk.find(needle)
+    while 0 <= position < limit:
+        line_number += chunk.count(b"\n", counted, position)
+        counted = position
+        lines.append(line_number)
+        # Skip to the next line: one hit per line is enough
+        newline = chunk.find(b"\n", position + len(needle), limit)
+        if newline < 0:
+            break
+        position = chunk.find(needle, newline + 1)
+    return lines, line_number + chunk.count(b"\n", counted, limit)
@@ -0,0 +1,460 @@
+"""Warm server for txmd, and the client that hands commands over to it.
+
+``txmd --server`` imports the viewer, warms it up with a headless run and
+waits on a Unix socket. The ``txmd`` command then connects before
+importing anything heavy and sends its command line, working directory,
+environment and terminal: the standard file descriptors travel over the
+socket (``SCM_RIGHTS``), so the forked server process reads the keyboard
+and draws on the client's terminal directly. The client only forwards
+signals and waits for the exit status.
+
+This module is imported by every invocation of ``txmd``, so only the
+standard library modules needed by the client are imported with it.
+"""
+
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NoReturn, Optional, Set
+
+# Seconds without any client after which the server exits
+SERVER_IDLE_TIMEOUT = 600
+
+# Seconds between two checks of the idle timeout and of finished children
+SERVER_POLL_INTERVAL = 0.5
+
+# Seconds a client has to send its request once connected
+HANDSHAKE_TIMEOUT = 2.0
+
+# Environment variable that makes txmd run in-process even if a server
+# is listening
+NO_SERVER_ENV = "TXMD_NO_SERVER"
+
+# Length prefix of the request, and exit status sent back to the client
+_LENGTH = struct.Struct("!I")
+_STATUS = struct.Struct("!i")
+
+# Reply to a request: the server runs the command, or the client should
+_ACCEPTED = b"+"
+_REFUSED = b"-"
+
+# Signals forwarded by the client, and the byte each one is sent as
+_FORWARDED = {
+    signal.SIGINT: b"I",
+    signal.SIGTERM: b"T",
+}
+if sys.platform != "win32":
+    _FORWARDED[signal.SIGWINCH] = b"W"
+    _FORWARDED[signal.SIGHUP] = b"H"
+
+# Exit status of a command interrupted with Ctrl+C, as shells report it
+_INTERRUPTED = 128 + signal.SIGINT
+
+
+def server_supported() -> bool:
+    """Return whether file descriptors can be passed over Unix sockets."""
+    return hasattr(socket, "AF_UNIX") and hasattr(socket, "send_fds")
+
+
+def server_address() -> Path:
+    """Return the path of the server socket.
+
+    The socket is created in a directory only the user can enter:
+    ``$XDG_RUNTIME_DIR/txmd``, or ``txmd-<uid>`` in the temporary
+    directory if the variable is unset or empty.
+
+    Returns:
+        Path: The path of the socket.
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return Path(runtime) / "txmd" / "server.sock"
+    base = os.environ.get("TMPDIR") or "/tmp"
+    return Path(base) / f"txmd-{os.getuid()}" / "server.sock"
+
+
+def _private_directory(path: Path) -> bool:
+    """Return whether only the current user can use the directory."""
+    try:
+        info = path.lstat()
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(info.st_mode)
+        and info.st_uid == os.getuid()
+        and not info.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+    )
+
+
+def _connect(path: Path) -> Optional[socket.socket]:
+    """Connect to the server listening on path, if there is one."""
+    if not _private_directory(path.parent):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def _receive(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Read exactly size bytes, or return None if the peer goes away."""
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _code_version() -> str:
+    """Identify the txmd code on disk, which client and server must share.
+
+    The package directory and the modification time of its newest module
+    change with every install or upgrade, and with every edit of an
+    editable install; unlike the version number, they are read without
+    importing ``importlib.metadata``.
+    """
+    package = os.path.dirname(os.path.abspath(__file__))
+    newest = max(
+        entry.stat().st_mtime_ns
+        for entry in os.scandir(package)
+        if entry.name.endswith(".py")
+    )
+    return f"{package}:{newest}"
+
+
+def delegate(args: List[str]) -> Optional[int]:
+    """Run a txmd command line in the server, if one is listening.
+
+    The command runs with the client's standard file descriptors, working
+    directory and environment. Signals received by the client (terminal
+    resizes, Ctrl+C while rendering, hangups) are forwarded until the
+    command exits.
+
+    Input piped to the viewer is not delegated: txmd reopens the terminal
+    as ``/dev/tty`` to read the keyboard, which only works in the process
+    that owns the terminal.
+
+    Args:
+        args (List[str]): The command line arguments, without the program
+            name.
+
+    Returns:
+        Optional[int]: The exit status of the command, or None if it was
+            not handed over and should run in this process.
+    """
+    if not server_supported() or os.environ.get(NO_SERVER_ENV):
+        return None
+    if not sys.stdin.isatty() and sys.stdout.isatty():
+        return None
+
+    client = _connect(server_address())
+    if client is None:
+        return None
+    with client:
+        request = json.dumps(
+            {
+                "version": _code_version(),
+                "argv": args,
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+            }
+        ).encode()
+        try:
+            socket.send_fds(client, [_LENGTH.pack(len(request))], [0, 1, 2])
+            client.sendall(request)
+            if client.recv(1) != _ACCEPTED:
+                return None
+        except OSError:
+            return None
+
+        def forward(signum: int, frame: object) -> None:
+            try:
+                client.send(_FORWARDED[signum])
+            except OSError:
+                pass
+
+        previous = {
+            signum: signal.signal(signum, forward) for signum in _FORWARDED
+        }
+        try:
+            status = _receive(client, _STATUS.size)
+        except OSError:
+            status = None
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+    return 1 if status is None else _STATUS.unpack(status)[0]
+
+
+def _warm_up() -> None:
+    """Import the viewer and run it once without a terminal.
+
+    This loads the modules used by the command line, the viewer and the
+    parsers, and lets Textual and Rich fill their caches, so the forked
+    processes start with all of it done.
+    """
+    import txmd.cli  # noqa: F401
+    from txmd.app import MarkdownViewerApp
+
+    async def leave(pilot: object) -> None:
+        pilot.app.exit()  # type: ignore[attr-defined]
+
+    app = MarkdownViewerApp("# txmd\n\nWarming up *the* `viewer`.\n")
+    app.run(headless=True, auto_pilot=leave)
+
+
+def _listen(path: Path) -> Optional[socket.socket]:
+    """Bind the server socket, or return None if a server answers there.
+
+    Raises:
+        OSError: If the socket directory is not private to the user.
+    """
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not _private_directory(path.parent):
+        raise OSError(f"{path.parent} is not private to the current user")
+    running = _connect(path)
+    if running is not None:
+        running.close()
+        return None
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen()
+    return listener
+
+
+def _reopen_stdio() -> None:
+    """Rebuild the standard streams on the descriptors of a client."""
+    sys.stdin = sys.__stdin__ = open(0, "r", closefd=False)
+    # Line buffered on a terminal, as Python sets them up at startup
+    sys.stdout = sys.__stdout__ = open(
+        1, "w", buffering=1 if os.isatty(1) else -1, closefd=False
+    )
+    sys.stderr = sys.__stderr__ = open(
+        2, "w", buffering=1, errors="backslashreplace", closefd=False
+    )
+
+
+def _raise_signals(conn: socket.socket) -> None:
+    """Raise the signals forwarded by a client in this process."""
+    signals = {byte: signum for signum, byte in _FORWARDED.items()}
+    while True:
+        try:
+            data = conn.recv(64)
+        except OSError:
+            data = b""
+        if not data:
+            # The client is gone, and so is whoever was reading the output
+            os.kill(os.getpid(), signal.SIGHUP)
+            return
+        for byte in data:
+            signum = signals.get(bytes([byte]))
+            if signum is not None:
+                os.kill(os.getpid(), signum)
+
+
+def _run_request(
+    conn: socket.socket, request: Dict, fds: List[int]
+) -> NoReturn:
+    """Run the command of a client in a forked process, then exit."""
+    import threading
+    import traceback
+
+    code = 1
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for target, fd in enumerate(fds):
+            if fd != target:
+                os.dup2(fd, target)
+                os.close(fd)
+        _reopen_stdio()
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.argv = ["txmd", *request["argv"]]
+        threading.Thread(
+            target=_raise_signals, args=(conn,), daemon=True
+        ).start()
+
+        from txmd.cli import app
+
+        try:
+            app(args=request["argv"], prog_name="txmd")
+            code = 0
+        except SystemExit as exit:
+            if exit.code is None or isinstance(exit.code, int):
+                code = exit.code or 0
+            else:
+                print(exit.code, file=sys.stderr)
+    except KeyboardInterrupt:
+        code = _INTERRUPTED
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        try:
+            conn.sendall(_STATUS.pack(code))
+        except OSError:
+            pass
+        os._exit(0)
+
+
+def _accept(conn: socket.socket, listener: socket.socket) -> Optional[int]:
+    """Read the request of a client and fork a process to run it.
+
+    Args:
+        conn (socket.socket): The connection of the client.
+        listener (socket.socket): The listening socket of the server.
+            The child closes it, or clients could still connect (and
+            wait forever) while a viewer outlives the server.
+
+    Returns:
+        Optional[int]: The process id of the child, or None if the
+            request was refused.
+
+    Raises:
+        ValueError: If the client runs other txmd code, which means this
+            server is out of date.
+    """
+    fds: List[int] = []
+    try:
+        conn.settimeout(HANDSHAKE_TIMEOUT)
+        header, fds, _, _ = socket.recv_fds(conn, _LENGTH.size, 3)
+        size = _LENGTH.unpack(header)[0] if len(header) == 4 else 0
+        payload = _receive(conn, size) if len(fds) == 3 else None
+        if payload is None:
+            return None
+        request = json.loads(payload)
+        if request.get("version") != _code_version():
+            conn.sendall(_REFUSED)
+            raise ValueError("txmd was upgraded")
+        conn.sendall(_ACCEPTED)
+        conn.settimeout(None)
+        pid = os.fork()
+        if pid == 0:
+            listener.close()
+            _run_request(conn, request, fds)
+        return pid
+    except (OSError, json.JSONDecodeError, KeyError):
+        return None
+    finally:
+        for fd in fds:
+            os.close(fd)
+        conn.close()
+
+
+def _detach() -> bool:
+    """Move the server to the background, like a daemon.
+
+    Returns:
+        bool: True in the background process, False in the original one,
+            which should return.
+    """
+    if os.fork():
+        return False
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    return True
+
+
+def _reap(children: Set[int]) -> bool:
+    """Collect the children that exited, and return whether any did."""
+    reaped = False
+    for pid in list(children):
+        try:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            done = pid
+        if done:
+            children.discard(pid)
+            reaped = True
+    return reaped
+
+
+def serve(
+    idle_timeout: float = SERVER_IDLE_TIMEOUT, detach: bool = True
+) -> None:
+    """Start a warm txmd server, unless one is already running.
+
+    The viewer is imported and warmed up first, then the server listens
+    on ``server_address()``. With ``detach``, it continues in the
+    background and this function returns once it accepts clients.
+
+    Each client is served by a forked copy of the warm process. The
+    server exits once it has had no client for ``idle_timeout`` seconds,
+    when a client runs other txmd code (after an upgrade), or on SIGTERM.
+
+    Args:
+        idle_timeout (float): Seconds without any running command after
+            which the server exits.
+        detach (bool): Run in the background rather than in this process.
+
+    Raises:
+        OSError: If Unix sockets cannot pass file descriptors here, or if
+            the socket cannot be created.
+    """
+    if not server_supported():
+        raise OSError("the server needs Unix sockets")
+    path = server_address()
+    _warm_up()
+    listener = _listen(path)
+    if listener is None:
+        print(f"txmd server already running on {path}")
+        return
+    if detach:
+        if not _detach():
+            listener.close()
+            print(f"txmd server listening on {path}")
+            return
+    inode = path.stat().st_ino
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    listener.settimeout(SERVER_POLL_INTERVAL)
+    children: Set[int] = set()
+    idle_since = time.monotonic()
+    try:
+        while True:
+            if _reap(children) and not children:
+                idle_since = time.monotonic()
+            if not children and time.monotonic() - idle_since > idle_timeout:
+                break
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            try:
+                pid = _accept(conn, listener)
+            except ValueError:
+                break
+            if pid is not None:
+                children.add(pid)
+    finally:
+        listener.close()
+        try:
+            if path.stat().st_ino == inode:
+                path.unlink()
+        except OSError:
+            pass
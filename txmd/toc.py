@@ -1,8 +1,35 @@
 """Table of Contents parsing and tree building for txmd."""
 
 import re
+from array import array
+from bisect import bisect_right
 from dataclasses import dataclass, field
-from typing import List, Tuple
+from itertools import chain
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    Match,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+from txmd.blocks import (
+    CLOSING_FENCE_PATTERNS,
+    FENCE_PATTERN,
+    HEADING_PATTERN,
+    HTML_BLOCK_ENDS,
+    HTML_BLOCK_PATTERN,
+    LINE_INDENT,
+    LIST_ITEM_PATTERN,
+    SETEXT_UNDERLINE_PATTERN,
+    after_indent,
+    heading_title,
+    setext_title,
+)
 
 
 @dataclass
@@ -22,11 +49,61 @@ class HeaderNode:
     children: List["HeaderNode"] = field(default_factory=list)
 
 
+# Body of the pattern matching the lines the header scanner cares about,
+# with the line patterns of txmd.blocks: ATX headers, opening code fences,
+# setext underlines and the first lines of HTML blocks. The indentation
+# is only matched once.
+_SCAN_LINE = (
+    LINE_INDENT
+    + "(?:"
+    + after_indent(HEADING_PATTERN)
+    + r"(?P<text>[^\n]*)|"
+    + after_indent(FENCE_PATTERN)
+    + "|"
+    + after_indent(SETEXT_UNDERLINE_PATTERN)
+    + "|"
+    + after_indent(HTML_BLOCK_PATTERN)
+    + ")"
+)
+
+# Matched at the start of the buffer, and after every newline elsewhere.
+# Anchoring on a literal newline instead of ^ with re.MULTILINE lets the
+# regex engine skip uninteresting text much faster.
+_SCAN_FIRST_LINE = re.compile(_SCAN_LINE)
+_SCAN_NEXT_LINE = re.compile(r"\n" + _SCAN_LINE)
+
+# Closing fences of fenced code blocks, by fence character
+_CLOSING_FENCES = {
+    char: re.compile(r"\n" + pattern.pattern)
+    for char, pattern in CLOSING_FENCE_PATTERNS.items()
+}
+
+# End of an HTML block that has no end marker: a blank line
+_BLANK_LINE = re.compile(r"\n[ \t\r]*\n")
+
+# Leading blank lines of a stretch of text
+_BLANK_LINES = re.compile(r"(?:[ \t\r]*\n)*")
+
+# The last blank line of a stretch of text that is followed by a line
+# starting in the first column: that line starts a new block
+_LAST_BLOCK_AFTER_BLANK = re.compile(r"(?s:.*)\n[ \t\r]*\n(?=\S)")
+
+
 def parse_markdown_headers(content: str) -> List[Tuple[int, str, int]]:
     """Parse markdown content and extract all headers.
 
-    This function finds ATX-style headers (# through ######) in markdown
-    content and returns their information. It skips headers inside code blocks.
+    This function finds ATX-style headers (# through ######) and setext
+    headers (text underlined with === or ---) in markdown content and
+    returns their information. It finds the headers of a ``Document``
+    (the headings of ``split_blocks()``): code blocks and HTML blocks are
+    opaque, and an indented heading or a setext underline within a list
+    is list text.
+
+    The buffer is scanned once by a compiled pattern that only stops on
+    header lines, code fences, setext underlines and HTML block lines;
+    fenced code and HTML blocks are skipped by searching for their end,
+    and no list of lines is built. Whether a line is in a list is only
+    worked out for the few lines it matters to.
 
     Args:
         content (str): The markdown content to parse
@@ -43,52 +120,272 @@ def parse_markdown_headers(content: str) -> List[Tuple[int, str, int]]:
         [(1, 'Title', 1), (2, 'Subtitle', 2)]
     """
     headers = []
-    lines = content.split("\n")
+    append = headers.append
+    count = content.count
+    lists = _ListContext(content)
+
+    # Line number of the last counted position, counted lazily for headers
+    line_num = 1
+    counted = 0
+    # Position of the newline that ends the last header, fence, underline
+    # or HTML block; text between it and the next match is paragraph text
+    floor = -1
+
+    first = _SCAN_FIRST_LINE.match(content)
+    matches: Optional[Iterable[Match[str]]] = _SCAN_NEXT_LINE.finditer(
+        content, first.end() if first else 0
+    )
+    if first:
+        matches = chain((first,), matches)
+
+    while matches is not None:
+        # Where the scan resumes after a fenced code or HTML block
+        resume = None
+        for match in matches:
+            start = match.start() + (match.re is _SCAN_NEXT_LINE)
+            hashes, marker, underline = match.group(
+                "hashes", "fence", "underline"
+            )
+
+            if hashes is not None:
+                if content[start] == " " and lists.in_list(start):
+                    continue
+                text = heading_title(match.group("text"))
+                if text:
+                    line_num += count("\n", counted, start)
+                    counted = start
+                    append((len(hashes), text, line_num))
+                floor = match.end()
+                lists.restart(floor + 1)
+
+            elif marker is not None:
+                closing = _CLOSING_FENCES[marker[0]]
+                resume = match.end()
+                while True:
+                    fence = closing.search(content, resume)
+                    if fence is None:
+                        resume = len(content)
+                        break
+                    resume = fence.end()
+                    if len(fence.group(1)) >= len(marker):
+                        break
+                lists.skip(match.end(), resume + 1)
+                floor = resume
+                break
+
+            elif underline is not None:
+                header = _setext_header(content, start, floor)
+                floor = match.end()
+                if header is not None and not lists.in_list(start):
+                    line_num += count("\n", counted, start)
+                    counted = start
+                    text, line_count = header
+                    level = 1 if underline[0] == "=" else 2
+                    append((level, text, line_num - line_count))
+                    lists.restart(floor + 1)
+
+            else:
+                kind = match.lastgroup
+                if (content[start] == " " and lists.in_list(start)) or (
+                    kind == "tag" and _paragraph_above(content, start, floor)
+                ):
+                    # Not an HTML block: list text, or a lone tag, which
+                    # cannot interrupt a paragraph
+                    continue
+                block_end = HTML_BLOCK_ENDS.get(kind or "")
+                if block_end is not None:
+                    found = block_end.search(content, match.end())
+                    resume = (
+                        _line_end(content, found.end())
+                        if found
+                        else len(content)
+                    )
+                else:
+                    found = _BLANK_LINE.search(content, match.end())
+                    resume = found.start() if found else len(content)
+                lists.skip(match.end(), resume + 1)
+                floor = resume
+                break
+
+        matches = None
+        if resume is not None:
+            matches = _SCAN_NEXT_LINE.finditer(content, resume)
 
-    # Regex for ATX-style headers: # Header
-    # Matches 1-6 # symbols followed by text
-    header_pattern = re.compile(r"^(#{1,6})\s+(.+?)(?:\s*#*)?$")
+    return headers
 
-    # Regex for code fence (``` or ~~~)
-    code_fence_pattern = re.compile(r"^```|^~~~")
 
-    in_code_block = False
+def _setext_header(
+    content: str, start: int, floor: int
+) -> Optional[Tuple[str, int]]:
+    """Collect the paragraph underlined by a setext underline.
 
-    for line_num, line in enumerate(lines, start=1):
-        stripped = line.strip()
+    Args:
+        content (str): The markdown content.
+        start (int): Position of the start of the underline.
+        floor (int): Position of the newline ending the last header,
+            fence, underline or HTML block; the paragraph cannot extend
+            above it.
 
-        # Check for code fence toggle
-        if code_fence_pattern.match(stripped):
-            in_code_block = not in_code_block
-            continue
+    Returns:
+        Optional[Tuple[str, int]]: The header text and the number of
+            lines it spans, or None if the underline does not follow a
+            paragraph (e.g. it is a thematic break).
+    """
+    lines = []
+    end = start - 1
+    while end > floor:
+        line_start = content.rfind("\n", max(floor, 0), end) + 1
+        line = content[line_start:end]
+        if not line.strip():
+            break
+        lines.append(line)
+        end = line_start - 1
+
+    lines.reverse()
+    title = setext_title(lines)
+    if title is None:
+        return None
+    return title, len(lines)
+
+
+def _paragraph_above(content: str, start: int, floor: int) -> bool:
+    """Tell whether the line above a line is paragraph text.
 
-        # Skip lines inside code blocks
-        if in_code_block:
-            continue
+    Args:
+        content (str): The markdown content.
+        start (int): Position of the start of the line.
+        floor (int): Position of the newline ending the last header,
+            fence, underline or HTML block.
 
-        # Skip indented code blocks (4 spaces or tab)
-        if line.startswith("    ") or line.startswith("\t"):
-            continue
+    Returns:
+        bool: True if the line above is neither blank nor markup.
+    """
+    if start - 1 <= floor:
+        return False
+    line_start = content.rfind("\n", 0, start - 1) + 1
+    return bool(content[line_start : start - 1].strip())
 
-        # Check for header
-        match = header_pattern.match(stripped)
-        if match:
-            level = len(match.group(1))  # Count the # symbols
-            text = match.group(2).strip()
-            headers.append((level, text, line_num))
 
-    return headers
+class _ListContext:
+    """Tell whether lines of a document are in a list, as blocks do.
 
+    ``BlockSplitter`` keeps a block that starts with a list item together
+    across blank lines while the next line is indented or another item.
+    A block starts at the first line of the document, on the line after a
+    heading, and on a line that follows a blank line in the first column;
+    lines of fenced code and HTML blocks are skipped. The blocks since the
+    last question are only worked out when asked, which is rare.
+    """
 
-def build_toc_tree(headers: List[Tuple[int, str, int]]) -> List[HeaderNode]:
+    def __init__(self, content: str) -> None:
+        """Initialize the context at the start of a document.
+
+        Args:
+            content (str): The markdown content.
+        """
+        self._content = content
+        self._position = 0
+        self._restart = 0
+        self._after_heading = True
+        self._in_list = False
+        self._skipped: List[Tuple[int, int]] = []
+
+    def restart(self, position: int) -> None:
+        """Start over after a heading, which ends any list.
+
+        Args:
+            position (int): Position of the line after the heading.
+        """
+        self._restart = position
+        if self._skipped:
+            self._skipped = []
+
+    def skip(self, start: int, end: int) -> None:
+        """Leave out the lines of a fenced code or HTML block.
+
+        Args:
+            start (int): Position of the end of the block's opening marker,
+                in its first line.
+            end (int): Position of the line after the block's last.
+        """
+        self._skipped.append((start, end))
+
+    def in_list(self, start: int) -> bool:
+        """Tell whether the lines above a line are in a list.
+
+        Args:
+            start (int): Position of the start of the line, after every
+                position given so far.
+
+        Returns:
+            bool: True if the block of the line above started with a list
+                item.
+        """
+        content = self._content
+        if self._restart > self._position:
+            self._position = self._restart
+            self._after_heading = True
+            self._in_list = False
+        stretches = []
+        position = self._position
+        for skip_start, skip_end in self._skipped:
+            stretches.append((position, skip_start))
+            position = skip_end
+        stretches.append((position, start))
+
+        for stretch_start, stretch_end in stretches:
+            if self._after_heading:
+                blanks = _BLANK_LINES.match(
+                    content, stretch_start, stretch_end
+                )
+                if blanks is not None and blanks.end() < stretch_end:
+                    self._after_heading = False
+                    self._in_list = _is_list_item(content, blanks.end())
+            last = _LAST_BLOCK_AFTER_BLANK.match(
+                content, max(0, stretch_start - 1), stretch_end
+            )
+            if last is not None:
+                self._in_list = _is_list_item(content, last.end())
+
+        self._position = start
+        self._skipped = []
+        return self._in_list
+
+
+def _line_end(content: str, position: int) -> int:
+    """Return the position of the newline ending the line at position.
+
+    Args:
+        content (str): The markdown content.
+        position (int): A position in the line.
+
+    Returns:
+        int: The position of the newline, or the length of content if
+            the line is the last one.
+    """
+    end = content.find("\n", position)
+    return len(content) if end == -1 else end
+
+
+def _is_list_item(content: str, start: int) -> bool:
+    """Tell whether the line starting at start is a list item."""
+    line = content[start : _line_end(content, start) + 1]
+    return LIST_ITEM_PATTERN.match(line) is not None
+
+
+def build_toc_tree(
+    headers: Union["HeaderIndex", Iterable[Tuple[int, str, int]]],
+) -> List[HeaderNode]:
     """Build a hierarchical tree structure from flat header list.
 
     This function takes a flat list of headers and constructs a tree
     structure based on header levels, suitable for display in a Tree widget.
+    It is a view of ``HeaderIndex.to_tree()``, kept for callers that want
+    node objects; the viewer itself walks the ``HeaderIndex`` directly.
 
     Args:
-        headers (List[Tuple[int, str, int]]): List of header tuples from
-            parse_markdown_headers()
+        headers (Union[HeaderIndex, Iterable[Tuple[int, str, int]]]): The
+            headers, e.g. from parse_markdown_headers() or a document
 
     Returns:
         List[HeaderNode]: List of root-level HeaderNode objects, each
@@ -102,27 +399,197 @@ def build_toc_tree(headers: List[Tuple[int, str, int]]) -> List[HeaderNode]:
         >>> len(tree[0].children)
         2
     """
-    if not headers:
-        return []
+    if not isinstance(headers, HeaderIndex):
+        headers = HeaderIndex(headers)
+    return headers.to_tree()
 
-    root_nodes = []
-    stack = []  # Stack to track current path in tree
 
-    for level, text, line_num in headers:
-        node = HeaderNode(level, text, line_num)
+class HeaderIndex(Sequence[Tuple[int, str, int]]):
+    """Flat, array-backed table of contents.
 
-        # Pop stack until we find a valid parent (level < current level)
-        while stack and stack[-1].level >= level:
-            stack.pop()
+    Headers are stored in parallel arrays rather than as one object per
+    header: the level, the line number and the parent of every header, and
+    the offset of its title in a single UTF-8 encoded buffer. A header
+    costs about 30 bytes, against ~170 for a ``(level, text, line)`` tuple
+    and ~450 once a ``HeaderNode`` tree is built from the tuples, which
+    matters for generated documents with millions of headings. Headers
+    are identified by their position, and -1 stands for the (virtual)
+    root.
 
-        if stack:
-            # Add as child to the parent on top of stack
-            stack[-1].children.append(node)
-        else:
-            # This is a root-level node
-            root_nodes.append(node)
+    The parent of a header is the closest preceding header of a lower
+    level, as in ``build_toc_tree()``. Indexing still returns
+    ``(level, text, line_number)`` tuples, so the index can be used like
+    the list returned by ``parse_markdown_headers()``.
 
-        # Push current node onto stack
-        stack.append(node)
+    Example:
+        >>> headers = HeaderIndex([(1, "Title", 1), (2, "Section", 3)])
+        >>> list(headers.children())
+        [0]
+        >>> headers.parent(1), headers.find(4)
+        (0, 1)
+    """
 
-    return root_nodes
+    def __init__(self, headers: Iterable[Tuple[int, str, int]] = ()):
+        """Initialize the HeaderIndex.
+
+        Args:
+            headers (Iterable[Tuple[int, str, int]]): Initial headers, as
+                ``(level, text, line_number)`` tuples in document order.
+        """
+        self._levels = array("b")
+        self._lines = array("i")
+        self._parents = array("i")
+        self._text_ends = array("q")
+        self._text = bytearray()
+        for level, text, line_number in headers:
+            self.append(level, text, line_number)
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+    @overload
+    def __getitem__(self, index: int) -> Tuple[int, str, int]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Tuple[int, str, int]]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("header index out of range")
+        return self._levels[index], self.text(index), self._lines[index]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (HeaderIndex, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            mine == theirs for mine, theirs in zip(self, other)
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"HeaderIndex({list(self)!r})"
+
+    def append(self, level: int, text: str, line_number: int) -> int:
+        """Add a header after the existing ones.
+
+        Args:
+            level (int): Header level, 1-6.
+            text (str): The header text.
+            line_number (int): Line of the header in the document.
+
+        Returns:
+            int: The id of the new header.
+        """
+        # The parent is the closest preceding header of a lower level,
+        # which is always on the ancestor chain of the last header
+        parent = len(self) - 1
+        while parent >= 0 and self._levels[parent] >= level:
+            parent = self._parents[parent]
+
+        self._levels.append(level)
+        self._lines.append(line_number)
+        self._parents.append(parent)
+        self._text += text.encode("utf-8", "surrogatepass")
+        self._text_ends.append(len(self._text))
+        return len(self) - 1
+
+    def truncate(self, count: int) -> None:
+        """Remove all headers after the first ``count`` ones."""
+        if count >= len(self):
+            return
+        del self._levels[count:]
+        del self._lines[count:]
+        del self._parents[count:]
+        del self._text_ends[count:]
+        text_end = self._text_ends[-1] if count else 0
+        del self._text[text_end:]
+
+    def level(self, index: int) -> int:
+        """Return the level of a header."""
+        return self._levels[index]
+
+    def text(self, index: int) -> str:
+        """Return the text of a header."""
+        start = self._text_ends[index - 1] if index else 0
+        end = self._text_ends[index]
+        return self._text[start:end].decode("utf-8", "surrogatepass")
+
+    def line_number(self, index: int) -> int:
+        """Return the line of a header in the document."""
+        return self._lines[index]
+
+    def parent(self, index: int) -> int:
+        """Return the id of the parent of a header, or -1 for the root."""
+        return self._parents[index]
+
+    def children(self, parent: int = -1) -> Iterator[int]:
+        """Iterate over the ids of the direct children of a header.
+
+        Only the headers of the parent's subtree are scanned: it ends at
+        the next header whose level is not greater than the parent's.
+
+        Args:
+            parent (int): Id of the parent header, or -1 for the
+                top-level headers.
+
+        Yields:
+            int: The ids of the children, in document order.
+        """
+        levels = self._levels
+        parents = self._parents
+        level = levels[parent] if parent >= 0 else 0
+        for index in range(parent + 1, len(levels)):
+            if levels[index] <= level:
+                break
+            if parents[index] == parent:
+                yield index
+
+    def has_children(self, index: int) -> bool:
+        """Return True if a header has nested headers."""
+        following = index + 1
+        return (
+            following < len(self._parents)
+            and self._parents[following] == index
+        )
+
+    def ancestors(self, index: int) -> List[int]:
+        """Return the ids of the ancestors of a header, outermost first."""
+        ancestors = []
+        parent = self._parents[index]
+        while parent >= 0:
+            ancestors.append(parent)
+            parent = self._parents[parent]
+        ancestors.reverse()
+        return ancestors
+
+    def find(self, line_number: int) -> int:
+        """Return the last header at or before a line.
+
+        Headers are appended in document order, so their lines are sorted
+        and the search is a bisection.
+
+        Args:
+            line_number (int): A line of the document.
+
+        Returns:
+            int: The id of the header, or -1 if the line comes before the
+                first header.
+        """
+        return bisect_right(self._lines, line_number) - 1
+
+    def to_tree(self) -> List[HeaderNode]:
+        """Build ``HeaderNode`` objects for all the headers.
+
+        Returns:
+            List[HeaderNode]: The top-level nodes, with their children.
+        """
+        nodes = [HeaderNode(*header) for header in self]
+        roots = []
+        for node, parent in zip(nodes, self._parents):
+            (roots if parent < 0 else nodes[parent].children).append(node)
+        return roots
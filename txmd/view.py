@@ -0,0 +1,549 @@
+"""Virtualized Markdown document view for txmd."""
+
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate, chain
+from typing import Iterable, List, Optional, Tuple
+
+from rich.markdown import Markdown as RichMarkdown
+from textual.geometry import Region, Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from txmd.blocks import Block
+from txmd.document import Buffer, Document
+
+
+def estimate_block_height(span: int, level: int = 0) -> int:
+    """Cheaply estimate the rendered height of a markdown block.
+
+    The estimate is only used until the block is rendered for the first
+    time, at which point its real height replaces it. It only needs the
+    block's metadata, so blocks that were never drawn are never decoded.
+
+    Args:
+        span (int): Number of source lines of the block, not counting
+            trailing blank lines.
+        level (int): Heading level of the block, 0 if it is not a heading.
+
+    Returns:
+        int: Estimated number of terminal rows, including the blank row
+            that separates the block from the next one.
+    """
+    if not span:
+        return 0
+    height = span + 1
+    if level == 1:
+        # Level-1 headers are drawn inside a panel
+        height += 2
+    return height
+
+
+class DocumentView(ScrollView, can_focus=True, inherit_bindings=False):
+    """A scrollable markdown view that only renders what is on screen.
+
+    The view draws the top-level blocks of a parsed ``Document``. Every
+    block gets a cheap height estimate, and only the blocks intersecting
+    the viewport (plus a few blocks of overscan) are rendered with Rich.
+    Rendered blocks are kept in a small LRU cache, so memory and render
+    time depend on the terminal height rather than on the size of the
+    document.
+
+    The view has no key bindings of its own: scrolling is driven by the
+    app's (non-animated) actions, as animations would target positions
+    computed from height estimates.
+
+    Attributes:
+        document (Document): The document being displayed.
+        overscan (int): Number of blocks rendered above and below the
+            viewport, so short scrolls never hit an unrendered block.
+        cache_size (int): Maximum number of rendered blocks kept in memory.
+    """
+
+    DEFAULT_CSS = """
+    DocumentView {
+        background: $surface;
+        color: $text;
+    }
+    """
+
+    def __init__(
+        self,
+        document: Optional[Document] = None,
+        *,
+        overscan: int = 2,
+        cache_size: int = 256,
+        name: Optional[str] = None,
+        id: Optional[str] = None,
+        classes: Optional[str] = None,
+    ):
+        """Initialize the DocumentView.
+
+        Args:
+            document (Optional[Document]): The parsed document to display.
+                Defaults to an empty document.
+            overscan (int): Blocks to render beyond each edge of the viewport.
+            cache_size (int): Maximum number of rendered blocks to keep.
+            name (Optional[str]): The name of the widget.
+            id (Optional[str]): The ID of the widget in the DOM.
+            classes (Optional[str]): The CSS classes of the widget.
+        """
+        super().__init__(name=name, id=id, classes=classes)
+        self.overscan = overscan
+        self.cache_size = cache_size
+        self.document = document if document is not None else Document()
+        self._heights = array("l")
+        self._offsets = array("q", [0])
+        self._offsets_dirty = False
+        self._rendered: "OrderedDict[int, List[Strip]]" = OrderedDict()
+        self._render_width = 0
+        self._add_heights()
+
+    @property
+    def block_count(self) -> int:
+        """int: Number of blocks in the document."""
+        return len(self.document)
+
+    @property
+    def rendered_count(self) -> int:
+        """int: Number of blocks currently held in the render cache."""
+        return len(self._rendered)
+
+    @property
+    def viewport_block_count(self) -> int:
+        """int: Number of blocks rendered to draw the viewport: the blocks
+        it shows, plus the overscan above and below."""
+        if not self.block_count:
+            return 0
+        top = round(self.scroll_y)
+        first = self.block_at(top)
+        last = self.block_at(top + max(1, self.size.height) - 1)
+        return last - first + 1 + 2 * self.overscan
+
+    def append(self, text: str) -> None:
+        """Append markdown text to the end of the document.
+
+        Args:
+            text (str): Markdown source made of complete blocks.
+        """
+        self.document.append(text)
+        self._add_heights()
+
+    def extend(self, blocks: Iterable[Block]) -> None:
+        """Append already parsed blocks to the end of the document.
+
+        Args:
+            blocks (Iterable[Block]): Blocks whose line numbers continue
+                the document.
+        """
+        self.document.extend(blocks)
+        self._add_heights()
+
+    def add_scanned_blocks(self, blocks: List[Block]) -> None:
+        """Add blocks scanned from the document's buffer in the background.
+
+        Args:
+            blocks (List[Block]): The next blocks of the document, see
+                ``Document.add_scanned_blocks()``.
+        """
+        self.document.add_scanned_blocks(blocks)
+        self._add_heights()
+
+    def shrink_cache(self, cache_size: int) -> None:
+        """Keep fewer rendered blocks, dropping the least recently used.
+
+        Dropped blocks keep their measured height and are rendered again
+        from the source when they are next drawn.
+
+        Args:
+            cache_size (int): The new maximum number of rendered blocks.
+        """
+        self.cache_size = cache_size
+        while len(self._rendered) > cache_size:
+            self._rendered.popitem(last=False)
+
+    def set_document(self, document: Document) -> None:
+        """Display another document, e.g. after the file was rewritten.
+
+        Args:
+            document (Document): The parsed document to display.
+        """
+        self.document = document
+        self._heights = array("l")
+        self._rendered.clear()
+        self._offsets_dirty = True
+        self._add_heights()
+        self._update_virtual_size()
+        self.refresh()
+
+    def update_document(
+        self, document: Document, runs: List[Tuple[int, int, int]]
+    ) -> None:
+        """Display a new version of the document, reusing unchanged blocks.
+
+        Blocks that are identical in both versions keep their rendered
+        lines and measured heights, so only edited blocks are rendered
+        again. The block at the top of the viewport stays in place, unless
+        it was itself edited, in which case its replacement is shown there.
+
+        Args:
+            document (Document): The new version of the document.
+            runs (List[Tuple[int, int, int]]): ``(old index, new index,
+                count)`` runs of identical blocks, from ``match_blocks()``.
+        """
+        top = round(self.scroll_y)
+        anchor = self.block_at(top) if self.block_count else 0
+        anchor_row = top - self._get_offsets()[anchor]
+
+        heights = array(
+            "l",
+            (
+                estimate_block_height(
+                    document.block_span(i), document.block_level(i)
+                )
+                for i in range(len(document))
+            ),
+        )
+        new_anchor = None
+        old_end = new_end = 0
+        for old_start, new_start, count in runs:
+            old_stop = old_start + count
+            new_stop = new_start + count
+            heights[new_start:new_stop] = self._heights[old_start:old_stop]
+            if new_anchor is None and anchor < old_stop:
+                if anchor >= old_start:
+                    new_anchor = new_start + anchor - old_start
+                else:
+                    # The anchor was edited: show what replaced it
+                    new_anchor = min(
+                        new_end + anchor - old_end,
+                        max(new_end, new_start - 1),
+                    )
+                    anchor_row = 0
+            old_end = old_stop
+            new_end = new_stop
+        if new_anchor is None:
+            new_anchor = new_end + anchor - old_end
+            anchor_row = 0
+
+        # Keep the rendered lines of unchanged blocks, in LRU order
+        starts = [run[0] for run in runs]
+        rendered: "OrderedDict[int, List[Strip]]" = OrderedDict()
+        for index, strips in self._rendered.items():
+            position = bisect_right(starts, index) - 1
+            if position < 0:
+                continue
+            old_start, new_start, count = runs[position]
+            if index < old_start + count:
+                rendered[new_start + index - old_start] = strips
+
+        self.document = document
+        self._heights = heights
+        self._rendered = rendered
+        self._offsets_dirty = True
+        self._update_virtual_size()
+        if self.block_count:
+            new_anchor = max(0, min(new_anchor, self.block_count - 1))
+            self.scroll_to(
+                y=self._get_offsets()[new_anchor] + anchor_row, animate=False
+            )
+        self.refresh()
+
+    def replace_tail(
+        self, data: Buffer, first: int, blocks: List[Block]
+    ) -> List[Tuple[int, str, int]]:
+        """Replace the last blocks of the document with re-parsed ones.
+
+        Rendered blocks and measured heights before ``first`` are kept.
+
+        Args:
+            data (Buffer): The new buffer holding all of the content.
+            first (int): The index of the first block to replace, as
+                returned by ``Document.scan_tail()``.
+            blocks (List[Block]): The blocks replacing the old ones.
+
+        Returns:
+            List[Tuple[int, str, int]]: The headers of the removed blocks.
+        """
+        removed = self.document.replace_tail(data, first, blocks)
+        del self._heights[first:]
+        for index in [i for i in self._rendered if i >= first]:
+            del self._rendered[index]
+        self._offsets_dirty = True
+        self._add_heights()
+        self._update_virtual_size()
+        self.refresh()
+        return removed
+
+    def block_offset(self, index: int) -> int:
+        """Get the y-offset of a block in the virtual (scrollable) space.
+
+        Args:
+            index (int): The index of the block.
+
+        Returns:
+            int: The row at which the block starts.
+        """
+        return self._get_offsets()[index]
+
+    def block_for_line(self, line_number: int) -> int:
+        """Find the block containing a source line.
+
+        Args:
+            line_number (int): Line number in the markdown source
+                (1-indexed).
+
+        Returns:
+            int: The index of the block the line belongs to.
+        """
+        return self.document.block_for_line(line_number)
+
+    def offset_for_line(self, line_number: int) -> int:
+        """Map a source line to its y-offset in the virtual space.
+
+        The containing block is found by bisecting the sorted block start
+        lines, and rendered so its height is exact. Since every row of the
+        view is laid out from the same offsets, scrolling to the returned
+        value shows the block's first row at the top of the viewport, no
+        matter how tall the blocks above it render. Lines inside a block
+        are placed proportionally within the block's rendered height.
+
+        Args:
+            line_number (int): Line number in the markdown source
+                (1-indexed).
+
+        Returns:
+            int: The row of the virtual space where the line is drawn.
+        """
+        if not self.block_count:
+            return 0
+        index = self.block_for_line(line_number)
+        if self._measure(index):
+            self._offsets_dirty = True
+            self._update_virtual_size()
+
+        offset = self._get_offsets()[index]
+        line_offset = line_number - self.document.block_line(index)
+        if line_offset <= 0:
+            return offset
+        source_lines = max(1, self.document.block_span(index))
+        height = self._heights[index]
+        return offset + min(height - 1, height * line_offset // source_lines)
+
+    def line_at(self, y: int) -> int:
+        """Map a row of the virtual space back to a source line.
+
+        This is the inverse of ``offset_for_line()``: lines inside a block
+        are assumed to be spread proportionally over its height.
+
+        Args:
+            y (int): A row in the virtual space.
+
+        Returns:
+            int: The line number (1-indexed) drawn at that row.
+        """
+        if not self.block_count:
+            return 1
+        index = self.block_at(y)
+        row = max(0, y - self._get_offsets()[index])
+        source_lines = max(1, self.document.block_span(index))
+        height = max(1, self._heights[index])
+        # The last line whose offset (rounded down) is at most ``row``
+        return self.document.block_line(index) + min(
+            source_lines - 1, ((row + 1) * source_lines - 1) // height
+        )
+
+    def block_at(self, y: int) -> int:
+        """Find the block displayed at a row of the virtual space.
+
+        Args:
+            y (int): A row in the virtual space.
+
+        Returns:
+            int: The index of the block covering that row.
+        """
+        offsets = self._get_offsets()
+        index = bisect_right(offsets, y) - 1
+        return max(0, min(index, self.block_count - 1))
+
+    def render_lines(self, crop: Region) -> List[Strip]:
+        """Render the visible lines, rendering any blocks they require.
+
+        Args:
+            crop: Region within the visible area to render.
+
+        Returns:
+            List[Strip]: The rendered lines.
+        """
+        self._prepare_viewport()
+        return super().render_lines(crop)
+
+    def render_line(self, y: int) -> Strip:
+        """Render a single line of the viewport.
+
+        Args:
+            y (int): Row of the line relative to the top of the viewport.
+
+        Returns:
+            Strip: The rendered line.
+        """
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.scrollable_content_region.width
+        line_y = scroll_y + y
+        if not self.block_count or line_y >= self.virtual_size.height:
+            return Strip.blank(width, self.rich_style)
+
+        index = self.block_at(line_y)
+        strips = self._get_rendered(index)
+        row = line_y - self._get_offsets()[index]
+        if row >= len(strips):
+            return Strip.blank(width, self.rich_style)
+        return strips[row].crop_extend(
+            scroll_x, scroll_x + width, self.rich_style
+        )
+
+    def on_resize(self) -> None:
+        """Drop rendered blocks when the available width changes.
+
+        Heights measured at the old width are kept as estimates until the
+        blocks are rendered again; the line-to-offset map is rebuilt lazily
+        from them on the next lookup.
+        """
+        width = self.scrollable_content_region.width
+        if width != self._render_width:
+            self._rendered.clear()
+            self._render_width = width
+            self._offsets_dirty = True
+            self._update_virtual_size()
+
+    def _add_heights(self) -> None:
+        """Estimate the heights of new blocks and grow the virtual size."""
+        document = self.document
+        start = len(self._heights)
+        if start == len(document):
+            return
+        self._heights.extend(
+            estimate_block_height(
+                document.block_span(i), document.block_level(i)
+            )
+            for i in range(start, len(document))
+        )
+        self._offsets_dirty = True
+        self._update_virtual_size()
+
+    def _get_offsets(self) -> "array[int]":
+        """Return the block offsets, rebuilding them if heights changed."""
+        if self._offsets_dirty:
+            self._offsets = array("q", chain((0,), accumulate(self._heights)))
+            self._offsets_dirty = False
+        return self._offsets
+
+    def _update_virtual_size(self) -> None:
+        """Resize the scrollable area to the current document height."""
+        height = self._get_offsets()[-1]
+        self.virtual_size = Size(self.scrollable_content_region.width, height)
+
+    def _prepare_viewport(self) -> None:
+        """Render the blocks around the viewport and fix their heights.
+
+        Blocks whose real height differs from the estimate change the
+        layout. The block at the top of the viewport is used as an anchor:
+        the scroll position is adjusted by the height change of the blocks
+        above it, so the visible content does not jump. A view scrolled to
+        the bottom stays at the bottom.
+        """
+        # Moving to the new bottom can uncover more unrendered blocks, but
+        # the layout settles after a couple of passes
+        for _ in range(3):
+            if not self._layout_viewport():
+                break
+
+    def _layout_viewport(self) -> bool:
+        """Run one measuring pass over the viewport.
+
+        Returns:
+            bool: True if the scroll position had to be adjusted.
+        """
+        if not self.block_count or self.size.height == 0:
+            return False
+
+        top = round(self.scroll_y)
+        at_bottom = top >= self.max_scroll_y
+        anchor = self.block_at(top)
+        anchor_row = top - self._get_offsets()[anchor]
+
+        changed = False
+        for index in range(max(0, anchor - self.overscan), anchor):
+            changed = self._measure(index) != 0 or changed
+
+        covered = -anchor_row
+        index = anchor
+        extra = 0
+        while index < self.block_count and extra <= self.overscan:
+            changed = self._measure(index) != 0 or changed
+            covered += self._heights[index]
+            if covered >= self.size.height:
+                extra += 1
+            index += 1
+
+        if not changed:
+            return False
+        self._offsets_dirty = True
+        self._update_virtual_size()
+        if at_bottom:
+            new_top = self.max_scroll_y
+        else:
+            new_top = self._get_offsets()[anchor] + anchor_row
+        if new_top == top:
+            return False
+        self.scroll_to(y=new_top, animate=False)
+        return True
+
+    def _measure(self, index: int) -> int:
+        """Render a block and record its real height.
+
+        Args:
+            index (int): The index of the block.
+
+        Returns:
+            int: The difference between the new and the previous height.
+        """
+        height = len(self._get_rendered(index))
+        delta = height - self._heights[index]
+        self._heights[index] = height
+        return delta
+
+    def _get_rendered(self, index: int) -> List[Strip]:
+        """Get the rendered lines of a block, rendering it if needed.
+
+        Args:
+            index (int): The index of the block.
+
+        Returns:
+            List[Strip]: The block's lines, followed by a blank separator
+                line unless the block renders to nothing.
+        """
+        strips = self._rendered.get(index)
+        if strips is not None:
+            self._rendered.move_to_end(index)
+            return strips
+
+        width = max(1, self.scrollable_content_region.width)
+        self._render_width = width
+        console = self.app.console
+        options = console.options.update_width(width)
+        lines = console.render_lines(
+            RichMarkdown(self.document.block_text(index)),
+            options,
+            style=self.rich_style,
+            pad=False,
+        )
+        strips = [Strip(line).simplify() for line in lines]
+        if strips:
+            strips.append(Strip.blank(width, self.rich_style))
+
+        self._rendered[index] = strips
+        if len(self._rendered) > self.cache_size:
+            self._rendered.popitem(last=False)
+        return strips
@@ -0,0 +1,165 @@
+"""Change notifications for files displayed by txmd."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+# Seconds between two checks of the file when inotify is not available
+POLL_INTERVAL = 0.5
+
+# inotify flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVE_SELF = 0x00000800
+IN_DELETE_SELF = 0x00000400
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVE_SELF | IN_DELETE_SELF
+)
+
+
+def _load_inotify() -> Optional[ctypes.CDLL]:
+    """Load the C library if it provides inotify (Linux only)."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileWatcher:
+    """Wait for a file to change, without busy-waiting.
+
+    On Linux the file is watched with inotify, so the process sleeps in
+    ``select()`` until the kernel reports a write. Elsewhere, or if inotify
+    cannot be set up (e.g. the watch limit is reached), the file's size,
+    modification time and inode are polled every ``poll_interval`` seconds.
+
+    Files replaced by a rename (as many editors save) are picked up again:
+    the watch is renewed on the path after every notification, and the
+    watcher falls back to polling if the file disappears.
+
+    Attributes:
+        path (Path): The file being watched.
+        poll_interval (float): Seconds between two polls in the fallback
+            mode.
+
+    Example:
+        >>> watcher = FileWatcher("report.md")
+        >>> while not done:
+        ...     if watcher.wait(0.1):
+        ...         reload()
+        >>> watcher.close()
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        poll_interval: float = POLL_INTERVAL,
+        use_inotify: bool = True,
+    ):
+        """Initialize the FileWatcher.
+
+        Args:
+            path (Union[str, Path]): The file to watch.
+            poll_interval (float): Seconds between two polls when inotify
+                is not used.
+            use_inotify (bool): Use inotify when it is available.
+        """
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self._libc = _load_inotify() if use_inotify else None
+        self._fd: Optional[int] = None
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                if not self._add_watch():
+                    self.close()
+        self._state = self._stat()
+        self._next_poll = time.monotonic() + poll_interval
+
+    @property
+    def uses_inotify(self) -> bool:
+        """bool: True if changes are reported by inotify."""
+        return self._fd is not None
+
+    def wait(self, timeout: float) -> bool:
+        """Wait until the file may have changed, or the timeout expires.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if the file changed (or may have changed), False if
+                the timeout expired first.
+        """
+        if self._fd is not None:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+            if not readable:
+                return False
+            self._drain()
+            if not self._add_watch():
+                # The file is gone: poll until it comes back
+                self.close()
+                self._state = self._stat()
+            return True
+
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if now >= self._next_poll:
+                self._next_poll = now + self.poll_interval
+                state = self._stat()
+                if state != self._state:
+                    self._state = state
+                    return True
+            if now >= deadline:
+                return False
+            time.sleep(min(self._next_poll, deadline) - now)
+
+    def close(self) -> None:
+        """Stop watching the file and release the inotify descriptor."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _add_watch(self) -> bool:
+        """(Re)attach the inotify watch to the file at ``path``."""
+        assert self._libc is not None and self._fd is not None
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(self.path), WATCH_MASK
+        )
+        return wd >= 0
+
+    def _drain(self) -> None:
+        """Consume all pending inotify events."""
+        assert self._fd is not None
+        while True:
+            try:
+                if not os.read(self._fd, 4096):
+                    break
+            except BlockingIOError:
+                break
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        """Return the size, modification time and inode of the file."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino